@@ -0,0 +1,83 @@
+"""
+Показывает, что апдейты продолжают обрабатываться во время медленной записи actions.yaml.
+Пока идёт запись, «пульс» event loop тикает каждые 10 мс; меряем худшую задержку тика
+при синхронной записи (как было) и в пуле config.async_io — так же, как
+ActionsStore.compact() сворачивает журнал.
+
+    python -m benchmarks.bench_async_io
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import config.async_io as async_io
+import config.config_loader as config_loader
+from config.config_loader import save_yaml
+
+ACTIONS = {f"действие {i}": f"✨ {{user1}} сделал(а) действие {i} с {{user2}}" for i in range(3000)}
+# Имитация медленного диска поверх настоящей сериализации
+DISK_DELAY = 0.3
+TICK = 0.01
+
+
+def slow_save_yaml(filename, data):
+    save_yaml(filename, data)
+    time.sleep(DISK_DELAY)
+
+
+async def heartbeat(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def measure(save) -> dict:
+    stop = asyncio.Event()
+    lags: list[float] = []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await save()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await beat
+    return {
+        "save_seconds": round(elapsed, 3),
+        "ticks_during_save": len(lags),
+        "max_loop_lag_ms": round(max(lags) * 1000, 1),
+    }
+
+
+async def main() -> None:
+    path = os.path.join(tempfile.mkdtemp(), "actions.yaml")
+
+    async def blocking():
+        slow_save_yaml(path, ACTIONS)
+
+    async def offloaded():
+        await async_io.run_in_io_thread(slow_save_yaml, path, ACTIONS)
+
+    print("sync save: ", await measure(blocking))
+    print("async save:", await measure(offloaded))
+
+    # Десять одновременных загрузок одного файла — один парсинг
+    calls = 0
+    original = async_io.load_yaml
+
+    def counting_load(filename):
+        nonlocal calls
+        calls += 1
+        return original(filename)
+
+    async_io.load_yaml = counting_load
+    await asyncio.gather(*(async_io.aload_yaml(path) for _ in range(10)))
+    print(f"10 concurrent loads -> {calls} parse(s)")
+
+
+if __name__ == "__main__":
+    # Снимки YAML — во временный каталог, а не в data/
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        config_loader.SNAPSHOT_DIR = snapshot_dir
+        asyncio.run(main())
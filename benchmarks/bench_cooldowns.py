@@ -0,0 +1,78 @@
+"""
+Память и цена проверки кулдаунов RateLimiter. Память на активный ключ должна
+оставаться постоянной при росте числа ключей, а истёкшие ключи — освобождаться
+без таймеров. Для сравнения — прежняя схема: строковый ключ «<flag>_<user_id>»
+в dict плюс таймер в SCHEDULER на каждое использование.
+
+    python -m benchmarks.bench_cooldowns
+"""
+import time
+import tracemalloc
+from functools import partial
+
+from utils.rate_limit import CHAT_USER, RateLimiter, scoped_key
+from utils.scheduler import TimerScheduler
+
+KEY_COUNTS = (1_000, 10_000, 100_000)
+CHATS = 100
+COOLDOWN = 180.0
+N_HITS = 200_000
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def engine_memory(n_keys: int) -> tuple[float, int]:
+    clock = _Clock()
+    limiter = RateLimiter(clock)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for i in range(n_keys):
+        limiter.hit(scoped_key("rules", CHAT_USER, -1000 - i % CHATS, i), COOLDOWN)
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    # Все кулдауны истекли — уборка (её запускает рост числа ключей) освобождает всё
+    clock.now += COOLDOWN
+    limiter.sweep()
+    return used / n_keys, len(limiter)
+
+
+def legacy_memory(n_keys: int) -> float:
+    scheduler = TimerScheduler(_Clock())
+    flags: dict[str, bool] = {}
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for i in range(n_keys):
+        cache_key = f"rules_{i}"
+        flags[cache_key] = True
+        scheduler.schedule(("cooldown", -1000 - i % CHATS, cache_key), COOLDOWN, partial(flags.pop, cache_key, None))
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return used / n_keys
+
+
+def hit_cost() -> float:
+    limiter = RateLimiter()
+    keys = [scoped_key("rules", CHAT_USER, -1000 - i % CHATS, i % 5000) for i in range(N_HITS)]
+    started = time.perf_counter()
+    for key in keys:
+        limiter.hit(key, COOLDOWN, 3)
+    return (time.perf_counter() - started) / N_HITS
+
+
+def main() -> None:
+    print(f"{'ключей':>8} {'RateLimiter':>14} {'строка+таймер':>15} {'после истечения':>16}")
+    for n_keys in KEY_COUNTS:
+        per_key, left = engine_memory(n_keys)
+        print(f"{n_keys:>8} {per_key:>10.0f} Б/кл {legacy_memory(n_keys):>11.0f} Б/кл {left:>10} ключей")
+    print(f"\nhit(): {hit_cost() * 1e9:.0f} нс на проверку (5000 активных ключей, burst 3)")
+
+
+if __name__ == "__main__":
+    main()
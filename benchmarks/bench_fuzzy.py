@@ -0,0 +1,86 @@
+"""
+Стоимость поиска действий с опечатками на 5000 действиях. Большинство сообщений
+в чате — не действия, поэтому главное — цена промаха: она должна оставаться
+в микросекундах и не расти с числом действий. Для сравнения — наивный перебор
+всех ключей с ограниченным расстоянием.
+
+    python -m benchmarks.bench_fuzzy
+"""
+import random
+import statistics
+import time
+
+from utils.fuzzy_index import FuzzyIndex, bounded_distance
+
+N_ACTIONS = 5000
+N_QUERIES = 2000
+NAIVE_QUERIES = 50
+
+VERBS = ["обнять", "поцеловать", "погладить", "укусить", "пнуть", "прижать", "пощекотать",
+         "подарить", "угостить", "толкнуть", "лизнуть", "ущипнуть", "похвалить", "накормить"]
+OBJECTS = ["нежно", "крепко", "сзади", "в щёчку", "в лоб", "по голове", "за ушком", "цветами",
+           "печенькой", "чаем", "пирожком", "подушкой", "тапком", "хвостом", "лапкой"]
+# Обычные сообщения, которые приходят с reply/@mention, но действиями не являются
+CHATTER = ["да", "ну ты даёшь", "посмотри сюда", "а что было вчера", "привет всем",
+           "спасибо большое", "завтра созвонимся", "ахаха", "это шутка была", "не понял вопроса"]
+
+LETTERS = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+
+def make_keys(rng: random.Random) -> list[str]:
+    keys = set()
+    while len(keys) < N_ACTIONS:
+        keys.add(f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.randint(1, 999)}")
+    return sorted(keys)
+
+
+def typo(rng: random.Random, word: str) -> str:
+    i = rng.randrange(len(word))
+    return word[:i] + rng.choice(LETTERS) + word[i + 1:]
+
+
+def naive_lookup(keys: list[str], query: str, limit: int) -> str | None:
+    best, best_distance = None, limit + 1
+    for key in keys:
+        distance = bounded_distance(query, key, limit)
+        if distance < best_distance:
+            best, best_distance = key, distance
+    return best
+
+
+def measure(func, queries) -> list[float]:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        func(query)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return timings
+
+
+def report(label: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{label:<34} median {statistics.median(timings):8.1f} мкс   p99 {p99:8.1f} мкс")
+
+
+def main() -> None:
+    rng = random.Random(1)
+    keys = make_keys(rng)
+
+    started = time.perf_counter()
+    index = FuzzyIndex(keys, max_distance=1)
+    print(f"Индекс на {len(keys)} действий построен за {(time.perf_counter() - started) * 1e3:.0f} мс")
+
+    misses = [rng.choice(CHATTER) for _ in range(N_QUERIES)]
+    typos = [typo(rng, rng.choice(keys)) for _ in range(N_QUERIES)]
+
+    report("промах (обычное сообщение)", measure(index.lookup, misses))
+    report("опечатка в действии", measure(index.lookup, typos))
+    report("наивный перебор, промах", measure(lambda q: naive_lookup(keys, q, 1), misses[:NAIVE_QUERIES]))
+
+    fixed = sum(1 for query in typos if index.lookup(query) is not None)
+    print(f"Исправлено опечаток: {fixed} из {len(typos)} (остальные неоднозначны или совпали с другим ключом)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Цена инструментирования: обработчик с @instrument против голого, вызов Bot API через
+InstrumentedRequest против FakeTelegramRequest напрямую, и время экспорта METRICS
+в формате Prometheus (с проверкой, что MetricsServer его отдаёт).
+
+    python -m benchmarks.bench_metrics
+"""
+import asyncio
+import time
+
+from telegram.request import RequestData
+
+from benchmarks.fake_telegram import FakeTelegramRequest
+from utils.metrics import MATCH, METRICS, InstrumentedRequest, MetricsServer, instrument, set_outcome
+
+N_CALLS = 200_000
+N_REQUESTS = 20_000
+URL = "https://api.telegram.org/bot1:fake/getMe"
+
+
+async def bare(update, context) -> None:
+    if update % 3 == 0:
+        return
+
+
+@instrument("bench")
+async def instrumented(update, context) -> None:
+    if update % 3 == 0:
+        return
+    set_outcome(MATCH)
+
+
+async def per_call(handler, n: int) -> float:
+    started = time.perf_counter()
+    for i in range(n):
+        await handler(i, None)
+    return (time.perf_counter() - started) / n
+
+
+async def per_request(request, n: int) -> float:
+    data = RequestData()
+    started = time.perf_counter()
+    for _ in range(n):
+        await request.do_request(URL, "POST", data)
+    return (time.perf_counter() - started) / n
+
+
+async def scrape(server: MetricsServer) -> tuple[int, str]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), body.decode()
+
+
+async def main() -> None:
+    base = await per_call(bare, N_CALLS)
+    wrapped = await per_call(instrumented, N_CALLS)
+    print(f"обработчик: {base * 1e9:.0f} нс → с @instrument {wrapped * 1e9:.0f} нс "
+          f"(+{(wrapped - base) * 1e9:.0f} нс на вызов)")
+
+    fake = FakeTelegramRequest()
+    direct = await per_request(fake, N_REQUESTS)
+    through = await per_request(InstrumentedRequest(fake), N_REQUESTS)
+    print(f"вызов Bot API (без сети): {direct * 1e6:.1f} мкс → через InstrumentedRequest "
+          f"{through * 1e6:.1f} мкс (+{(through - direct) * 1e9:.0f} нс)")
+
+    started = time.perf_counter()
+    text = METRICS.render()
+    print(f"экспорт: {len(text)} байт за {(time.perf_counter() - started) * 1e3:.2f} мс")
+
+    server = MetricsServer({"port": 0})
+    await server.start()
+    status, body = await scrape(server)
+    await server.stop()
+    print(f"GET /metrics: {status}, строк {len(body.splitlines())}")
+    for line in body.splitlines():
+        if line.startswith("maidbot_handler_calls_total") or line.startswith("maidbot_api_calls_total"):
+            print("   ", line)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
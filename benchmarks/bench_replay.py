@@ -0,0 +1,384 @@
+"""
+Сквозной прогон потоков апдейтов через приложение, собранное так же, как в bot.main
+(build_application), с поддельным Bot API (FakeTelegramRequest: задержка, ошибки).
+
+Сценарии — синтетические потоки:
+    typical            обычный чат: болтовня, RP-действия, команды, /actions
+    actions            всплеск RP-действий от немногих пользователей (анти-флуд выключен)
+    actions_throttled  тот же всплеск с ACTION_LIMITS из config.yaml — путь отбрасывания
+    gag_flood          заглушённые пользователи заваливают чат сообщениями
+    pagination         шквал нажатий «Вперёд/Назад» под листингами /actions
+или записанный поток (--stream updates.jsonl, по одному Update в JSON на строку).
+
+Каждый сценарий идёт в отдельном процессе: синглтоны (OUTBOUND, SCHEDULER, METRICS...)
+и пик памяти у каждого свои. Результаты — в JSON, для сравнения с прошлыми прогонами:
+
+    python -m benchmarks.bench_replay
+    python -m benchmarks.bench_replay actions gag_flood --latency 0.05 --error-rate 0.01
+    python -m benchmarks.bench_replay --compare benchmarks/results/replay-20260101-120000.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+SCENARIOS = ("typical", "actions", "actions_throttled", "gag_flood", "pagination")
+# В этих сценариях анти-флуд RP-действий работает по config.yaml, в остальных выключен
+THROTTLED_SCENARIOS = ("actions_throttled",)
+DEFAULT_UPDATES = 3000
+
+ADMIN_ID = 1
+# id сообщений пользователей; у ответов поддельного бота id начинаются с 10 000
+FIRST_MESSAGE_ID = 1
+
+CHATTER = ["да", "ну ты даёшь", "посмотри сюда", "а что было вчера", "привет всем",
+           "спасибо большое", "завтра созвонимся", "ахаха", "это шутка была", "не понял вопроса"]
+
+# Сколько ждём, пока очереди отправки и удаления опустеют после последнего апдейта
+SETTLE_TIMEOUT = 10.0
+
+
+def _user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"Юзер{user_id}", "username": f"user{user_id}"}
+
+
+class StreamBuilder:
+    """Собирает апдейты в формате Bot API (dict), как их присылает Telegram."""
+
+    def __init__(self, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.update_id = 0
+        self.message_ids: dict[int, int] = {}
+
+    def _message(self, chat_id: int, user_id: int, text: str, reply_to: int | None = None) -> dict:
+        self.update_id += 1
+        message_id = self.message_ids.get(chat_id, FIRST_MESSAGE_ID)
+        self.message_ids[chat_id] = message_id + 1
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup"},
+            "from": _user(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        if reply_to is not None:
+            message["reply_to_message"] = {
+                "message_id": max(1, message_id - 1), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "supergroup"}, "from": _user(reply_to), "text": "привет",
+            }
+        return {"update_id": self.update_id, "message": message}
+
+    def text(self, chat_id: int, user_id: int, text: str) -> dict:
+        return self._message(chat_id, user_id, text)
+
+    def reply(self, chat_id: int, user_id: int, text: str, target_id: int) -> dict:
+        return self._message(chat_id, user_id, text, reply_to=target_id)
+
+    def command(self, chat_id: int, user_id: int, command: str) -> dict:
+        return self._message(chat_id, user_id, command)
+
+    def callback(self, chat_id: int, user_id: int, message_id: int, data: str) -> dict:
+        self.update_id += 1
+        return {
+            "update_id": self.update_id,
+            "callback_query": {
+                "id": str(self.update_id),
+                "from": _user(user_id),
+                "chat_instance": str(chat_id),
+                "data": data,
+                "message": {
+                    "message_id": message_id, "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "supergroup"},
+                    "from": {"id": 1000, "is_bot": True, "first_name": "Maid"}, "text": "список",
+                },
+            },
+        }
+
+
+def typical(b: StreamBuilder, n: int, ctx: dict) -> list[dict]:
+    rng, actions, commands = b.rng, ctx["actions"], ctx["commands"]
+    chats = [-1000 - i for i in range(50)]
+    updates = []
+    while len(updates) < n:
+        chat, user = rng.choice(chats), rng.randint(100, 300)
+        roll = rng.random()
+        if roll < 0.80:
+            updates.append(b.text(chat, user, rng.choice(CHATTER)))
+        elif roll < 0.94:
+            updates.append(b.reply(chat, user, rng.choice(actions), rng.randint(100, 300)))
+        elif roll < 0.98 and commands:
+            updates.append(b.command(chat, user, "/" + rng.choice(commands)))
+        else:
+            updates.append(b.command(chat, user, "/actions"))
+    return updates
+
+
+def action_burst(b: StreamBuilder, n: int, ctx: dict) -> list[dict]:
+    rng, actions = b.rng, ctx["actions"]
+    chats = [-2000 - i for i in range(5)]
+    return [
+        b.reply(chat, -chat * 10 + rng.randint(0, 19), rng.choice(actions), rng.randint(100, 300))
+        for chat in (rng.choice(chats) for _ in range(n))
+    ]
+
+
+def gag_flood(b: StreamBuilder, n: int, ctx: dict) -> list[dict]:
+    rng = b.rng
+    chats = [-3000, -3001]
+    gagged = [(chat, 500 + i) for chat in chats for i in range(10)]
+    updates = [b.reply(chat, ADMIN_ID, "надеть кляп 10м", user) for chat, user in gagged]
+    while len(updates) < n:
+        chat, user = rng.choice(gagged)
+        updates.append(b.text(chat, user, rng.choice(CHATTER)))
+    return updates
+
+
+def pagination(b: StreamBuilder, n: int, ctx: dict) -> list[dict]:
+    rng, version, pages = b.rng, ctx["pages_version"], ctx["pages"]
+    chats = [-4000 - i for i in range(10)]
+    updates = [b.command(chat, 700, "/actions") for chat in chats]
+    # Первое сообщение бота в чате получает у поддельного API id 10001
+    while len(updates) < n:
+        chat = rng.choice(chats)
+        updates.append(b.callback(chat, rng.randint(700, 720), 10001, f"actions:page:{version}:{rng.randrange(pages)}"))
+    return updates
+
+
+GENERATORS = {
+    "typical": typical, "actions": action_burst, "actions_throttled": action_burst,
+    "gag_flood": gag_flood, "pagination": pagination,
+}
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+async def _replay(scenario: str, options: dict) -> dict:
+    from telegram import Update
+    from telegram.ext import TypeHandler
+
+    from benchmarks.fake_telegram import FakeTelegramRequest
+    from bot import build_application
+    from config.actions_registry import ACTIONS_REGISTRY
+    from config.config_store import CONFIG_STORE
+    from handlers.actions_list_handler import PAGE_CACHE
+    from utils.app_lifecycle import running
+    from utils.delete_queue import DELETE_QUEUE
+    from utils.metrics import API_CALLS, HANDLER_CALLS, HANDLER_SECONDS
+    from utils.outbound import OUTBOUND
+    from utils.rate_limit import ACTION_THROTTLE
+
+    request = FakeTelegramRequest(latency=options["latency"], error_rate=options["error_rate"], seed=options["seed"])
+    raw = {
+        **CONFIG_STORE.current.raw,
+        "BOT_TOKEN": "1:fake",
+        "ADMINS": [ADMIN_ID],
+        # Бенчмарк не трогает data/ и не поднимает HTTP-серверы
+        "MEMBER_DIRECTORY": {"persist": False},
+        "STATE_BACKEND": {"type": "memory"},
+        "METRICS": {"enabled": False},
+        # Меряем обработчики, а не лимиты Telegram: очередь отправки не сдерживает
+        "RATE_LIMITS": {"global_per_second": 100_000, "global_burst": 1000,
+                        "group_per_minute": 100_000, "group_burst": 1000, "private_per_second": 1000},
+    }
+    if scenario not in THROTTLED_SCENARIOS:
+        # Иначе всплеск действий меряет в основном отбрасывание анти-флудом
+        raw["ACTION_LIMITS"] = {"per_user": {"limit": 0}, "per_chat": {"limit": 0}}
+    # Обработчики читают CONFIG_STORE.current — подставляем конфиг бенчмарка туда
+    config = CONFIG_STORE.use(raw)
+    app = build_application(config, request=request)
+
+    started_at: dict[int, float] = {}
+    latencies: list[float] = []
+    done = asyncio.Event()
+    expected = 0
+
+    async def stamp_start(update: Update, context) -> None:
+        started_at[update.update_id] = time.perf_counter()
+
+    async def stamp_end(update: Update, context) -> None:
+        latencies.append(time.perf_counter() - started_at.pop(update.update_id))
+        if len(latencies) == expected:
+            done.set()
+
+    # Первой и последней группой: время апдейта внутри всех обработчиков
+    app.add_handler(TypeHandler(Update, stamp_start), group=-100)
+    app.add_handler(TypeHandler(Update, stamp_end), group=100)
+
+    async with running(app):
+        if options.get("stream"):
+            with open(options["stream"], encoding="utf-8") as f:
+                payloads = [json.loads(line) for line in f if line.strip()][:options["updates"]]
+        else:
+            commands = [name for name in config.commands]
+            PAGE_CACHE.pages()
+            ctx = {
+                "actions": sorted(ACTIONS_REGISTRY.current()),
+                "commands": commands,
+                "pages_version": PAGE_CACHE.version,
+                "pages": len(PAGE_CACHE.pages()),
+            }
+            payloads = GENERATORS[scenario](StreamBuilder(options["seed"]), options["updates"], ctx)
+        updates = [Update.de_json(payload, app.bot) for payload in payloads]
+        expected = len(updates)
+
+        started = time.perf_counter()
+        for update in updates:
+            # Очередь ограничена (max_pending) — при перегрузке put ждёт, как getUpdates
+            await app.update_queue.put(update)
+        await asyncio.wait_for(done.wait(), 300)
+        elapsed = time.perf_counter() - started
+
+        # Дожидаемся отправок и удалений, чтобы посчитать все вызовы API
+        deadline = time.monotonic() + SETTLE_TIMEOUT
+        while (len(OUTBOUND) or DELETE_QUEUE.pending()) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        backlog = len(OUTBOUND) + DELETE_QUEUE.pending()
+
+    # После остановки: отправки и удаления, что ещё были в полёте, уже посчитаны
+    api_calls = request.api_calls()
+    api_by_method = {m: c for m, c in request.calls.items() if m != "getMe"}
+
+    latencies.sort()
+    handlers: dict[str, dict] = {}
+    for (name, outcome), value in HANDLER_CALLS.values.items():
+        entry = handlers.setdefault(name, {"outcomes": {}})
+        entry["outcomes"][outcome] = int(value)
+    for name, entry in handlers.items():
+        entry["p50_ms"] = HANDLER_SECONDS.quantile(0.5, name) * 1e3
+        entry["p99_ms"] = HANDLER_SECONDS.quantile(0.99, name) * 1e3
+    api_errors = sum(int(v) for (_, outcome), v in API_CALLS.values.items() if outcome != "ok")
+
+    return {
+        "updates": len(updates),
+        "seconds": elapsed,
+        "updates_per_second": len(updates) / elapsed,
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.5) * 1e3,
+            "p99": _percentile(latencies, 0.99) * 1e3,
+            "mean": statistics.fmean(latencies) * 1e3 if latencies else 0.0,
+        },
+        "api_calls": api_calls,
+        "api_calls_per_update": api_calls / max(len(updates), 1),
+        "api_by_method": api_by_method,
+        "api_errors": api_errors,
+        "flood_waits": request.flood_waits,
+        "backlog_after_settle": backlog,
+        "actions_dropped": dict(ACTION_THROTTLE.dropped),
+        "handlers": handlers,
+        # ru_maxrss на Linux — в килобайтах
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_scenario(scenario: str, options: dict) -> dict:
+    """Точка входа процесса-сценария."""
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+    import config.config_loader as config_loader
+    # Снимки YAML — во временный каталог, а не в data/
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        config_loader.SNAPSHOT_DIR = snapshot_dir
+        return asyncio.run(_replay(scenario, options))
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _print(name: str, result: dict, previous: dict | None) -> None:
+    def delta(key: str, value: float, lower_is_better: bool = False) -> str:
+        if not previous or key not in previous:
+            return ""
+        old = previous[key]
+        if not old:
+            return ""
+        change = (value - old) / old * 100
+        better = change < 0 if lower_is_better else change > 0
+        return f" ({change:+.0f}%{' ✓' if better else ''})"
+
+    lat = result["latency_ms"]
+    prev_lat = (previous or {}).get("latency_ms")
+    print(f"\n▶ {name}: {result['updates']} апдейтов")
+    print(f"  пропускная способность: {result['updates_per_second']:.0f}/с"
+          f"{delta('updates_per_second', result['updates_per_second'])}")
+    print(f"  задержка в обработчиках: p50 {lat['p50']:.2f} мс, p99 {lat['p99']:.2f} мс"
+          + (f" (было p50 {prev_lat['p50']:.2f}, p99 {prev_lat['p99']:.2f})" if prev_lat else ""))
+    print(f"  вызовов API на апдейт: {result['api_calls_per_update']:.3f}"
+          f"{delta('api_calls_per_update', result['api_calls_per_update'], lower_is_better=True)}"
+          f"  {result['api_by_method']}")
+    if result["api_errors"] or result["flood_waits"]:
+        print(f"  ошибок API: {result['api_errors']}, flood wait: {result['flood_waits']}")
+    if result["actions_dropped"]:
+        print(f"  отброшено анти-флудом: {result['actions_dropped']}")
+    print(f"  пик памяти: {result['peak_rss_mb']:.1f} МБ"
+          f"{delta('peak_rss_mb', result['peak_rss_mb'], lower_is_better=True)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay-бенчмарк обработчиков бота")
+    parser.add_argument("scenarios", nargs="*", choices=[*SCENARIOS, []], help="по умолчанию — все")
+    parser.add_argument("--updates", type=int, default=DEFAULT_UPDATES)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка поддельного Bot API, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля вызовов API с ошибкой 400")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stream", help="записанный поток: JSONL с апдейтами Bot API")
+    parser.add_argument("--out", help="куда сохранить JSON (по умолчанию benchmarks/results/replay-<время>.json)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    options = {
+        "updates": args.updates, "latency": args.latency, "error_rate": args.error_rate,
+        "seed": args.seed, "stream": args.stream,
+    }
+    scenarios = ["stream"] if args.stream else (args.scenarios or list(SCENARIOS))
+    previous = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f).get("scenarios", {})
+
+    results = {}
+    for name in scenarios:
+        # Свежий процесс на сценарий: чистые синглтоны и честный пик памяти
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            results[name] = pool.submit(run_scenario, name, options).result()
+        _print(name, results[name], previous.get(name))
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "options": options,
+        "scenarios": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"replay-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Время запуска: разбор config.yaml и actions.yaml чистым Python-загрузчиком, через libyaml
+(CSafeLoader) и из снимка; затем запуск процесса целиком — импорт, конфиг, реестр действий
+и build_application — «холодный» (снимков нет) и «тёплый» (снимки есть).
+
+    python -m benchmarks.bench_startup
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+import config.config_loader as config_loader
+from config.config_loader import ACTIONS_PATH, BASE_DIR, CONFIG_PATH
+
+REPEATS = 20
+PROCESS_RUNS = 5
+
+# Что делает процесс до приёма апдейтов; SNAPSHOT_DIR подменяется до первой загрузки
+_STARTUP = """
+import json, sys, time
+started = time.perf_counter()
+import config.config_loader as config_loader
+config_loader.SNAPSHOT_DIR = sys.argv[1] or None
+if sys.argv[2] == "python":
+    import yaml
+    config_loader._yaml_loader = lambda: (yaml, yaml.SafeLoader)
+imported = time.perf_counter()
+import bot
+from config.actions_registry import ACTIONS_REGISTRY
+from config.config_store import CONFIG_STORE, ConfigSnapshot
+app_imported = time.perf_counter()
+config = CONFIG_STORE.current
+ACTIONS_REGISTRY.refresh(force=True)
+loaded = time.perf_counter()
+# В config.yaml токена может не быть — для сборки хватит любого корректного
+bot.build_application(ConfigSnapshot.build({**config.raw, "BOT_TOKEN": "1:fake"}))
+built = time.perf_counter()
+print(json.dumps({"imports": app_imported - imported, "load": loaded - app_imported,
+                  "build": built - loaded, "total": built - started}))
+"""
+
+
+def _median_ms(func) -> float:
+    times = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1e3
+
+
+def parse_costs(snapshot_dir: str) -> None:
+    if not hasattr(yaml, "CSafeLoader"):
+        print("⚠️ libyaml недоступен — PyYAML собран без него, сравнивать не с чем")
+        return
+    print(f"{'файл':>14} {'Python':>10} {'libyaml':>10} {'снимок':>10}")
+    for path in (CONFIG_PATH, ACTIONS_PATH):
+        pure = _median_ms(lambda: yaml.load(open(path, "rb"), Loader=yaml.SafeLoader))
+        libyaml = _median_ms(lambda: yaml.load(open(path, "rb"), Loader=yaml.CSafeLoader))
+        config_loader.SNAPSHOT_DIR = snapshot_dir
+        config_loader.load_yaml(path)
+        # Файл только что мог измениться — пусть снимок один раз сверит хэш
+        config_loader.load_yaml(path)
+        snapshot = _median_ms(lambda: config_loader.load_yaml(path))
+        print(f"{os.path.basename(path):>14} {pure:>7.2f} мс {libyaml:>7.2f} мс {snapshot:>7.2f} мс")
+
+
+def _start(snapshot_dir: str, loader: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _STARTUP, snapshot_dir, loader],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def process_startup() -> None:
+    runs = {"до: Python-загрузчик, без снимков": [], "холодный: libyaml, снимков нет": [],
+            "тёплый: из снимков": []}
+    for _ in range(PROCESS_RUNS):
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            runs["до: Python-загрузчик, без снимков"].append(_start("", "python"))
+            runs["холодный: libyaml, снимков нет"].append(_start(snapshot_dir, "c"))
+            # Тёплый запуск сразу после холодного: снимки свежие, mtime и размер совпадают
+            _start(snapshot_dir, "c")
+            runs["тёплый: из снимков"].append(_start(snapshot_dir, "c"))
+
+    print(f"\n{'запуск':>34} {'импорт':>9} {'конфиг+действия':>16} {'сборка':>9} {'всего':>9}")
+    for name, samples in runs.items():
+        median = {key: statistics.median(s[key] for s in samples) * 1e3 for key in samples[0]}
+        print(f"{name:>34} {median['imports']:>6.0f} мс {median['load']:>13.1f} мс "
+              f"{median['build']:>6.1f} мс {median['total']:>6.0f} мс")
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        parse_costs(snapshot_dir)
+    process_startup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Микробенчмарк разбора срока кляпа: прежние два regex-прохода (parse_duration +
+parse_until, копия старой версии ниже) против одного прохода parse_gag_time.
+Заодно печатает, что каждая версия поняла из составных сроков.
+
+    python -m benchmarks.bench_time_parser
+"""
+import re
+import timeit
+from datetime import datetime, timedelta
+
+from utils.time_parser import now_in, parse_gag_time
+
+SAMPLES = [
+    "кляп 10с",
+    "кляп @user 5 минут",
+    "кляп 1ч30м",
+    "кляп 1h 15m",
+    "кляп 2 дня",
+    "кляп до 23:30",
+    "кляп до 31.12 18:00",
+    "кляп @user за флуд в общем чате, подумай над поведением",
+]
+NUMBER = 20000
+
+
+def legacy_parse_duration(text: str) -> int | None:
+    txt = text.lower()
+    match = re.search(r'(\d+)\s*([сmчh])\b', txt)
+    if match:
+        num = int(match.group(1))
+        unit = match.group(2)
+        if unit == 'с':
+            return num
+        if unit == 'm':
+            return num * 60
+        if unit == 'ч' or unit == 'h':
+            return num * 3600
+    match_words = re.search(r'(\d+)\s*(секунд[ау]?|сек|минут[ау]?|мин|час(ов|а)?)\b', txt)
+    if match_words:
+        num = int(match_words.group(1))
+        unit_word = match_words.group(2)
+        if unit_word.startswith('сек'):
+            return num
+        if unit_word.startswith('мин'):
+            return num * 60
+        if unit_word.startswith('час'):
+            return num * 3600
+    return None
+
+
+def legacy_parse_until(text: str) -> datetime | None:
+    match = re.search(r'до\s+(\d{1,2}):(\d{2})', text.lower())
+    if not match:
+        return None
+    now = datetime.now()
+    try:
+        target = now.replace(hour=int(match.group(1)), minute=int(match.group(2)), second=0, microsecond=0)
+    except ValueError:
+        return None
+    if target <= now:
+        target += timedelta(days=1)
+    return target
+
+
+def legacy(text: str) -> int | None:
+    # Как было в MuteManager._gag: оба парсера на каждую команду
+    dur = legacy_parse_duration(text)
+    until = legacy_parse_until(text)
+    if dur is None and until is None:
+        return None
+    return dur if dur else int((until - datetime.now()).total_seconds())
+
+
+def main() -> None:
+    now = now_in()
+    print(f"{'текст':<58} {'было':>10} {'стало':>10}")
+    for text in SAMPLES:
+        print(f"{text:<58} {str(legacy(text)):>10} {str(parse_gag_time(text, now)):>10}")
+    print()
+
+    for label, func in (("было (два прохода)", legacy), ("стало (один проход)", lambda t: parse_gag_time(t, now))):
+        elapsed = timeit.timeit(lambda: [func(text) for text in SAMPLES], number=NUMBER)
+        per_call = elapsed / (NUMBER * len(SAMPLES)) * 1e6
+        print(f"{label:<22} {per_call:6.2f} мкс на команду")
+
+
+if __name__ == "__main__":
+    main()
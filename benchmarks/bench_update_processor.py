@@ -0,0 +1,89 @@
+"""
+Пропускная способность обработки апдейтов при медленном Bot API (задержка на каждый вызов):
+последовательная обработка PTB по умолчанию против ChatOrderedUpdateProcessor при разном
+числе чатов. Заодно проверяет, что внутри каждого чата порядок апдейтов не нарушен.
+
+    python -m benchmarks.bench_update_processor
+"""
+import asyncio
+import time
+
+from telegram import Chat, Message, Update, User
+from telegram.ext import ApplicationBuilder, MessageHandler, filters
+
+from benchmarks.fake_telegram import FakeTelegramRequest
+from utils.update_processor import ChatOrderedUpdateProcessor
+
+LATENCY = 0.02
+N_UPDATES = 400
+CHAT_COUNTS = (1, 4, 16, 64)
+MAX_CONCURRENT = 16
+# Небольшой лимит ожидающих, чтобы было видно backpressure
+MAX_PENDING = 64
+
+
+def _updates(n_chats: int, bot) -> list[Update]:
+    user = User(1, "Тест", False)
+    updates = []
+    for update_id in range(N_UPDATES):
+        chat = Chat(-1000 - update_id % n_chats, "supergroup")
+        message = Message(update_id, None, chat, from_user=user, text=str(update_id))
+        message.set_bot(bot)
+        updates.append(Update(update_id, message=message))
+    return updates
+
+
+async def run(n_chats: int, processor) -> dict:
+    request = FakeTelegramRequest(latency=LATENCY)
+    builder = ApplicationBuilder().token("1:fake").request(request).updater(None)
+    if processor is not None:
+        builder = builder.concurrent_updates(processor)
+    app = builder.build()
+
+    seen: dict[int, list[int]] = {}
+    done = asyncio.Event()
+    handled = 0
+    peak = 0
+
+    async def handler(update: Update, context) -> None:
+        nonlocal handled, peak
+        if processor is not None:
+            peak = max(peak, processor.pending)
+        # Медленный вызов API, как удаление/отправка прямо из обработчика
+        await context.bot.delete_message(update.effective_chat.id, update.message.message_id)
+        seen.setdefault(update.effective_chat.id, []).append(update.update_id)
+        handled += 1
+        if handled == N_UPDATES:
+            done.set()
+
+    app.add_handler(MessageHandler(filters.TEXT, handler))
+    await app.initialize()
+    await app.start()
+
+    started = time.perf_counter()
+    for update in _updates(n_chats, app.bot):
+        await app.update_queue.put(update)
+    await done.wait()
+    elapsed = time.perf_counter() - started
+
+    await app.stop()
+    await app.shutdown()
+
+    ordered = all(ids == sorted(ids) for ids in seen.values())
+    return {"elapsed": elapsed, "ordered": ordered, "peak": peak}
+
+
+async def main() -> None:
+    print(f"{N_UPDATES} апдейтов, задержка Bot API {LATENCY * 1e3:.0f} мс, параллельно до {MAX_CONCURRENT}\n")
+    print(f"{'чатов':>6} {'последовательно':>18} {'по чатам':>12} {'порядок':>8} {'пик ожидающих':>14}")
+    for n_chats in CHAT_COUNTS:
+        sequential = await run(n_chats, None)
+        ordered = await run(n_chats, ChatOrderedUpdateProcessor(MAX_CONCURRENT, MAX_PENDING))
+        print(
+            f"{n_chats:>6} {N_UPDATES / sequential['elapsed']:>14.0f} /с {N_UPDATES / ordered['elapsed']:>8.0f} /с "
+            f"{'да' if ordered['ordered'] else 'НЕТ':>8} {ordered['peak']:>8} / {MAX_PENDING}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
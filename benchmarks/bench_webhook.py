@@ -0,0 +1,154 @@
+"""
+Сквозная проверка режима вебхука без Telegram: приложение собирается так же, как в
+bot.main (build_application), Bot API подменён FakeTelegramRequest, а синтетические
+апдейты шлёт локальный HTTP-клиент. Меряет время от POST до запуска обработчиков
+и проверяет health-эндпоинт и secret token.
+
+    python -m benchmarks.bench_webhook
+"""
+import asyncio
+import json
+import socket
+import statistics
+import tempfile
+import time
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from benchmarks.fake_telegram import FakeTelegramRequest
+from bot import build_application
+import config.config_loader as config_loader
+from config.config_store import CONFIG_STORE, ConfigSnapshot
+from utils.webhook import SECRET_HEADER, run_webhook
+
+N_UPDATES = 500
+CHATS = 50
+SECRET = "bench-secret"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _update(update_id: int) -> dict:
+    chat_id = -1000 - update_id % CHATS
+    user = {"id": 500 + update_id % 7, "is_bot": False, "first_name": "Тест", "username": f"user{update_id % 7}"}
+    target = {"id": 900, "is_bot": False, "first_name": "Цель", "username": "target"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup"},
+            "from": user,
+            "text": "обнять",
+            "reply_to_message": {
+                "message_id": 1, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "supergroup"}, "from": target, "text": "привет",
+            },
+        },
+    }
+
+
+class _Client:
+    """HTTP/1.1-клиент с keep-alive поверх asyncio, ровно настолько, насколько нужно бенчмарку."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self._reader = self._writer = None
+
+    async def request(self, method: str, path: str, body: dict | None = None, headers: dict | None = None):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection("127.0.0.1", self.port)
+        payload = json.dumps(body).encode() if body is not None else b""
+        lines = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(payload)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + payload)
+        await self._writer.drain()
+
+        head = (await self._reader.readuntil(b"\r\n\r\n")).decode()
+        status = int(head.split(" ", 2)[1])
+        length = int(next(l.split(":")[1] for l in head.split("\r\n") if l.lower().startswith("content-length")))
+        data = await self._reader.readexactly(length)
+        if "connection: close" in head.lower():
+            self.close()
+        return status, json.loads(data) if data else None
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+async def main() -> None:
+    request = FakeTelegramRequest()
+    # Бенчмарк не должен трогать data/ (справочник участников и состояние)
+    raw = {
+        **CONFIG_STORE.current.raw, "BOT_TOKEN": "1:fake",
+        "MEMBER_DIRECTORY": {"persist": False}, "STATE_BACKEND": {"type": "memory"},
+    }
+    app = build_application(ConfigSnapshot.build(raw), request=request)
+
+    sent_at: dict[int, float] = {}
+    latencies: list[float] = []
+    all_done = asyncio.Event()
+
+    async def record(update: Update, context) -> None:
+        latencies.append(time.perf_counter() - sent_at[update.update_id])
+        if len(latencies) == N_UPDATES:
+            all_done.set()
+
+    app.add_handler(TypeHandler(Update, record), group=-2)
+
+    port = _free_port()
+    stop = asyncio.Event()
+    options = {"listen": "127.0.0.1", "port": port, "secret_token": SECRET}
+    runner = asyncio.create_task(run_webhook(app, options, stop))
+
+    client = _Client(port)
+    for _ in range(100):
+        try:
+            status, health = await client.request("GET", "/healthz")
+            if status == 200:
+                break
+        except OSError:
+            pass
+        await asyncio.sleep(0.05)
+    print(f"health: {status} {health}")
+
+    status, _ = await client.request("POST", "/telegram", _update(0), {SECRET_HEADER: "wrong"})
+    print(f"неверный secret token: {status}")
+    status, _ = await client.request("GET", "/nope")
+    print(f"неизвестный путь: {status}")
+
+    started = time.perf_counter()
+    for update_id in range(1, N_UPDATES + 1):
+        sent_at[update_id] = time.perf_counter()
+        status, _ = await client.request("POST", "/telegram", _update(update_id), {SECRET_HEADER: SECRET})
+        assert status == 200, status
+    await asyncio.wait_for(all_done.wait(), 30)
+    elapsed = time.perf_counter() - started
+
+    # Даём очередям отправки и удаления немного поработать
+    await asyncio.sleep(1.5)
+    status, health = await client.request("GET", "/healthz")
+    client.close()
+    stop.set()
+    await runner
+
+    latencies.sort()
+    print(f"апдейтов: {N_UPDATES} за {elapsed:.2f} с ({N_UPDATES / elapsed:.0f}/с)")
+    print(f"POST → обработчик: median {statistics.median(latencies) * 1e3:.2f} мс, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1e3:.2f} мс")
+    print(f"health после прогона: {health}")
+    print(f"вызовы Bot API: {dict(request.calls)}")
+
+
+if __name__ == "__main__":
+    # Снимки YAML — во временный каталог, а не в data/
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        config_loader.SNAPSHOT_DIR = snapshot_dir
+        asyncio.run(main())
@@ -0,0 +1,149 @@
+"""
+Поддельный Bot API для бенчмарков: подставляется в Bot через request=FakeTelegramRequest(),
+так что весь код PTB (сериализация, разбор ошибок, RetryAfter) работает как с настоящим Telegram,
+но без сети. Умеет задержку, случайные ошибки и лимиты Telegram на отправку.
+"""
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict, deque
+
+from telegram.request import BaseRequest, RequestData
+
+BOT_USER = {"id": 1000, "is_bot": True, "first_name": "Maid", "username": "maid_bot"}
+
+# Методы, на которые Telegram накладывает лимиты на отправку
+LIMITED_METHODS = {"sendMessage", "editMessageText"}
+
+
+class FakeTelegramRequest(BaseRequest):
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        global_per_second: int | None = None,
+        group_per_minute: int | None = None,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.global_per_second = global_per_second
+        self.group_per_minute = group_per_minute
+        self.calls: Counter = Counter()
+        self.flood_waits = 0
+        self.errors = 0
+        self.deleted: set[tuple[int, int]] = set()
+        self._random = random.Random(seed)
+        self._message_ids: dict[int, int] = defaultdict(lambda: 10_000)
+        self._global_log: deque[float] = deque()
+        self._chat_log: dict[int, deque[float]] = defaultdict(deque)
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def api_calls(self) -> int:
+        return sum(count for method, count in self.calls.items() if method != "getMe")
+
+    async def do_request(self, url, method, request_data: RequestData | None = None, **kwargs):
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if endpoint == "getMe":
+            return self._ok(BOT_USER)
+
+        if endpoint in LIMITED_METHODS:
+            retry_after = self._check_limits(int(params["chat_id"]))
+            if retry_after:
+                self.flood_waits += 1
+                return self._error(429, f"Too Many Requests: retry after {retry_after}", retry_after)
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            return self._error(400, "Bad Request: injected error")
+
+        handler = getattr(self, f"_api_{endpoint}", None)
+        if handler is None:
+            return self._ok(True)
+        return handler(params)
+
+    def _check_limits(self, chat_id: int) -> int:
+        now = time.monotonic()
+        if self.global_per_second:
+            log = self._global_log
+            while log and now - log[0] >= 1:
+                log.popleft()
+            if len(log) >= self.global_per_second:
+                return 1
+        if self.group_per_minute and chat_id < 0:
+            log = self._chat_log[chat_id]
+            while log and now - log[0] >= 60:
+                log.popleft()
+            if len(log) >= self.group_per_minute:
+                return max(1, int(60 - (now - log[0])) + 1)
+            log.append(now)
+        if self.global_per_second:
+            self._global_log.append(now)
+        return 0
+
+    def _message(self, params, message_id=None):
+        chat_id = int(params["chat_id"])
+        if message_id is None:
+            self._message_ids[chat_id] += 1
+            message_id = self._message_ids[chat_id]
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+
+    def _api_sendMessage(self, params):
+        return self._ok(self._message(params))
+
+    def _api_editMessageText(self, params):
+        return self._ok(self._message(params, int(params["message_id"])))
+
+    def _api_deleteMessage(self, params):
+        key = (int(params["chat_id"]), int(params["message_id"]))
+        if key in self.deleted:
+            return self._error(400, "Bad Request: message to delete not found")
+        self.deleted.add(key)
+        return self._ok(True)
+
+    def _api_deleteMessages(self, params):
+        chat_id = int(params["chat_id"])
+        ids = params["message_ids"]
+        if isinstance(ids, str):
+            ids = json.loads(ids)
+        self.deleted.update((chat_id, int(i)) for i in ids)
+        return self._ok(True)
+
+    def _api_getChatMember(self, params):
+        user_id = params["user_id"]
+        return self._ok({
+            "status": "member",
+            "user": {"id": int(user_id) if str(user_id).isdigit() else 4242, "is_bot": False, "first_name": str(user_id)},
+        })
+
+    @staticmethod
+    def _ok(result):
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    @staticmethod
+    def _error(code, description, retry_after=None):
+        payload = {"ok": False, "error_code": code, "description": description}
+        if retry_after:
+            payload["parameters"] = {"retry_after": retry_after}
+        return code, json.dumps(payload).encode()
@@ -1,14 +1,32 @@
+import asyncio
 import logging
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, CallbackQueryHandler
-
-from config.config_loader import load_config
-from handlers.admin_handler import add_action, delete_action
+from telegram import Update
+from telegram.request import BaseRequest, HTTPXRequest
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, MessageHandler, TypeHandler, filters, CallbackQueryHandler
+
+from config.actions_registry import ACTIONS_REGISTRY
+from config.actions_catalogue import ACTIONS_DB_PATH, open_catalogue
+from config.actions_store import ACTIONS_STORE
+from config.async_io import run_in_io_thread
+from config.config_store import CONFIG_STORE, ConfigSnapshot
+from handlers.admin_handler import add_action, delete_action, show_stats
 from handlers.command_handler import CustomCommandHandler
 from handlers.mute_handler import MuteManager
-from handlers.actions_handler import handle_actions  # handle_actions всегда подгружает свежий actions.yaml
+from handlers.actions_handler import handle_actions  # действия берутся из ACTIONS_REGISTRY
 
 # Новые импорты для листинга действий
 from handlers.actions_list_handler import list_actions, get_actions_callback_handler
+from handlers.inline_handler import get_inline_handler
+from utils.delete_queue import DELETE_QUEUE
+from utils.member_directory import MEMBERS_PATH, MEMBER_DIRECTORY, observe_members
+from utils.metrics import MATCH, METRICS, InstrumentedRequest, MetricsServer, instrument, set_outcome
+from utils.outbound import OUTBOUND
+from utils.rate_limit import ACTION_THROTTLE, RATE_LIMITER
+from utils.scheduler import SCHEDULER
+from utils.sharding import Shard, ShardRouter, build_front_application
+from utils.state_backend import make_state_backend
+from utils.update_processor import DEFAULT_MAX_CONCURRENT, DEFAULT_MAX_PENDING, ChatOrderedUpdateProcessor
+from utils.webhook import run_webhook
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -16,81 +34,208 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Глобальная переменная с конфигом, которую будем перезагружать по команде
-CONFIG = load_config()
-
-
-def get_config() -> dict:
-    return CONFIG
+# Размер пула соединений к Bot API — как у ApplicationBuilder по умолчанию
+BOT_POOL_SIZE = 256
 
+def get_config() -> ConfigSnapshot:
+    # Всегда актуальный неизменяемый снимок конфига
+    return CONFIG_STORE.current
 
-def reload_config() -> None:
-    global CONFIG
-    CONFIG = load_config()
-    # При перезагрузке конфига имеет смысл очистить кэш админов, если он где-то кэшируется.
-    # В handlers/admin_handler.ADMINS_CACHE можно, например, сбрасывать:
-    try:
-        from handlers.admin_handler import ADMINS_CACHE
-        ADMINS_CACHE = None
-    except ImportError:
-        pass
 
+async def reload_config() -> None:
+    # При шардировании команда доходит до одного воркера; остальные перечитают
+    # config.yaml и actions.yaml сами, заметив смену их сигнатуры
+    await CONFIG_STORE.areload()
+    await ACTIONS_REGISTRY.arefresh(force=True)
     logger.info("🔄 Конфиг перезагружен")
 
 
+@instrument("reload")
 async def reload_command(update, context) -> None:
     user_id = update.effective_user.id
-    admins = get_config().get("ADMINS", [])
-    if user_id not in admins:
-        await update.message.reply_text("🚫 У вас нет доступа к этой команде.")
+    if not get_config().is_admin(user_id):
+        set_outcome("denied")
+        OUTBOUND.reply(update.message, "🚫 У вас нет доступа к этой команде.")
         return
+    set_outcome(MATCH)
+
+    await reload_config()
+    OUTBOUND.reply(update.message, "🔄 Конфигурация перезагружена.")
+
+
+def build_application(
+    config: ConfigSnapshot, request: BaseRequest | None = None, shard: Shard | None = None
+) -> Application:
+    """
+    Собирает приложение со всеми обработчиками. Одна и та же сборка используется
+    и при long polling, и в режиме вебхука, и в воркере шарда (shard — его доля чатов;
+    апдейты тогда приходят от фронт-процесса, а не из getUpdates).
+    request подменяет HTTP-клиент к Bot API.
+    """
+    members_cfg = config.get("MEMBER_DIRECTORY") or {}
+    members_path = MEMBERS_PATH
+    owns = None
+    if shard is not None and shard.count > 1:
+        owns = shard.owns
+        # У каждого воркера свои чаты — и свой файл справочника участников
+        members_path = MEMBERS_PATH.replace(".json", f".{shard.index}.json")
+
+    # Кляпы, кулдауны и отложенные удаления переживают рестарт (и общие для всех воркеров)
+    store = make_state_backend(config.get("STATE_BACKEND"))
+
+    # Метрики в формате Prometheus; у воркеров шарда — каждый на своём порту
+    metrics_cfg = dict(config.get("METRICS") or {})
+    if shard is not None and metrics_cfg.get("port"):
+        metrics_cfg["port"] = int(metrics_cfg["port"]) + shard.index
+    metrics_server = MetricsServer(metrics_cfg) if metrics_cfg.get("enabled") else None
 
-    reload_config()
-    await update.message.reply_text("🔄 Конфигурация перезагружена.")
+    # 0. Менеджер «кляпа»
+    mute_mgr = MuteManager(get_config, store)
+    cmd_handler = CustomCommandHandler(get_config)
 
+    async def post_init(application) -> None:
+        # Единый планировщик всех отложенных удалений и окончаний кляпов
+        SCHEDULER.start()
+        # Действия из SQLite-каталога вместо actions.yaml, если так задано в конфиге
+        if config.get("ACTIONS_BACKEND") == "sqlite":
+            catalogue = await run_in_io_thread(open_catalogue, config.get("ACTIONS_DB") or ACTIONS_DB_PATH)
+            ACTIONS_REGISTRY.use_source(catalogue)
+        elif owns is not None:
+            # Журнал actions.yaml пишут несколько процессов — сворачивать его одному небезопасно
+            ACTIONS_REGISTRY.source.compactable = False
+        # Первая загрузка действий — в пуле потоков, до приёма апдейтов
+        await ACTIONS_REGISTRY.arefresh(force=True)
+        # Все удаления сообщений идут пачками через DELETE_QUEUE
+        DELETE_QUEUE.attach(application.bot, store)
+        # Кулдауны команд (и прочие лимиты по ключам) сохраняются в то же хранилище
+        RATE_LIMITER.attach(store)
+        # Все send/edit идут через очередь с лимитами Telegram
+        limits = dict(get_config().get("RATE_LIMITS") or {})
+        if owns is not None:
+            # Общий лимит — на токен бота, а не на процесс: делим его между воркерами
+            limits["global_per_second"] = max(1, int(limits.get("global_per_second", 30)) // shard.count)
+        OUTBOUND.configure(limits)
+        OUTBOUND.attach(application.bot)
+        OUTBOUND.start()
+        MEMBER_DIRECTORY.configure(members_cfg)
+        if members_cfg.get("persist"):
+            MEMBER_DIRECTORY.load(members_path)
+        await mute_mgr.restore(application, owns)
+        await cmd_handler.restore(owns)
+        await DELETE_QUEUE.restore(owns)
+        if metrics_server is not None:
+            await metrics_server.start()
+
+    # Разные чаты обрабатываются параллельно, один чат — строго по порядку
+    processing_cfg = config.get("UPDATE_PROCESSING") or {}
+    max_pending = int(processing_cfg.get("max_pending", DEFAULT_MAX_PENDING))
+    processor = ChatOrderedUpdateProcessor(
+        int(processing_cfg.get("max_concurrent", DEFAULT_MAX_CONCURRENT)), max_pending
+    )
 
-def main() -> None:
-    logger.info("🚀 Бот запущен")
-    config = get_config()
-    token = config.get("BOT_TOKEN")
-    if not token:
-        logger.error("❌ BOT_TOKEN не задан в config.yaml")
-        return
+    async def post_stop(application) -> None:
+        # Дорабатываем уже принятые апдейты, пока бот и очереди отправки живы
+        await processor.drain()
+        # Досылаем накопленное (модерация первой) и удаляем сообщения, пока бот не закрыт:
+        # в post_shutdown HTTP-клиент бота уже остановлен
+        await OUTBOUND.stop()
+        await DELETE_QUEUE.flush_all()
+
+    METRICS.gauge("outbound_queue", "Очередь отправки по приоритету", OUTBOUND.depth, "priority")
+    METRICS.gauge("delete_queue", "Сообщений ждут удаления", DELETE_QUEUE.pending)
+    METRICS.gauge("updates_pending", "Апдейтов в обработке", lambda: processor.pending)
+    METRICS.gauge("timers", "Отложенных таймеров по видам", SCHEDULER.kinds, "kind")
+    METRICS.gauge("cooldown_keys", "Активных кулдаунов", lambda: len(RATE_LIMITER))
+    METRICS.gauge(
+        "actions_dropped_total", "RP-действий отброшено анти-флудом", lambda: ACTION_THROTTLE.dropped,
+        "reason", kind="counter"
+    )
 
-    app = ApplicationBuilder().token(token).build()
+    async def post_shutdown(application) -> None:
+        if metrics_server is not None:
+            await metrics_server.stop()
+        # Сворачиваем журнал действий, пока планировщик ещё работает
+        await ACTIONS_STORE.compact()
+        await SCHEDULER.stop()
+        await store.aclose()
+        if members_cfg.get("persist"):
+            MEMBER_DIRECTORY.save(members_path)
+
+    builder = (
+        ApplicationBuilder()
+        .token(config.bot_token)
+        .concurrent_updates(processor)
+        # Ограниченная очередь: при перегрузке getUpdates ждёт, а вебхук отвечает 429
+        .update_queue(asyncio.Queue(maxsize=max_pending))
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+    )
+    # Каждый вызов Bot API считается в METRICS (getUpdates — нет, это ожидание, а не работа)
+    builder = builder.request(InstrumentedRequest(request or HTTPXRequest(connection_pool_size=BOT_POOL_SIZE)))
+    if request is not None:
+        builder = builder.get_updates_request(request)
+    if shard is not None:
+        builder = builder.updater(None)
+    app = builder.build()
+
+    # -1. Справочник участников: запоминаем всех, кого видим, до остальных обработчиков
+    app.add_handler(TypeHandler(Update, observe_members), group=-1)
 
-    # 0. Менеджер «кляпа»
-    mute_mgr = MuteManager(get_config)
     app.add_handler(
         MessageHandler(filters.TEXT & ~filters.COMMAND, mute_mgr.handle_message),
         group=0
     )
 
-    # 1. RP-действия (handle_actions каждый раз читает свежий actions.yaml)
+    # 1. RP-действия (реестр сам перечитывает actions.yaml только при изменении файла)
     app.add_handler(
         MessageHandler(filters.TEXT & ~filters.COMMAND, handle_actions),
         group=1
     )
 
     # 2. Команды из CONFIG["COMMANDS_CONFIG"]
-    cmd_handler = CustomCommandHandler(get_config)
-    for cmd_name in config.get("COMMANDS_CONFIG", {}):
+    for cmd_name in config.commands:
         app.add_handler(
             CommandHandler(cmd_name, cmd_handler.handle, block=False),
             group=2
         )
 
-    # 3. Админ-команды: /reload, /addact, /delact
+    # 3. Админ-команды: /reload, /addact, /delact, /stats
     app.add_handler(CommandHandler("reload", reload_command), group=2)
     app.add_handler(CommandHandler("addact", add_action), group=2)
     app.add_handler(CommandHandler("delact", delete_action), group=2)
+    app.add_handler(CommandHandler("stats", show_stats), group=2)
 
     # 4. Новая команда /actions — выводит список действий с кнопками пагинации
     app.add_handler(CommandHandler("actions", list_actions), group=2)
     # 5. Обработчик нажатий на inline-кнопки (CallbackQuery) от /actions
     app.add_handler(get_actions_callback_handler(), group=2)
+    # 6. Инлайн-подбор действий: «@бот обн @user» (нужен включённый inline mode у бота)
+    app.add_handler(get_inline_handler(), group=2)
+
+    return app
+
+
+def main() -> None:
+    logger.info("🚀 Бот запущен")
+    config = get_config()
+    if not config.bot_token:
+        logger.error("❌ BOT_TOKEN не задан в config.yaml")
+        return
 
-    app.run_polling()
+    # Несколько процессов: фронт принимает апдейты и раздаёт их воркерам по chat_id
+    workers = int((config.get("SHARDING") or {}).get("workers", 0))
+    if workers > 1:
+        app = build_front_application(config.bot_token, ShardRouter(build_application, workers))
+    else:
+        app = build_application(config)
+
+    # Режим получения апдейтов: вебхук (за балансировщиком) или long polling
+    webhook_cfg = config.get("WEBHOOK") or {}
+    if webhook_cfg.get("enabled"):
+        asyncio.run(run_webhook(app, webhook_cfg))
+    else:
+        app.run_polling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,161 @@
+"""
+SQLite-каталог действий (ACTIONS_BACKEND: sqlite в config.yaml) с полнотекстовым поиском FTS5.
+
+Разовый импорт из actions.yaml (при первом запуске он выполняется автоматически):
+
+    python -m config.actions_catalogue import [путь_к_базе]
+"""
+import logging
+import os
+import sqlite3
+import sys
+import threading
+
+from config.actions_registry import YamlActionsSource
+from config.config_loader import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+ACTIONS_DB_PATH = os.path.join(BASE_DIR, "data", "actions.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS actions (
+    name TEXT PRIMARY KEY,
+    template TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+CREATE VIRTUAL TABLE IF NOT EXISTS actions_fts USING fts5(
+    name, template, content='actions', content_rowid='rowid', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS actions_ai AFTER INSERT ON actions BEGIN
+    INSERT INTO actions_fts (rowid, name, template) VALUES (new.rowid, new.name, new.template);
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+END;
+CREATE TRIGGER IF NOT EXISTS actions_ad AFTER DELETE ON actions BEGIN
+    INSERT INTO actions_fts (actions_fts, rowid, name, template)
+    VALUES ('delete', old.rowid, old.name, old.template);
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+END;
+CREATE TRIGGER IF NOT EXISTS actions_au AFTER UPDATE ON actions BEGIN
+    INSERT INTO actions_fts (actions_fts, rowid, name, template)
+    VALUES ('delete', old.rowid, old.name, old.template);
+    INSERT INTO actions_fts (rowid, name, template) VALUES (new.rowid, new.name, new.template);
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+END;
+"""
+
+
+def _fts_query(query: str) -> str:
+    # Каждое слово — префиксный поиск; кавычки экранируем, чтобы ввод не ломал синтаксис FTS
+    words = [w.replace('"', '""') for w in query.lower().split()]
+    return " ".join(f'"{w}"*' for w in words if w)
+
+
+class ActionsCatalogue:
+    """
+    Источник действий для ActionsRegistry на SQLite: первичный ключ по нормализованному
+    имени, индекс FTS5 по именам и шаблонам, счётчик версии в таблице meta
+    (по нему реестр понимает, что пора перечитать каталог).
+    """
+
+    # Сворачивать нечего — каждая запись сразу на месте
+    compactable = False
+
+    def __init__(self, path: str = ACTIONS_DB_PATH):
+        self.path = path
+        # Соединение используется из пула потоков, поэтому доступ через блокировку
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def __str__(self) -> str:
+        return self.path
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def signature(self) -> tuple | None:
+        with self._lock:
+            row = self._db().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return (row[0],)
+
+    def load(self) -> dict[str, str]:
+        with self._lock:
+            return dict(self._db().execute("SELECT name, template FROM actions"))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM actions").fetchone()[0]
+
+    def get(self, name: str) -> str | None:
+        with self._lock:
+            row = self._db().execute("SELECT template FROM actions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, name: str, template: str) -> None:
+        with self._lock, self._db() as conn:
+            conn.execute("INSERT OR REPLACE INTO actions (name, template) VALUES (?, ?)", (name, template))
+
+    def delete(self, name: str) -> None:
+        with self._lock, self._db() as conn:
+            conn.execute("DELETE FROM actions WHERE name = ?", (name,))
+
+    def compact(self) -> None:
+        pass
+
+    def search(self, query: str, limit: int, offset: int = 0) -> list[tuple[str, str]]:
+        """Полнотекстовый поиск по именам и шаблонам, лучшие совпадения первыми."""
+        match = _fts_query(query)
+        if not match:
+            return []
+        with self._lock:
+            return self._db().execute(
+                "SELECT a.name, a.template FROM actions_fts f JOIN actions a ON a.rowid = f.rowid "
+                "WHERE actions_fts MATCH ? ORDER BY bm25(actions_fts, 10.0, 1.0), a.name "
+                "LIMIT ? OFFSET ?",
+                (match, limit, offset)
+            ).fetchall()
+
+    def import_from(self, source: YamlActionsSource) -> int:
+        """Разовый импорт всех действий из YAML-источника (с учётом журнала)."""
+        actions = source.load()
+        with self._lock, self._db() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO actions (name, template) VALUES (?, ?)",
+                [(name, str(template)) for name, template in actions.items()]
+            )
+        return len(actions)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def open_catalogue(path: str = ACTIONS_DB_PATH) -> ActionsCatalogue:
+    """Открывает каталог; пустой при первом запуске заполняется из actions.yaml."""
+    catalogue = ActionsCatalogue(os.path.join(BASE_DIR, path))
+    if catalogue.count() == 0:
+        imported = catalogue.import_from(YamlActionsSource())
+        logger.info(f"📥 Импортировано действий в {path}: {imported}")
+    return catalogue
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "import":
+        print(__doc__)
+        sys.exit(1)
+    target = sys.argv[2] if len(sys.argv) > 2 else ACTIONS_DB_PATH
+    count = ActionsCatalogue(target).import_from(YamlActionsSource())
+    print(f"Импортировано действий: {count} -> {target}")
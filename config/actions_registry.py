@@ -0,0 +1,227 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from types import MappingProxyType
+from typing import Mapping
+
+from config.async_io import run_deduplicated
+from config.config_loader import (
+    ACTIONS_JOURNAL_PATH, ACTIONS_PATH, load_yaml, normalize_actions, replay_journal, save_yaml
+)
+from utils.action_template import ActionTemplate, TemplateError, compile_template
+
+logger = logging.getLogger(__name__)
+
+# Не чаще, чем раз в столько секунд, проверяем mtime/размер actions.yaml
+STAT_INTERVAL = 1.0
+
+
+def compile_actions(actions: dict[str, str]) -> dict[str, ActionTemplate]:
+    """Компилирует шаблоны, пропуская (и логируя) сломанные."""
+    compiled = {}
+    for key, source in actions.items():
+        try:
+            compiled[key] = compile_template(source)
+        except TemplateError as e:
+            logger.error(f"Действие «{key}» пропущено: {e}")
+    return compiled
+
+
+class YamlActionsSource:
+    """
+    Источник действий по умолчанию: actions.yaml плюс журнал изменений (по JSON-строке
+    на операцию). Все методы синхронные и вызываются из пула потоков.
+    """
+
+    # Журнал нужно периодически сворачивать в actions.yaml
+    compactable = True
+
+    def __init__(self, path: str = ACTIONS_PATH, journal_path: str = ACTIONS_JOURNAL_PATH):
+        self.path = path
+        self.journal_path = journal_path
+
+    def __str__(self) -> str:
+        return self.path
+
+    @staticmethod
+    def _stat(path: str) -> tuple[int, int] | None:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def signature(self) -> tuple | None:
+        yaml_sig = self._stat(self.path)
+        journal_sig = self._stat(self.journal_path)
+        if yaml_sig is None and journal_sig is None:
+            return None
+        return yaml_sig, journal_sig
+
+    def load(self) -> dict[str, str]:
+        raw = load_yaml(self.path) if os.path.exists(self.path) else {}
+        return replay_journal(normalize_actions(raw), self.journal_path)
+
+    def add(self, key: str, template: str) -> None:
+        self._append({"op": "add", "key": key, "template": template})
+
+    def delete(self, key: str) -> None:
+        self._append({"op": "del", "key": key})
+
+    def _append(self, record: dict) -> None:
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self) -> None:
+        """Переписывает actions.yaml с учётом журнала и удаляет журнал."""
+        if not os.path.exists(self.journal_path):
+            return
+        # Если упадём между этими шагами, журнал просто применится повторно — операции идемпотентны
+        save_yaml(self.path, dict(sorted(self.load().items())))
+        os.remove(self.journal_path)
+
+
+class ActionsRegistry:
+    """
+    Общий на процесс реестр RP-действий. Источник (по умолчанию actions.yaml с журналом)
+    читается один раз и перечитывается только при смене его сигнатуры, поиск по ключу — O(1).
+    Шаблоны компилируются при загрузке; сломанные записи в реестр не попадают.
+
+    Внутри event loop перечитывание идёт в пуле потоков (arefresh), а current()
+    до его окончания отдаёт предыдущую версию, не блокируя обработку апдейтов.
+    """
+
+    def __init__(self, source=None, stat_interval: float = STAT_INTERVAL):
+        self.source = source or YamlActionsSource()
+        self.stat_interval = stat_interval
+        # Увеличивается при каждой успешной перезагрузке
+        self.version = 0
+        self._actions: Mapping[str, ActionTemplate] = MappingProxyType({})
+        self._sorted_keys: tuple[str, ...] = ()
+        self._signature: tuple | None = None
+        self._next_check = 0.0
+        self._reload_task: asyncio.Task | None = None
+
+    def use_source(self, source) -> None:
+        """Переключает реестр на другой источник; следующий доступ перечитает его."""
+        self.source = source
+        self._signature = None
+        self._next_check = 0.0
+
+    def _changed_signature(self, force: bool) -> tuple[bool, tuple | None]:
+        """Возвращает (нужно_перечитать, сигнатура_файла) с учётом троттлинга stat()."""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False, self._signature
+        self._next_check = now + self.stat_interval
+        signature = self.source.signature()
+        return force or signature != self._signature, signature
+
+    def _parse(self, signature: tuple | None) -> dict[str, ActionTemplate]:
+        # Вызывается и в пуле потоков — не трогает состояние реестра
+        return compile_actions(self.source.load()) if signature else {}
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Перечитывает файл, если он изменился (или force=True), синхронно.
+        Возвращает True, если реестр был обновлён.
+        """
+        changed, signature = self._changed_signature(force)
+        if not changed:
+            return False
+        try:
+            actions = self._parse(signature)
+        except Exception as e:
+            return self._failed(signature, e)
+        return self._apply(signature, actions)
+
+    async def arefresh(self, force: bool = False) -> bool:
+        """То же, что refresh(), но YAML парсится в пуле потоков; параллельные вызовы склеиваются."""
+        changed, signature = self._changed_signature(force)
+        if not changed:
+            return False
+        version = self.version
+        try:
+            actions = await run_deduplicated(("actions", str(self.source), signature), self._parse, signature)
+        except Exception as e:
+            return self._failed(signature, e)
+        if self.version != version and not force:
+            # Пока парсили, реестр уже обновили (apply_change) — результат устарел
+            return False
+        return self._apply(signature, actions)
+
+    def _failed(self, signature: tuple | None, error: Exception) -> bool:
+        # Битый файл не должен стирать рабочий список действий
+        logger.error(f"Не удалось перечитать {self.source}: {error}")
+        self._signature = signature
+        return False
+
+    def _apply(self, signature: tuple | None, actions: dict[str, ActionTemplate]) -> bool:
+        if self.version and actions == dict(self._actions):
+            # Файлы переписаны, но содержимое то же (например, после сворачивания журнала)
+            self._signature = signature
+            return False
+        self._actions = MappingProxyType(actions)
+        self._sorted_keys = tuple(sorted(actions))
+        self._signature = signature
+        self.version += 1
+        logger.info(f"📚 Загружено действий: {len(actions)} (версия {self.version})")
+        return True
+
+    def apply_change(self, key: str, template: ActionTemplate | None) -> None:
+        """
+        Точечно применяет добавление/удаление, уже записанное в источник, без его перечитывания.
+        """
+        actions = dict(self._actions)
+        keys = list(self._sorted_keys)
+        if template is None:
+            if actions.pop(key, None) is not None:
+                del keys[bisect.bisect_left(keys, key)]
+        else:
+            if key not in actions:
+                bisect.insort(keys, key)
+            actions[key] = template
+        self._actions = MappingProxyType(actions)
+        self._sorted_keys = tuple(keys)
+        # Источник уже соответствует памяти — перечитывать его не нужно
+        self._signature = self.source.signature()
+        self.version += 1
+
+    def current(self) -> Mapping[str, ActionTemplate]:
+        """Возвращает актуальный (read-only) словарь действий."""
+        if self.version == 0:
+            # Самая первая загрузка — без неё отдавать нечего
+            self.refresh()
+        elif time.monotonic() >= self._next_check:
+            self._refresh_in_background()
+        return self._actions
+
+    def _refresh_in_background(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.refresh()
+            return
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = loop.create_task(self.arefresh())
+
+    def get(self, key: str) -> ActionTemplate | None:
+        return self.current().get(key)
+
+    def sorted_keys(self) -> tuple[str, ...]:
+        """Отсортированные ключи той же версии, что вернул последний current()."""
+        return self._sorted_keys
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.current()
+
+    def __len__(self) -> int:
+        return len(self.current())
+
+
+ACTIONS_REGISTRY = ActionsRegistry()
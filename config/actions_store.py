@@ -0,0 +1,83 @@
+import asyncio
+import logging
+
+from config.actions_registry import ACTIONS_REGISTRY, ActionsRegistry
+from config.async_io import run_in_io_thread
+from utils.action_template import compile_template
+from utils.scheduler import SCHEDULER
+
+logger = logging.getLogger(__name__)
+
+# Сворачиваем журнал в actions.yaml после стольких операций...
+COMPACT_EVERY = 50
+# ...или через столько секунд после первой несвёрнутой операции
+COMPACT_INTERVAL = 600
+
+
+class ActionsStore:
+    """
+    Изменение списка действий (/addact, /delact). Мутации сериализуются asyncio.Lock,
+    каждая — одна запись в источник реестра (строка журнала или строка в SQLite, O(1) I/O)
+    и точечное обновление реестра. Журнал YAML-источника периодически сворачивается
+    в actions.yaml атомарной записью (tmp + rename).
+    """
+
+    def __init__(self, registry: ActionsRegistry = ACTIONS_REGISTRY):
+        self.registry = registry
+        self._lock = asyncio.Lock()
+        self._uncompacted = 0
+
+    async def add(self, key: str, template: str) -> bool:
+        """Добавляет действие; False — если такое уже есть. Шаблон должен быть проверен заранее."""
+        key = key.strip().lower()
+        compiled = compile_template(template)
+        async with self._lock:
+            # Сверяемся с самой свежей версией источника, а не с тем, что видел обработчик
+            await self.registry.arefresh()
+            if key in self.registry.current():
+                return False
+            await run_in_io_thread(self.registry.source.add, key, template)
+            self.registry.apply_change(key, compiled)
+            self._after_write()
+        return True
+
+    async def delete(self, key: str) -> bool:
+        """Удаляет действие; False — если его не было."""
+        key = key.strip().lower()
+        async with self._lock:
+            await self.registry.arefresh()
+            if key not in self.registry.current():
+                return False
+            await run_in_io_thread(self.registry.source.delete, key)
+            self.registry.apply_change(key, None)
+            self._after_write()
+        return True
+
+    def _after_write(self) -> None:
+        if not self.registry.source.compactable:
+            return
+        self._uncompacted += 1
+        if self._uncompacted >= COMPACT_EVERY:
+            SCHEDULER.schedule("actions_compact", 0, self.compact)
+        elif "actions_compact" not in SCHEDULER:
+            SCHEDULER.schedule("actions_compact", COMPACT_INTERVAL, self.compact)
+
+    async def compact(self) -> None:
+        """Сворачивает журнал источника (для YAML — переписывает actions.yaml)."""
+        if not self.registry.source.compactable:
+            return
+        async with self._lock:
+            SCHEDULER.cancel("actions_compact")
+            try:
+                await run_in_io_thread(self.registry.source.compact)
+            except Exception as e:
+                logger.error(f"Не удалось свернуть журнал действий: {e}")
+                return
+            if self._uncompacted:
+                logger.info("🗜️ Журнал действий свёрнут в actions.yaml")
+            self._uncompacted = 0
+            # Содержимое не изменилось — обновляем только сигнатуру файлов
+            await self.registry.arefresh(force=True)
+
+
+ACTIONS_STORE = ActionsStore()
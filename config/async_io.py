@@ -0,0 +1,38 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable
+
+from config.config_loader import load_yaml
+
+logger = logging.getLogger(__name__)
+
+# Отдельный небольшой пул: парсинг и запись YAML не должны стоять в event loop.
+# Запись — многошаговая (сворачивание журнала действий), поэтому её целиком отдают
+# в run_in_io_thread, а не по одному save_yaml
+_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="config-io")
+
+# Загрузки в процессе: одинаковые запросы ждут одну и ту же future
+_INFLIGHT: dict[Hashable, asyncio.Future] = {}
+
+
+async def run_in_io_thread(func: Callable[..., Any], *args) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(_EXECUTOR, func, *args)
+
+
+async def run_deduplicated(key: Hashable, func: Callable[..., Any], *args) -> Any:
+    """
+    Выполняет func(*args) в пуле потоков. Если такой же ключ уже выполняется,
+    новый вызов не запускает работу повторно, а ждёт тот же результат.
+    """
+    future = _INFLIGHT.get(key)
+    if future is None:
+        future = asyncio.ensure_future(run_in_io_thread(func, *args))
+        _INFLIGHT[key] = future
+        future.add_done_callback(lambda _: _INFLIGHT.pop(key, None))
+    # shield: отмена одного ожидающего не должна отменять загрузку для остальных
+    return await asyncio.shield(future)
+
+
+async def aload_yaml(filename: str) -> dict:
+    return await run_deduplicated(("load_yaml", filename), load_yaml, filename)
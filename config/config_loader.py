@@ -1,35 +1,156 @@
-import yaml
+import hashlib
+import json
+import logging
+import pickle
+import threading
+import time
 import os
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 CONFIG_PATH = os.path.join(BASE_DIR, "config", "config.yaml")
 ACTIONS_PATH = os.path.join(BASE_DIR, "config", "actions.yaml")
+# Журнал изменений действий (/addact, /delact), периодически сворачивается в actions.yaml
+ACTIONS_JOURNAL_PATH = os.path.join(BASE_DIR, "config", "actions.journal")
 
+# Снимки разобранных YAML-файлов: следующий запуск читает pickle вместо парсинга (None — выключено)
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "data", "snapshots")
+# По умолчанию снимок есть только у этих файлов: временные и прочие YAML не оставляют
+# в SNAPSHOT_DIR снимков, которые потом никто не удалит
+SNAPSHOT_FILES = (CONFIG_PATH, ACTIONS_PATH)
+# Меняется вместе с форматом снимка — старые снимки тогда просто игнорируются
+SNAPSHOT_FORMAT = 1
+# Снимку, записанному почти одновременно с правкой файла, по mtime не верим — сверяем хэш
+# (файл могли изменить ещё раз в пределах точности mtime файловой системы)
+SNAPSHOT_MTIME_SLACK_NS = 2_000_000_000
 
-def load_yaml(filename):
-    with open(filename, encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
+logger = logging.getLogger(__name__)
+
+
+def _yaml_loader():
+    # PyYAML импортируется, только когда YAML правда нужно разобрать: с тёплыми снимками
+    # запуск обходится без него (~25 мс на импорт).
+    # libyaml на порядок быстрее чистого Python; если его нет в сборке PyYAML — обычный загрузчик
+    import yaml
+    return yaml, getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _parse_yaml(data: bytes):
+    yaml, loader = _yaml_loader()
+    return yaml.load(data, Loader=loader) or {}
+
+
+def _snapshot_path(filename: str) -> str:
+    name = os.path.basename(filename)
+    # Одноимённые файлы из разных каталогов не должны делить снимок
+    tag = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()[:12]
+    return os.path.join(SNAPSHOT_DIR, f"{name}.{tag}.pickle")
+
+
+def _read_snapshot(path: str) -> tuple | None:
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Снимок {path} не читается и будет пересобран: {e}")
+        return None
+    if not isinstance(snapshot, tuple) or len(snapshot) != 6 or snapshot[0] != SNAPSHOT_FORMAT:
+        return None
+    return snapshot
+
+
+def _write_snapshot(path: str, stat: os.stat_result, digest: str, data) -> None:
+    snapshot = (SNAPSHOT_FORMAT, stat.st_mtime_ns, stat.st_size, digest, time.time_ns(), data)
+    # Воркеры шардов могут писать один снимок одновременно — у каждого свой временный файл
+    tmp_name = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_name, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_name, path)
+    except OSError as e:
+        # Кэш необязателен: без снимка просто парсим YAML каждый раз
+        logger.debug(f"Не удалось записать снимок {path}: {e}")
+
+
+def load_yaml(filename, use_snapshot: bool | None = None):
+    """
+    Разбирает YAML-файл. Результат кэшируется снимком в SNAPSHOT_DIR: если mtime и размер
+    файла те же, YAML не читается вовсе; если изменились, но содержимое то же (хэш совпал) —
+    тоже. Каждый вызов возвращает новый объект, его можно менять.
+    use_snapshot=None — снимок только для файлов из SNAPSHOT_FILES.
+    """
+    if use_snapshot is None:
+        use_snapshot = os.path.abspath(filename) in SNAPSHOT_FILES
+    if not use_snapshot or SNAPSHOT_DIR is None:
+        with open(filename, "rb") as f:
+            return _parse_yaml(f.read())
+
+    stat = os.stat(filename)
+    path = _snapshot_path(filename)
+    snapshot = _read_snapshot(path)
+    if snapshot is not None:
+        _, mtime_ns, size, digest, written_ns, data = snapshot
+        if (mtime_ns, size) == (stat.st_mtime_ns, stat.st_size) and written_ns - mtime_ns > SNAPSHOT_MTIME_SLACK_NS:
+            return data
+
+    with open(filename, "rb") as f:
+        raw = f.read()
+    actual = hashlib.blake2b(raw, digest_size=16).hexdigest()
+    if snapshot is not None and snapshot[3] == actual:
+        # Содержимое не менялось (checkout, touch) — обновим только mtime в снимке
+        data = snapshot[5]
+    else:
+        data = _parse_yaml(raw)
+    _write_snapshot(path, stat, actual, data)
+    return data
 
 
 def save_yaml(filename, data):
-    with open(filename, "w", encoding="utf-8") as f:
-        yaml.safe_dump(data, f, allow_unicode=True)
+    import yaml
+    # Пишем во временный файл рядом и атомарно подменяем: при падении
+    # посреди записи на диске остаётся либо старый, либо новый файл целиком.
+    # У каждого процесса и потока свой временный файл — одновременные записи не смешиваются
+    tmp_name = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_name, "w", encoding="utf-8") as f:
+            yaml.safe_dump(data, f, allow_unicode=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, filename)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
 
 
-def load_actions_normalized():
-    raw = load_yaml(ACTIONS_PATH)
+def normalize_actions(raw: dict) -> dict[str, str]:
     # Нормализуем ключи в нижний регистр
-    return {key.strip().lower(): template for key, template in raw.items()}
-
+    return {str(key).strip().lower(): template for key, template in raw.items()}
 
-def load_config():
-    config = load_yaml(CONFIG_PATH)
-    config["ACTIONS"] = load_actions_normalized()
-    config["_paths"] = {"actions": ACTIONS_PATH}
-    return config
 
+def replay_journal(actions: dict, journal_path: str = ACTIONS_JOURNAL_PATH) -> dict:
+    """
+    Применяет к словарю действий записи журнала (по строке JSON на операцию).
+    Недописанная последняя строка (падение во время записи) пропускается.
+    """
+    try:
+        f = open(journal_path, encoding="utf-8")
+    except FileNotFoundError:
+        return actions
+    with f:
+        for line_no, line in enumerate(f, 1):
+            try:
+                record = json.loads(line)
+                key = record["key"].strip().lower()
+                if record["op"] == "add":
+                    actions[key] = record["template"]
+                elif record["op"] == "del":
+                    actions.pop(key, None)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                logger.warning(f"Пропущена повреждённая строка {line_no} журнала {journal_path}")
+    return actions
 
-def save_actions(actions: dict):
-    # Записываем оригинальный YAML (без нормализации ключей, 
-    # но сохраняем всё в нижнем регистре для единообразия)
-    save_yaml(ACTIONS_PATH, {k.lower(): v for k, v in actions.items()})
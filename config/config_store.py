@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Mapping
+
+from config.async_io import aload_yaml
+from config.config_loader import CONFIG_PATH, load_yaml
+
+logger = logging.getLogger(__name__)
+
+# Не чаще, чем раз в столько секунд, проверяем mtime/размер config.yaml
+STAT_INTERVAL = 1.0
+
+
+def _freeze(value: Any) -> Any:
+    """Рекурсивно превращает dict/list из YAML в неизменяемые MappingProxyType/tuple."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    Неизменяемый снимок config.yaml с заранее посчитанными производными структурами.
+    Обработчики читают только его и никогда не лезут на диск.
+    """
+    raw: Mapping[str, Any]
+    version: int = 0
+    bot_token: str = ""
+    admins: frozenset[int] = frozenset()
+    gags: tuple[str, ...] = ()
+    ungags: tuple[str, ...] = ()
+    mumbles: tuple[str, ...] = ()
+    commands: Mapping[str, Mapping[str, Any]] = field(default_factory=lambda: MappingProxyType({}))
+
+    @classmethod
+    def build(cls, data: dict, version: int = 0) -> "ConfigSnapshot":
+        raw = _freeze(data)
+        commands = raw.get("COMMANDS_CONFIG") or {}
+        return cls(
+            raw=raw,
+            version=version,
+            bot_token=raw.get("BOT_TOKEN") or "",
+            admins=frozenset(int(a) for a in raw.get("ADMINS") or ()),
+            gags=tuple(str(g).lower() for g in raw.get("GAGS") or ()),
+            ungags=tuple(str(u).lower() for u in raw.get("UNGAGS") or ()),
+            mumbles=tuple(raw.get("MUMBLES") or ()),
+            commands=MappingProxyType({str(name).lower(): data for name, data in commands.items()}),
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.raw.get(key, default)
+
+    def is_admin(self, user_id: int) -> bool:
+        return user_id in self.admins
+
+
+class ConfigStore:
+    """
+    Единственное место, где хранится конфиг. При /reload новый снимок собирается
+    целиком и подменяется одним присваиванием, так что читатели всегда видят
+    либо старую, либо новую версию, но не их смесь.
+
+    Как и ActionsRegistry, стор сам замечает смену сигнатуры config.yaml (mtime, размер)
+    и перечитывает его в фоне: при шардировании /reload попадает только в воркер
+    своего чата, а остальные подхватывают изменения так.
+    """
+
+    def __init__(self, path: str = CONFIG_PATH, stat_interval: float = STAT_INTERVAL):
+        self.path = path
+        self.stat_interval = stat_interval
+        self._snapshot: ConfigSnapshot | None = None
+        self._signature: tuple[int, int] | None = None
+        self._next_check = 0.0
+        self._reload_task: asyncio.Task | None = None
+
+    @property
+    def current(self) -> ConfigSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.reload()
+        elif time.monotonic() >= self._next_check:
+            self._refresh_if_changed()
+        return snapshot
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self) -> ConfigSnapshot:
+        signature = self._stat()
+        return self._swap(load_yaml(self.path), signature)
+
+    async def areload(self) -> ConfigSnapshot:
+        """Как reload(), но YAML читается в пуле потоков, не блокируя event loop."""
+        signature = self._stat()
+        return self._swap(await aload_yaml(self.path), signature)
+
+    def use(self, data: dict) -> ConfigSnapshot:
+        """Подставляет конфиг из готового dict вместо config.yaml (бенчмарки, скрипты)."""
+        snapshot = self._swap(data, None)
+        # Файл больше не источник конфига — не следим за ним до явного reload()
+        self._next_check = math.inf
+        return snapshot
+
+    def _refresh_if_changed(self) -> None:
+        self._next_check = time.monotonic() + self.stat_interval
+        signature = self._stat()
+        if signature == self._signature or signature is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._reload_changed(signature)
+            return
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = loop.create_task(self._areload_changed(signature))
+
+    def _reload_changed(self, signature: tuple[int, int]) -> None:
+        try:
+            self.reload()
+        except Exception as e:
+            self._failed(signature, e)
+
+    async def _areload_changed(self, signature: tuple[int, int]) -> None:
+        try:
+            await self.areload()
+        except Exception as e:
+            self._failed(signature, e)
+
+    def _failed(self, signature: tuple[int, int], error: Exception) -> None:
+        # Битый файл не должен подменять рабочий конфиг; перечитаем после следующей правки
+        logger.error(f"Не удалось перечитать {self.path}: {error}")
+        self._signature = signature
+
+    def _swap(self, data: dict, signature: tuple[int, int] | None) -> ConfigSnapshot:
+        version = self._snapshot.version + 1 if self._snapshot else 1
+        snapshot = ConfigSnapshot.build(data, version)
+        self._snapshot = snapshot
+        self._signature = signature
+        self._next_check = time.monotonic() + self.stat_interval
+        logger.info(f"⚙️ Загружен конфиг (версия {version}, админов: {len(snapshot.admins)})")
+        return snapshot
+
+
+CONFIG_STORE = ConfigStore()
@@ -1,84 +1,51 @@
 import logging
-from telegram import Update, MessageEntity
+from telegram import Update
 from telegram.ext import ContextTypes
 
-from config.config_loader import load_actions_normalized
+from config.config_store import CONFIG_STORE
+from utils.delete_queue import DELETE_QUEUE
+from utils.metrics import MATCH, instrument, set_outcome
+from utils.outbound import ACTION as ACTION_PRIORITY, OUTBOUND
+from utils.rate_limit import ACTION_THROTTLE
+from utils.trigger_matcher import ACTION, display_name, get_trigger_match
 
 logger = logging.getLogger(__name__)
 
 
+@instrument("actions")
 async def handle_actions(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
-    Обработчик RP-действий. На каждое входящее текстовое сообщение (не-команду)
-    перечитываем актуальный список ACTIONS из actions.yaml, удаляем сообщение пользователя
-    и отправляем только ответ бота.
+    Обработчик RP-действий. Сообщение уже разобрано общим TriggerMatcher'ом
+    (результат лежит в context после группы 0), действие найдено в ACTIONS_REGISTRY.
+    Удаляем сообщение пользователя и отправляем только ответ бота.
     """
-    ACTIONS = load_actions_normalized()  # каждый раз свежие данные из config/actions.yaml
     message = update.message
     if not message or not message.text:
         return
 
-    text = message.text
-    lower_text = text.lower()
-
-    mentioned_user = None
-    action_key = None
-
-    # 1) Сначала ищем «text_mention» — это entity с готовым ent.user
-    for ent in message.entities or []:
-        if ent.type == "text_mention" and ent.user:
-            mentioned_user = f"@{ent.user.username}" if ent.user.username else ent.user.first_name
-            start = ent.offset + ent.length
-            action_key = text[start:].strip().lower()
-            break
-
-    # 2) Если не было text_mention, ищем ручное @mention
-    if not mentioned_user:
-        for ent in message.entities or []:
-            if ent.type == "mention":
-                uname = text[ent.offset : ent.offset + ent.length]  # вида "@username"
-                mentioned_user = uname
-                start = ent.offset + ent.length
-                action_key = text[start:].strip().lower()
-                break
-
-    # 3) Если mention не было, но сообщение – reply
-    if not mentioned_user and message.reply_to_message:
-        target = message.reply_to_message.from_user
-        mentioned_user = f"@{target.username}" if target.username else target.first_name
-        action_key = text.strip().lower()
-
-    if not mentioned_user or not action_key:
+    config = CONFIG_STORE.current
+    match = get_trigger_match(update, context, config)
+    if match.kind != ACTION:
         return
 
-    # Убираем лишние пробелы и знаки
-    action_key = action_key.strip().rstrip('.,!')
-
-    template = ACTIONS.get(action_key)
-    if not template:
+    sender = message.from_user
+    # Анти-флуд: сверх лимита пользователя или чата действие молча пропускаем,
+    # не тратя на него ни удаление, ни отправку
+    if not ACTION_THROTTLE.allow(message.chat.id, sender.id, config):
+        set_outcome("throttled")
         return
+    set_outcome(MATCH)
 
-    sender = message.from_user
-    sender_name = f"@{sender.username}" if sender.username else sender.first_name
+    template = match.template
+    mentioned_user = match.target_name
+    sender_name = display_name(sender)
 
-    try:
-        # Формируем ответ
-        response = template.format(user1=sender_name, user2=mentioned_user)
-    except KeyError as e:
-        logger.error(f"Ошибка форматирования шаблона для действия «{action_key}»: отсутствует плейсхолдер {e}")
-        return
-    except Exception as e:
-        logger.error(f"Не удалось сгенерировать ответ для действия «{action_key}»: {e}")
-        return
+    # Шаблон скомпилирован и проверен при загрузке реестра — рендер не может упасть
+    response = template.render(sender_name, mentioned_user)
 
-    # Пытаемся удалить исходное сообщение
-    try:
-        await message.delete()
-    except Exception as e:
-        logger.warning(f"Не удалось удалить сообщение пользователя {message.from_user.id}: {e}")
+    # Исходное сообщение удалится пачкой вместе с остальными в этом чате
+    DELETE_QUEUE.delete(message.chat.id, message.message_id)
 
-    # Отправляем ответ бота (не как reply, а как обычное сообщение)
-    try:
-        await context.bot.send_message(chat_id=message.chat.id, text=response)
-    except Exception as e:
-        logger.error(f"Ошибка при отправке ответа для действия «{action_key}»: {e}")
+    # Отправляем ответ бота (не как reply, а как обычное сообщение) через очередь с лимитами;
+    # ошибки отправки логирует сам OUTBOUND
+    OUTBOUND.send_message(message.chat.id, response, priority=ACTION_PRIORITY)
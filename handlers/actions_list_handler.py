@@ -1,13 +1,18 @@
 # handlers/actions_list_handler.py
 
+import html
 import math
 import logging
+from collections import OrderedDict
 
-from datetime import datetime
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes, CallbackQueryHandler
 
-from config.config_loader import load_actions_normalized
+from config.actions_registry import ACTIONS_REGISTRY, ActionsRegistry
+from config.async_io import run_in_io_thread
+from utils.delete_queue import DELETE_QUEUE
+from utils.metrics import MATCH, instrument, set_outcome
+from utils.outbound import ACTION, OUTBOUND
 
 logger = logging.getLogger(__name__)
 
@@ -17,180 +22,224 @@ ITEMS_PER_PAGE = 20
 # Через сколько секунд удалять сообщение с листингом
 ACTION_DELETE_TIMEOUT = 180
 
-# Словарь для хранения запущенных задач (job) удаления:
-# ключ = (chat_id, message_id), значение = Job
-ACTION_JOBS: dict[tuple[int, int], object] = {}
 
-
-def _build_page_text(actions_dict: dict[str, str], page: int) -> tuple[str, int]:
+class _PageCache:
     """
-    Возвращает (текст_страницы, total_pages).
+    Готовые страницы листинга (текст + клавиатура) для одной версии реестра.
+    Пересобираются целиком, только когда меняется ACTIONS_REGISTRY.version,
+    так что страница N отдаётся обычным обращением по индексу.
     """
-    keys = sorted(actions_dict.keys())
-    total_items = len(keys)
-    total_pages = math.ceil(total_items / ITEMS_PER_PAGE) if total_items > 0 else 1
 
-    # Нормализуем номер страницы в диапазоне [0, total_pages-1]
-    page = page % total_pages
+    def __init__(self, registry: ActionsRegistry):
+        self._registry = registry
+        self.version = None
+        self._pages: tuple[tuple[str, InlineKeyboardMarkup], ...] = ()
+
+    def pages(self) -> tuple[tuple[str, InlineKeyboardMarkup], ...]:
+        actions_dict = self._registry.current()
+        if self.version != self._registry.version:
+            self._pages = self._render(actions_dict, self._registry.sorted_keys(), self._registry.version)
+            self.version = self._registry.version
+        return self._pages
+
+    def page(self, page: int) -> tuple[int, str, InlineKeyboardMarkup]:
+        """Возвращает (нормализованный_номер, текст, клавиатура)."""
+        pages = self.pages()
+        # Нормализуем номер страницы в диапазоне [0, total_pages-1]
+        page = page % len(pages)
+        text, keyboard = pages[page]
+        return page, text, keyboard
+
+    @staticmethod
+    def _render(actions_dict, keys, version: int) -> tuple[tuple[str, InlineKeyboardMarkup], ...]:
+        total_items = len(keys)
+        total_pages = math.ceil(total_items / ITEMS_PER_PAGE) if total_items > 0 else 1
+
+        pages = []
+        for page in range(total_pages):
+            slice_keys = keys[page * ITEMS_PER_PAGE:(page + 1) * ITEMS_PER_PAGE]
+            if not slice_keys:
+                body = "❗️ Действий не найдено."
+            else:
+                body = "\n".join(f"• <b>{key}</b>: {actions_dict[key]}" for key in slice_keys)
+            text = (
+                f"📖 Список действий "
+                f"(страница <b>{page+1}</b> из <b>{total_pages}</b>):\n\n"
+                f"{body}"
+            )
+            pages.append((text, _build_keyboard(version, page, total_pages)))
+        return tuple(pages)
+
 
-    start = page * ITEMS_PER_PAGE
-    end = start + ITEMS_PER_PAGE
-    slice_keys = keys[start:end]
+PAGE_CACHE = _PageCache(ACTIONS_REGISTRY)
 
-    if not slice_keys:
-        text = "❗️ Действий не найдено."
-    else:
-        lines = []
-        for key in slice_keys:
-            template = actions_dict[key]
-            lines.append(f"• <b>{key}</b>: {template}")
-        text = "\n".join(lines)
+# Какая (версия, страница) сейчас показана в каждом листинге — чтобы не слать
+# пустые правки при повторных нажатиях. Ограничено по размеру: потеря записи
+# стоит лишь одного лишнего editMessageText.
+MAX_TRACKED_LISTINGS = 512
+_shown: OrderedDict[tuple[int, int], tuple[int, int]] = OrderedDict()
 
-    return text, total_pages
 
+def _remember_shown(chat_id: int, message_id: int, version: int, page: int) -> None:
+    key = (chat_id, message_id)
+    _shown[key] = (version, page)
+    _shown.move_to_end(key)
+    while len(_shown) > MAX_TRACKED_LISTINGS:
+        _shown.popitem(last=False)
 
-def _build_keyboard(page: int, total_pages: int) -> InlineKeyboardMarkup:
+
+async def search_actions(query: str, limit: int = ITEMS_PER_PAGE) -> list[tuple[str, str]]:
+    """
+    Поиск действий: у SQLite-каталога — через FTS5 (в пуле потоков),
+    у YAML-источника — подстрокой по именам и шаблонам в памяти.
+    """
+    source = ACTIONS_REGISTRY.source
+    if hasattr(source, "search"):
+        return await run_in_io_thread(source.search, query, limit)
+
+    needle = query.lower()
+    actions = ACTIONS_REGISTRY.current()
+    found = []
+    # Сначала совпадения по имени, потом по тексту шаблона
+    for by_name in (True, False):
+        for key in ACTIONS_REGISTRY.sorted_keys():
+            hit = needle in key if by_name else (needle not in key and needle in actions[key].source.lower())
+            if hit:
+                found.append((key, actions[key].source))
+                if len(found) >= limit:
+                    return found
+    return found
+
+
+def _build_search_text(query: str, results: list[tuple[str, str]]) -> str:
+    if not results:
+        return f"🔎 По запросу «{html.escape(query)}» ничего не найдено."
+    lines = [f"• <b>{key}</b>: {template}" for key, template in results]
+    return f"🔎 Действия по запросу «{html.escape(query)}»:\n\n" + "\n".join(lines)
+
+
+def _build_keyboard(version: int, page: int, total_pages: int) -> InlineKeyboardMarkup:
     prev_page = (page - 1) % total_pages
     next_page = (page + 1) % total_pages
 
+    # В callback_data зашита версия реестра: по ней отличаем устаревшую клавиатуру
     buttons = [
-        InlineKeyboardButton("⬅️ Назад", callback_data=f"actions:page:{prev_page}"),
+        InlineKeyboardButton("⬅️ Назад", callback_data=f"actions:page:{version}:{prev_page}"),
         InlineKeyboardButton("❌ Убрать", callback_data="actions:delete"),
-        InlineKeyboardButton("Вперёд ➡️", callback_data=f"actions:page:{next_page}")
+        InlineKeyboardButton("Вперёд ➡️", callback_data=f"actions:page:{version}:{next_page}")
     ]
     return InlineKeyboardMarkup([buttons])
 
 
-async def _delete_message_job(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """
-    Задача, которую запускает job_queue: удаляет сообщение и очищает запись из ACTION_JOBS.
-    """
-    data = context.job.data
-    chat_id = data.get("chat_id")
-    message_id = data.get("message_id")
-
-    if chat_id is None or message_id is None:
-        return
-
-    try:
-        await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-    except Exception as e:
-        logger.warning(f"Не удалось удалить сообщение (job): {e}")
-
-    # Удаляем из словаря запоминающих задач
-    ACTION_JOBS.pop((chat_id, message_id), None)
-
-
+@instrument("list_actions")
 async def list_actions(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
-    Отправляет пользователю первое сообщение с листингом действий из actions.yaml,
+    Отправляет пользователю первое сообщение с листингом действий из реестра,
     удаляет команду пользователя и сразу ставит задачу на удаление списка через ACTION_DELETE_TIMEOUT секунд.
     """
+    set_outcome(MATCH)
     # Сразу удаляем сообщение с командой, чтобы не засорять чат
     if update.message:
-        try:
-            await update.message.delete()
-        except Exception:
-            pass
-
-    actions = load_actions_normalized()
-    page = 0
-    text, total_pages = _build_page_text(actions, page)
-    keyboard = _build_keyboard(page, total_pages)
-
-    try:
-        bot_message = await context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text=(
-                f"📖 Список действий "
-                f"(страница <b>{page+1}</b> из <b>{total_pages}</b>):\n\n"
-                f"{text}"
-            ),
+        DELETE_QUEUE.delete(update.message.chat.id, update.message.message_id)
+
+    # /actions <запрос> — режим поиска вместо постраничного листинга
+    if context.args:
+        query = " ".join(context.args)
+        results = await search_actions(query)
+        OUTBOUND.send_message(
+            update.effective_chat.id,
+            _build_search_text(query, results),
+            priority=ACTION,
             parse_mode="HTML",
-            reply_markup=keyboard
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("❌ Убрать", callback_data="actions:delete")
+            ]]),
+            on_sent=_schedule_listing_delete
         )
-    except Exception as e:
-        logger.error(f"Не удалось отправить список действий: {e}")
         return
 
-    # Планируем удаление через ACTION_DELETE_TIMEOUT секунд
-    job = context.job_queue.run_once(
-        _delete_message_job,
-        ACTION_DELETE_TIMEOUT,
-        data={'chat_id': bot_message.chat.id, 'message_id': bot_message.message_id}
+    page, text, keyboard = PAGE_CACHE.page(0)
+    version = PAGE_CACHE.version
+
+    def on_sent(bot_message) -> None:
+        _remember_shown(bot_message.chat.id, bot_message.message_id, version, page)
+        _schedule_listing_delete(bot_message)
+
+    OUTBOUND.send_message(
+        update.effective_chat.id,
+        text,
+        priority=ACTION,
+        parse_mode="HTML",
+        reply_markup=keyboard,
+        on_sent=on_sent
     )
-    ACTION_JOBS[(bot_message.chat.id, bot_message.message_id)] = job
 
 
+def _schedule_listing_delete(bot_message) -> None:
+    # Планируем удаление через ACTION_DELETE_TIMEOUT секунд
+    chat_id, message_id = bot_message.chat.id, bot_message.message_id
+    DELETE_QUEUE.delete_later(chat_id, message_id, ACTION_DELETE_TIMEOUT)
+
+
+@instrument("list_actions_page")
 async def actions_pagination_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Обрабатывает нажатия по inline-кнопкам «⬅️ Назад», «Вперёд ➡️» и «❌ Убрать».
-    При перелистывании отменяет старую задачу удаления и ставит новую.
+    При перелистывании переносит срок таймера удаления.
     """
     query = update.callback_query
     if not query or not query.data:
         return
 
-    data = query.data  # строка вида "actions:page:2" или "actions:delete"
-    await query.answer()  # скрываем «часики»
+    set_outcome(MATCH)
+    data = query.data  # строка вида "actions:page:<версия>:<N>" или "actions:delete"
 
     chat_id = query.message.chat.id
     message_id = query.message.message_id
 
     # Если нажали «❌ Убрать» — просто удаляем сразу сообщение и отменяем job
     if data == "actions:delete":
-        # Отменяем ранее запланированную задачу удаления (если есть)
-        job = ACTION_JOBS.pop((chat_id, message_id), None)
-        if job:
-            job.schedule_removal()
-        try:
-            await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-        except Exception as e:
-            logger.warning(f"Не удалось удалить сообщение с листингом: {e}")
+        await query.answer()  # скрываем «часики»
+        # Отменяем ранее запланированное удаление (если есть) вместе с записью в хранилище
+        DELETE_QUEUE.forget(chat_id, message_id)
+        _shown.pop((chat_id, message_id), None)
+        DELETE_QUEUE.delete(chat_id, message_id)
         return
 
-    # Если нажатие «actions:page:N» — перелистываем страницу
+    # Если нажатие «actions:page:<версия>:<N>» — перелистываем страницу
     if data.startswith("actions:page:"):
+        parts = data.split(":")
         try:
-            page = int(data.split(":")[-1])
+            page = int(parts[-1])
+            # Клавиатуры старого формата (без версии) считаем устаревшими
+            version = int(parts[2]) if len(parts) == 4 else None
         except ValueError:
             return
 
-        actions = load_actions_normalized()
-        text, total_pages = _build_page_text(actions, page)
-        keyboard = _build_keyboard(page, total_pages)
-
-        new_text = (
-            f"📖 Список действий "
-            f"(страница <b>{page+1}</b> из <b>{total_pages}</b>):\n\n"
-            f"{text}"
-        )
-
-        # Отменяем старую задачу удаления (если была)
-        old_job = ACTION_JOBS.pop((chat_id, message_id), None)
-        if old_job:
-            old_job.schedule_removal()
-
-        try:
+        pages = PAGE_CACHE.pages()
+        current_version = PAGE_CACHE.version
+        if version != current_version:
+            # Список изменился с момента отправки: номера страниц могли «уехать»,
+            # поэтому показываем ближайшую существующую страницу новой версии
+            await query.answer("🔄 Список обновлён")
+            page = min(page, len(pages) - 1)
+        else:
+            await query.answer()  # скрываем «часики»
+        page, text, keyboard = PAGE_CACHE.page(page)
+
+        # Повторное нажатие на уже показанную страницу — правка ничего не изменит
+        if _shown.get((chat_id, message_id)) != (current_version, page):
+            _remember_shown(chat_id, message_id, current_version, page)
             # Редактируем текст и клавиатуру в том же сообщении
-            await context.bot.edit_message_text(
-                chat_id=chat_id,
-                message_id=message_id,
-                text=new_text,
+            OUTBOUND.edit_message_text(
+                chat_id, message_id, text,
+                priority=ACTION,
                 parse_mode="HTML",
                 reply_markup=keyboard
             )
-        except Exception as e:
-            logger.warning(f"Не удалось обновить страницу списка действий: {e}")
-            return
 
-        # Ставим новую задачу удаления для обновлённого сообщения
-        job = context.job_queue.run_once(
-            _delete_message_job,
-            ACTION_DELETE_TIMEOUT,
-            data={'chat_id': chat_id, 'message_id': message_id}
-        )
-        ACTION_JOBS[(chat_id, message_id)] = job
+        # Продлеваем срок жизни листинга: обычно это просто смена deadline у таймера
+        DELETE_QUEUE.delete_later(chat_id, message_id, ACTION_DELETE_TIMEOUT)
         return
 
     # В остальных случаях ничего не делаем
@@ -198,4 +247,4 @@ async def actions_pagination_handler(update: Update, context: ContextTypes.DEFAU
 
 
 def get_actions_callback_handler() -> CallbackQueryHandler:
-    return CallbackQueryHandler(actions_pagination_handler, pattern=r"^actions:(?:page:\d+|delete)$")
+    return CallbackQueryHandler(actions_pagination_handler, pattern=r"^actions:(?:page:(?:\d+:)?\d+|delete)$")
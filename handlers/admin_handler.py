@@ -1,31 +1,31 @@
+import html
 import logging
 import re
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from config.config_loader import load_config, save_actions
+from config.actions_store import ACTIONS_STORE
+from config.config_store import CONFIG_STORE
+from utils.action_template import TemplateError, compile_template
+from utils.metrics import (
+    API_CALLS, API_SECONDS, HANDLER_CALLS, HANDLER_SECONDS, MATCH, METRICS, instrument, set_outcome
+)
+from utils.outbound import OUTBOUND
 
 logger = logging.getLogger(__name__)
 
-ADMINS_CACHE: list[int] | None = None  # кэш админов при первом обращении
-
-
-def _get_admins() -> list[int]:
-    global ADMINS_CACHE
-    if ADMINS_CACHE is None:
-        cfg = load_config()
-        ADMINS_CACHE = cfg.get("ADMINS", [])
-    return ADMINS_CACHE
-
 
+@instrument("addact")
 async def add_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    if user_id not in _get_admins():
-        await update.message.reply_text("🚫 У вас нет доступа к этой команде.")
+    if not CONFIG_STORE.current.is_admin(user_id):
+        set_outcome("denied")
+        OUTBOUND.reply(update.message, "🚫 У вас нет доступа к этой команде.")
         return
+    set_outcome(MATCH)
 
     if len(context.args) == 0 or ':' not in ' '.join(context.args):
-        await update.message.reply_text("Использование: /addact команда: шаблон")
+        OUTBOUND.reply(update.message, "Использование: /addact команда: шаблон")
         return
 
     text = ' '.join(context.args)
@@ -33,53 +33,97 @@ async def add_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     action = parts[0].strip().lower()
     template = parts[1].strip()
 
+    # Проверяем шаблон до сохранения: сломанное действие не должно попасть в actions.yaml
     try:
-        # Загрузим существующие действия, обновим и сохраним
-        cfg = load_config()
-        actions = cfg.get("ACTIONS", {})
-        if action in actions:
-            await update.message.reply_text(f"⚠️ Действие «{action}» уже существует.")
-            return
+        compile_template(template)
+    except TemplateError as e:
+        OUTBOUND.reply(update.message, f"❌ Некорректный шаблон: {e}")
+        return
 
-        actions[action] = template
-        save_actions(actions)
-        # Сбросим кэш админов (на случай, если они редактировали ADMINS в config.yaml)
-        global ADMINS_CACHE
-        ADMINS_CACHE = None
+    try:
+        # Одна строка в журнал вместо перезаписи всего actions.yaml
+        if not await ACTIONS_STORE.add(action, template):
+            OUTBOUND.reply(update.message, f"⚠️ Действие «{action}» уже существует.")
+            return
 
-        await update.message.reply_text(f"✅ Добавлено действие: «{action}»")
+        OUTBOUND.reply(update.message, f"✅ Добавлено действие: «{action}»")
     except Exception as e:
         logger.error(f"Ошибка при добавлении действия: {e}")
-        await update.message.reply_text("❌ Произошла ошибка при добавлении действия.")
+        OUTBOUND.reply(update.message, "❌ Произошла ошибка при добавлении действия.")
 
 
+@instrument("delact")
 async def delete_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    if user_id not in _get_admins():
-        await update.message.reply_text("🚫 У вас нет доступа к этой команде.")
+    if not CONFIG_STORE.current.is_admin(user_id):
+        set_outcome("denied")
+        OUTBOUND.reply(update.message, "🚫 У вас нет доступа к этой команде.")
         return
+    set_outcome(MATCH)
 
     if len(context.args) == 0:
-        await update.message.reply_text("Использование: /delact команда")
+        OUTBOUND.reply(update.message, "Использование: /delact команда")
         return
 
     action = ' '.join(context.args).strip().lower()
 
     try:
-        cfg = load_config()
-        actions = cfg.get("ACTIONS", {})
-
-        if action not in actions:
-            await update.message.reply_text(f"❌ Действие «{action}» не найдено.")
+        if not await ACTIONS_STORE.delete(action):
+            OUTBOUND.reply(update.message, f"❌ Действие «{action}» не найдено.")
             return
 
-        del actions[action]
-        save_actions(actions)
-        # Сбросим кэш админов для перестраховки
-        global ADMINS_CACHE
-        ADMINS_CACHE = None
-
-        await update.message.reply_text(f"🗑️ Действие «{action}» удалено.")
+        OUTBOUND.reply(update.message, f"🗑️ Действие «{action}» удалено.")
     except Exception as e:
         logger.error(f"Ошибка при удалении действия: {e}")
-        await update.message.reply_text("❌ Произошла ошибка при удалении действия.")
+        OUTBOUND.reply(update.message, "❌ Произошла ошибка при удалении действия.")
+
+
+def _ms(seconds: float | None) -> str:
+    if seconds is None:
+        return "—"
+    return "&gt;10 с" if seconds == float("inf") else f"{seconds * 1000:g} мс"
+
+
+def _format_stats() -> str:
+    """Сводка METRICS для /stats: обработчики, Bot API и текущие очереди."""
+    lines = ["📊 <b>Статистика</b>", "", "<b>Обработчики</b> (вызовов · совпадений · p50 / p99):"]
+    handlers: dict[str, dict[str, float]] = {}
+    for (name, outcome), value in HANDLER_CALLS.values.items():
+        handlers.setdefault(name, {})[outcome] = value
+    for name, outcomes in sorted(handlers.items()):
+        others = ", ".join(f"{o}: {v:g}" for o, v in sorted(outcomes.items()) if o not in (MATCH, "no_match"))
+        lines.append(
+            f"• {name}: {sum(outcomes.values()):g} · {outcomes.get(MATCH, 0):g} · "
+            f"{_ms(HANDLER_SECONDS.quantile(0.5, name))} / {_ms(HANDLER_SECONDS.quantile(0.99, name))}"
+            + (f" ({others})" if others else "")
+        )
+
+    lines += ["", "<b>Bot API</b> (вызовов · ошибок · 429 · p99):"]
+    methods: dict[str, dict[str, float]] = {}
+    for (method, outcome), value in API_CALLS.values.items():
+        methods.setdefault(method, {})[outcome] = value
+    for method, outcomes in sorted(methods.items()):
+        lines.append(
+            f"• {method}: {sum(outcomes.values()):g} · {outcomes.get('error', 0):g} · "
+            f"{outcomes.get('retry_after', 0):g} · {_ms(API_SECONDS.quantile(0.99, method))}"
+        )
+
+    lines += ["", "<b>Сейчас</b>:"]
+    for help_text, value in METRICS.read_gauges().values():
+        if hasattr(value, "items"):
+            value = ", ".join(f"{k}: {v:g}" for k, v in value.items()) or "0"
+        else:
+            value = f"{value:g}"
+        lines.append(f"• {html.escape(help_text)}: {value}")
+    return "\n".join(lines)
+
+
+@instrument("stats")
+async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/stats — те же метрики, что отдаются Prometheus, но кратко и прямо в чат (только админам)."""
+    if not CONFIG_STORE.current.is_admin(update.effective_user.id):
+        set_outcome("denied")
+        OUTBOUND.reply(update.message, "🚫 У вас нет доступа к этой команде.")
+        return
+    set_outcome(MATCH)
+    OUTBOUND.reply(update.message, _format_stats(), parse_mode="HTML")
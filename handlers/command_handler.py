@@ -1,20 +1,48 @@
-import asyncio
 import logging
+from typing import Callable
 from telegram import Update
 from telegram.ext import ContextTypes
 
+from utils.delete_queue import DELETE_QUEUE
+from utils.metrics import MATCH, instrument, set_outcome
+from utils.outbound import ACTION, OUTBOUND
+from utils.rate_limit import RATE_LIMITER, SCOPES, USER, scoped_key
+
 logger = logging.getLogger(__name__)
 
+# Значения по умолчанию для команд из COMMANDS_CONFIG
+DEFAULT_COOLDOWN = 180
+DEFAULT_SCOPE = USER
+
 
 class CustomCommandHandler:
     def __init__(self, config_getter):
         self.get_config = config_getter
-        # ключ: "<flag>_<user_id>"
-        self.active_flags: dict[str, bool] = {}
 
+    def _limit(self, flag: str) -> tuple[float, int] | None:
+        """(cooldown, burst) команды с этим флагом по текущему конфигу."""
+        for name, data in self.get_config().commands.items():
+            if (data.get("flag") or name) == flag:
+                return self._command_limit(name, data)
+        return None
+
+    @staticmethod
+    def _command_limit(name: str, data) -> tuple[float, int]:
+        """(cooldown, burst) из COMMANDS_CONFIG: cooldown 0 — без ограничения, burst не меньше 1."""
+        burst = int(data.get("burst", 1))
+        if burst < 1:
+            logger.warning(f"⚠️ burst у /{name} должен быть не меньше 1 (указано {burst}), используем 1")
+            burst = 1
+        return float(data.get("cooldown", DEFAULT_COOLDOWN)), burst
+
+    async def restore(self, owns: Callable[[int], bool] | None = None) -> None:
+        """Поднимает активные кулдауны из хранилища после рестарта (только чаты этого шарда)."""
+        restored = await RATE_LIMITER.restore(self._limit, owns)
+        logger.info(f"⏳ Восстановлено кулдаунов команд: {restored}")
+
+    @instrument("command")
     async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        config = self.get_config()
-        commands = config.get("COMMANDS_CONFIG", {})
+        commands = self.get_config().commands
 
         text = update.message.text or ""
         # Уберём возможный «@BotUsername» после команды
@@ -25,65 +53,49 @@ class CustomCommandHandler:
         if not command_data:
             return
 
-        flag = command_data.get("flag")
-        cache_key = f"{flag}_{user_id}"
+        flag = command_data.get("flag") or command_name
+        scope = command_data.get("scope", DEFAULT_SCOPE)
+        if scope not in SCOPES:
+            logger.warning(f"⚠️ Неизвестная область кулдауна «{scope}» у /{command_name}, используем {DEFAULT_SCOPE}")
+            scope = DEFAULT_SCOPE
+        chat_id = update.effective_chat.id
+        key = scoped_key(flag, scope, chat_id, user_id)
+        cooldown, burst = self._command_limit(command_name, command_data)
 
         # Удаляем сообщение пользователя с командой (если есть права)
-        await self._safe_delete(update.effective_chat.id, update.message.message_id, context)
+        DELETE_QUEUE.delete(chat_id, update.message.message_id)
 
-        # Если флаг ещё активен — отправим warning
-        if cache_key in self.active_flags:
+        # Лимит исчерпан — отправим warning
+        if not RATE_LIMITER.hit(key, cooldown, burst, persist=True):
+            set_outcome("limited")
             warning = command_data.get("warning", "⚠️ Команда уже была использована.")
-            await self._send_temporary_message(update.effective_chat.id, warning, 5, context)
+            await self._send_temporary_message(chat_id, warning, 5, context)
             return
 
-        # Устанавливаем флаг и отправляем основной текст
-        self.active_flags[cache_key] = True
+        set_outcome(MATCH)
         try:
-            bot_message = await context.bot.send_message(
-                chat_id=update.effective_chat.id,
-                text=command_data.get("text", ""),
+            # Обработчик запущен с block=False, поэтому можно дождаться отправки
+            bot_message = await OUTBOUND.send_message(
+                chat_id,
+                command_data.get("text", ""),
+                priority=ACTION,
                 parse_mode="HTML"
             )
         except Exception as e:
             logger.error(f"Не удалось отправить сообщение по команде /{command_name}: {e}")
-            # Если не удалось отправить, сбрасываем флаг, чтобы не блокировать бесконечно
-            self.active_flags.pop(cache_key, None)
+            # Если не удалось отправить, возвращаем использование, чтобы не блокировать зря
+            RATE_LIMITER.refund(key)
             return
 
-        # Через cooldown секунд вернём «флаг» свободным и удалим сообщение
-        cooldown = command_data.get("cooldown", 180)
-        context.job_queue.run_once(
-            self._cleanup,
-            cooldown,
-            data={
-                'chat_id': update.effective_chat.id,
-                'message_id': bot_message.message_id,
-                'cache_key': cache_key
-            }
-        )
+        # Через cooldown секунд удалим сообщение
+        message_id = bot_message.message_id
+        DELETE_QUEUE.delete_later(chat_id, message_id, cooldown)
 
     async def _send_temporary_message(
         self, chat_id: int, text: str, delay: int, context: ContextTypes.DEFAULT_TYPE
     ) -> None:
-        try:
-            msg = await context.bot.send_message(chat_id=chat_id, text=text)
+        OUTBOUND.send_message(
+            chat_id, text, priority=ACTION,
             # Удалим предупреждение через delay секунд
-            asyncio.create_task(self._safe_delete(chat_id, msg.message_id, context, delay))
-        except Exception as e:
-            logger.error(f"Не удалось отправить временное сообщение: {e}")
-
-    async def _safe_delete(
-        self, chat_id: int, message_id: int, context: ContextTypes.DEFAULT_TYPE, delay: int = 0
-    ) -> None:
-        if delay > 0:
-            await asyncio.sleep(delay)
-        try:
-            await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-        except Exception as e:
-            logger.debug(f"Не удалось удалить сообщение {message_id}: {e}")
-
-    async def _cleanup(self, context: ContextTypes.DEFAULT_TYPE) -> None:
-        data = context.job.data
-        await self._safe_delete(data['chat_id'], data['message_id'], context)
-        self.active_flags.pop(data['cache_key'], None)
+            on_sent=lambda msg: DELETE_QUEUE.delete_later(chat_id, msg.message_id, delay)
+        )
@@ -0,0 +1,83 @@
+# handlers/inline_handler.py
+
+import logging
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.ext import ContextTypes, InlineQueryHandler
+
+from utils.action_index import get_action_index
+from utils.metrics import MATCH, instrument, set_outcome
+from utils.trigger_matcher import display_name
+
+logger = logging.getLogger(__name__)
+
+# Сколько результатов отдаём за один ответ (Telegram принимает не больше 50)
+RESULTS_PER_ANSWER = 20
+
+# Сколько секунд клиент Telegram может кэшировать ответ на тот же запрос
+INLINE_CACHE_TIME = 300
+
+# Кого подставлять вместо {user2}, если цель в запросе не указана
+DEFAULT_TARGET = "всех"
+
+
+def _split_target(query: str) -> tuple[str, str | None]:
+    """
+    «обнять @vasya» → ("обнять", "@vasya"): последнее слово с @ — цель действия.
+    """
+    words = query.split()
+    if words and words[-1].startswith("@") and len(words[-1]) > 1:
+        return " ".join(words[:-1]), words[-1]
+    return query, None
+
+
+@instrument("inline")
+async def inline_actions(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Инлайн-подбор действий: «@бот обн @vasya» показывает подходящие действия,
+    а выбранное сразу отправляется в чат готовым текстом.
+    """
+    inline_query = update.inline_query
+    if not inline_query:
+        return
+
+    search_text, target = _split_target(inline_query.query)
+    try:
+        offset = int(inline_query.offset or 0)
+    except ValueError:
+        offset = 0
+
+    index = get_action_index()
+    keys = index.search(search_text)
+    page = keys[offset:offset + RESULTS_PER_ANSWER]
+
+    sender_name = display_name(inline_query.from_user)
+    target_name = target or DEFAULT_TARGET
+    actions = index.actions
+
+    results = []
+    for key in page:
+        text = actions[key].render(sender_name, target_name)
+        results.append(InlineQueryResultArticle(
+            # id уникален в пределах ответа и короче лимита в 64 байта
+            id=f"{index.version}:{offset + len(results)}",
+            title=key,
+            description=text,
+            input_message_content=InputTextMessageContent(text),
+        ))
+
+    if results:
+        set_outcome(MATCH)
+    next_offset = str(offset + len(page)) if offset + len(page) < len(keys) else ""
+
+    # Имя отправителя подставлено в текст, поэтому кэш у клиента — персональный
+    await inline_query.answer(
+        results,
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=True,
+        next_offset=next_offset,
+    )
+
+
+def get_inline_handler() -> InlineQueryHandler:
+    return InlineQueryHandler(inline_actions)
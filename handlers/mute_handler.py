@@ -1,59 +1,98 @@
-import asyncio
 import logging
 import random
-from datetime import datetime, timedelta
-from telegram import Update, User
-from telegram.ext import ContextTypes
-
-from config.config_loader import load_config
-from utils.time_parser import parse_duration, parse_until
+import time
+from datetime import timedelta
+from functools import partial
+from typing import Callable
+from telegram import MessageEntity, Update, User
+from telegram.ext import Application, ContextTypes
+
+from utils.delete_queue import DELETE_QUEUE
+from utils.member_directory import MEMBER_DIRECTORY
+from utils.metrics import MATCH, instrument, set_outcome
+from utils.outbound import MODERATION, MUMBLE, OUTBOUND
+from utils.scheduler import SCHEDULER
+from utils.state_backend import GAGS, SqliteStateBackend, StateBackend
+from utils.time_parser import format_duration, get_timezone, mask_spans, now_in, parse_gag_time
+from utils.trigger_matcher import GAG, UNGAG, get_trigger_match
 
 logger = logging.getLogger(__name__)
 
+# Окно (сек), в течение которого сообщения заглушённого пользователя сворачиваются в одно «мямление»
+MUMBLE_WINDOW = 5
+
+
+class _Mumble:
+    """Видимое «мямление» пользователя в чате и сколько сообщений в него свёрнуто."""
+
+    __slots__ = ("text", "message_id", "count", "shown")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.message_id: int | None = None
+        self.count = 1
+        # Значение count, которое сейчас видно в чате
+        self.shown = 1
+
 
 class MuteManager:
-    def __init__(self, config_getter):
+    def __init__(self, config_getter, store: StateBackend | None = None):
         self.get_cfg = config_getter
-        # active_gags: user_id -> {'job': Job, 'expires': datetime}
-        self.active_gags: dict[int, dict] = {}
+        # Общее хранилище состояния; закрывает его тот, кто создал (bot.build_application)
+        self.store = store or SqliteStateBackend()
+        # active_gags: (chat_id, user_id) -> {'expires': datetime}; окончание — таймер SCHEDULER
+        self.active_gags: dict[tuple[int, int], dict] = {}
+        # mumbles: (chat_id, user_id) -> _Mumble, пока открыто окно свёртки
+        self.mumbles: dict[tuple[int, int], _Mumble] = {}
+
+    async def restore(self, application: Application, owns: Callable[[int], bool] | None = None) -> None:
+        """
+        Поднимает кляпы из хранилища после рестарта и заново планирует их окончание.
+        Вызывается из post_init приложения; owns(chat_id) оставляет только чаты этого шарда.
+        """
+        now = time.time()
+        for (chat_id, user_id), expires in (await self.store.aload(GAGS, now, owns)).items():
+            self._schedule_expiry(chat_id, int(user_id), expires - now)
+        logger.info(f"🔇 Восстановлено кляпов: {len(self.active_gags)}")
+
+    def _schedule_expiry(self, chat_id: int, user_id: int, seconds: float) -> None:
+        # Повторный кляп просто заменяет таймер с тем же ключом
+        SCHEDULER.schedule(
+            ("gag", chat_id, user_id), seconds,
+            partial(self._expire_gag, chat_id, user_id)
+        )
+        self.active_gags[(chat_id, user_id)] = {
+            'expires': now_in() + timedelta(seconds=seconds)
+        }
 
+    @instrument("mute")
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         msg = update.message
         if not msg or not msg.text:
             return
 
-        text = msg.text
-        lower = text.lower()
         cfg = self.get_cfg()
         uid = msg.from_user.id
 
+        # Один проход по тексту: снятие кляпа приоритетнее надевания
+        match = get_trigger_match(update, context, cfg)
+
         # A. Сначала команды на снятие кляпа
-        for cmd in cfg.get('UNGAGS', []):
-            if lower.startswith(cmd):
-                return await self._ungag(msg, context)
+        if match.kind == UNGAG:
+            set_outcome(MATCH)
+            return await self._ungag(msg, context)
 
         # B. Потом команды на надеть кляп
-        for cmd in cfg.get('GAGS', []):
-            if lower.startswith(cmd):
-                return await self._gag(msg, context)
+        if match.kind == GAG:
+            set_outcome(MATCH)
+            return await self._gag(msg, context)
 
         # C. Если пользователь под кляпом, удаляем его сообщение и «мямлим»
-        if uid in self.active_gags:
-            try:
-                await msg.delete()
-            except Exception as e:
-                logger.warning(f"Не удалось удалить сообщение пользователя {uid}: {e}")
-
-            mumble = random.choice(cfg.get('MUMBLES', []))
-            try:
-                sent = await context.bot.send_message(
-                    chat_id=msg.chat.id,
-                    text=f"{self._format_mention(msg.from_user)}: {mumble}"
-                )
-                # Удалим «мямление» через 5 секунд
-                asyncio.create_task(self._delayed_delete(msg.chat.id, sent.message_id, 5, context))
-            except Exception as e:
-                logger.error(f"Ошибка при отправке «мямления» для {uid}: {e}")
+        if (msg.chat.id, uid) in self.active_gags:
+            set_outcome(MATCH)
+            # Исходные сообщения удаляются пачками через DELETE_QUEUE
+            DELETE_QUEUE.delete(msg.chat.id, msg.message_id)
+            self._mumble(msg, cfg)
             return
 
         # D. Иначе – пропускаем дальше
@@ -62,83 +101,115 @@ class MuteManager:
     async def _gag(self, msg: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         target = await self._get_target(msg, context)
         if not target:
-            await msg.reply_text("⚠️ Не найден пользователь для кляпа. Используй reply или @username.")
+            OUTBOUND.reply(msg, "⚠️ Не найден пользователь для кляпа. Используй reply или @username.")
             return
 
-        # Парсим время: либо «10с», «5м», либо «до HH:MM»
-        dur = parse_duration(msg.text)
-        until = parse_until(msg.text)
-        if dur is None and until is None:
-            await msg.reply_text("⚠️ Укажи время: «10с», «5м», «2ч» или «до HH:MM»")
+        # Парсим время за один проход: «10с», «1ч30м», «2 дня» или «до HH:MM», «до DD.MM HH:MM»
+        now = now_in(get_timezone(self.get_cfg().get("TIMEZONE")))
+        seconds = parse_gag_time(self._text_without_mentions(msg), now)
+        if seconds is None:
+            OUTBOUND.reply(msg, "⚠️ Укажи время: «10с», «5м», «1ч30м», «2д», «до HH:MM» или «до DD.MM HH:MM»")
             return
 
-        seconds = dur if dur else int((until - datetime.now()).total_seconds())
         if seconds <= 0:
-            await msg.reply_text("⚠️ Неправильное время.")
+            OUTBOUND.reply(msg, "⚠️ Неправильное время.")
             return
 
-        try:
-            await msg.delete()
-        except Exception as e:
-            logger.warning(f"Не удалось удалить команду для кляпа: {e}")
+        DELETE_QUEUE.delete(msg.chat.id, msg.message_id)
 
         admin = msg.from_user
-        try:
-            await context.bot.send_message(
-                chat_id=msg.chat.id,
-                text=(
-                    f"{self._format_mention(admin)} надел кляп "
-                    f"на {self._format_mention(target)} на {self._format_time_fmt(seconds)}"
-                )
-            )
-        except Exception as e:
-            logger.error(f"Не удалось отправить сообщение о кляпе: {e}")
-
-        job = context.job_queue.run_once(
-            self._expire_gag, seconds,
-            data={'user_id': target.id}
+        OUTBOUND.send_message(
+            msg.chat.id,
+            f"{self._format_mention(admin)} надел кляп "
+            f"на {self._format_mention(target)} на {self._format_time_fmt(seconds)}",
+            priority=MODERATION
         )
-        self.active_gags[target.id] = {
-            'job': job,
-            'expires': datetime.now() + timedelta(seconds=seconds)
-        }
+
+        self._schedule_expiry(msg.chat.id, target.id, seconds)
+        self.store.put(GAGS, (msg.chat.id, str(target.id)), time.time() + seconds)
 
     async def _ungag(self, msg: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         user_id = msg.from_user.id
-        cfg = load_config()  # получаем свежий config, чтобы знать актуальных ADMINS
-        admins = cfg.get("ADMINS", [])
+        cfg = self.get_cfg()  # снимок конфига из памяти, без чтения с диска
 
         target = await self._get_target(msg, context)
         if not target:
-            await msg.reply_text("⚠️ Не найден пользователь для снятия кляпа.")
+            OUTBOUND.reply(msg, "⚠️ Не найден пользователь для снятия кляпа.")
             return
 
         # Если юзер хочет снять чужой кляп, проверяем права
-        if target.id != user_id and user_id not in admins:
-            await msg.reply_text("🚫 Только админ может снять кляп с другого пользователя.")
+        if target.id != user_id and not cfg.is_admin(user_id):
+            OUTBOUND.reply(msg, "🚫 Только админ может снять кляп с другого пользователя.")
             return
 
-        try:
-            await msg.delete()
-        except Exception as e:
-            logger.warning(f"Не удалось удалить команду для снять кляп: {e}")
+        DELETE_QUEUE.delete(msg.chat.id, msg.message_id)
 
-        rec = self.active_gags.pop(target.id, None)
+        rec = self.active_gags.pop((msg.chat.id, target.id), None)
         if rec:
-            rec['job'].schedule_removal()
-            await context.bot.send_message(
-                chat_id=msg.chat.id,
-                text=f"✅ {self._format_mention(target)} освобождён(а) от кляпа"
+            SCHEDULER.cancel(("gag", msg.chat.id, target.id))
+            self.store.remove(GAGS, (msg.chat.id, str(target.id)))
+            OUTBOUND.send_message(
+                msg.chat.id,
+                f"✅ {self._format_mention(target)} освобождён(а) от кляпа",
+                priority=MODERATION
             )
         else:
-            await context.bot.send_message(
-                chat_id=msg.chat.id,
-                text=f"⚠️ {self._format_mention(target)} не был(а) в кляпе"
+            OUTBOUND.send_message(
+                msg.chat.id,
+                f"⚠️ {self._format_mention(target)} не был(а) в кляпе",
+                priority=MODERATION
             )
 
-    async def _expire_gag(self, context: ContextTypes.DEFAULT_TYPE) -> None:
-        uid = context.job.data['user_id']
-        self.active_gags.pop(uid, None)
+    def _mumble(self, msg, cfg) -> None:
+        """
+        Не больше одного видимого «мямления» на пользователя за окно: новые сообщения
+        только увеличивают счётчик, а в конце окна «мямление» один раз правится на «×N».
+        """
+        key = (msg.chat.id, msg.from_user.id)
+        state = self.mumbles.get(key)
+        if state is not None:
+            state.count += 1
+            return
+
+        mumble = random.choice(cfg.mumbles) if cfg.mumbles else "..."
+        state = _Mumble(f"{self._format_mention(msg.from_user)}: {mumble}")
+        self.mumbles[key] = state
+        OUTBOUND.send_message(
+            msg.chat.id, state.text,
+            priority=MUMBLE,
+            on_sent=partial(self._mumble_sent, key, state)
+        )
+        window = cfg.get("MUMBLE_WINDOW", MUMBLE_WINDOW)
+        SCHEDULER.schedule(("mumble", *key), window, partial(self._close_mumble_window, key, window))
+
+    def _mumble_sent(self, key: tuple[int, int], state: _Mumble, sent) -> None:
+        state.message_id = sent.message_id
+        if self.mumbles.get(key) is not state:
+            # Окно уже закрылось, пока сообщение стояло в очереди
+            DELETE_QUEUE.delete(sent.chat.id, sent.message_id)
+
+    def _close_mumble_window(self, key: tuple[int, int], window: float) -> None:
+        state = self.mumbles.get(key)
+        if state is None:
+            return
+        chat_id = key[0]
+        if state.count > state.shown and state.message_id is not None:
+            # За окно пришли новые сообщения — одна правка и ещё одно окно
+            state.shown = state.count
+            OUTBOUND.edit_message_text(
+                chat_id, state.message_id, f"{state.text} ×{state.count}", priority=MUMBLE
+            )
+            SCHEDULER.schedule(("mumble", *key), window, partial(self._close_mumble_window, key, window))
+            return
+
+        # Тишина всё окно — убираем «мямление»
+        del self.mumbles[key]
+        if state.message_id is not None:
+            DELETE_QUEUE.delete(chat_id, state.message_id)
+
+    def _expire_gag(self, chat_id: int, user_id: int) -> None:
+        self.active_gags.pop((chat_id, user_id), None)
+        self.store.remove(GAGS, (chat_id, str(user_id)))
 
     async def _get_target(self, msg: Update, context: ContextTypes.DEFAULT_TYPE) -> User | None:
         # Если reply — цель в reply_to_message
@@ -150,37 +221,25 @@ class MuteManager:
             if ent.type == 'text_mention' and ent.user:
                 return ent.user
 
-        # Иначе ищем упоминание @username в entities
+        # Иначе ищем упоминание @username в entities: сначала в справочнике, потом через API
         for ent in msg.entities or []:
             if ent.type == 'mention':
-                uname = msg.text[ent.offset:ent.offset + ent.length]  # вида "@username"
-                # Убираем "@"
-                username = uname.lstrip('@')
-                try:
-                    member = await context.bot.get_chat_member(msg.chat.id, username)
-                    return member.user
-                except Exception as e:
-                    logger.warning(f"Не удалось найти пользователя {username} в чате: {e}")
-                    return None
+                username = msg.parse_entity(ent)  # вида "@username"
+                return await MEMBER_DIRECTORY.resolve(context.bot, msg.chat.id, username)
         return None
 
+    @staticmethod
+    def _text_without_mentions(msg: Update) -> str:
+        # Срок ищем только вне упоминаний: в имени цели тоже бывают цифры с буквами
+        spans = [
+            (ent.offset, ent.length) for ent in msg.entities or []
+            if ent.type in (MessageEntity.MENTION, MessageEntity.TEXT_MENTION)
+        ]
+        return mask_spans(msg.text, spans)
+
     def _format_mention(self, user: User) -> str:
         return f"@{user.username}" if user.username else (user.first_name or "user")
 
     def _format_time_fmt(self, seconds: int) -> str:
-        mins, secs = divmod(seconds, 60)
-        parts = []
-        if mins:
-            parts.append(f"{mins}м")
-        if secs or not parts:
-            parts.append(f"{secs}с")
-        return "".join(parts)
-
-    async def _delayed_delete(
-        self, chat_id: int, message_id: int, delay: int, context: ContextTypes.DEFAULT_TYPE
-    ) -> None:
-        await asyncio.sleep(delay)
-        try:
-            await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-        except Exception as e:
-            logger.debug(f"Не удалось удалить мямление {message_id}: {e}")
+        # «1д2ч30м» вместо «1590м» для долгих кляпов
+        return format_duration(seconds)
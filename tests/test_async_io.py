@@ -0,0 +1,60 @@
+"""
+Чтение YAML вне event loop (config/async_io.py).
+
+    python -m pytest -q tests
+"""
+import asyncio
+import time
+
+import config.async_io as async_io
+
+PARSE_SECONDS = 0.2
+TICK = 0.01
+
+
+def test_aload_yaml_does_not_block_the_loop_and_parses_once(monkeypatch):
+    calls = 0
+
+    def slow_load_yaml(filename):
+        nonlocal calls
+        calls += 1
+        time.sleep(PARSE_SECONDS)  # как разбор большого actions.yaml
+        return {"file": filename}
+
+    monkeypatch.setattr(async_io, "load_yaml", slow_load_yaml)
+
+    async def main():
+        lags = []
+        done = asyncio.Event()
+
+        async def heartbeat():
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(TICK)
+                lags.append(time.perf_counter() - started - TICK)
+
+        beat = asyncio.create_task(heartbeat())
+        results = await asyncio.gather(*(async_io.aload_yaml("config.yaml") for _ in range(10)))
+        done.set()
+        await beat
+        return results, lags
+
+    results, lags = asyncio.run(main())
+    assert results == [{"file": "config.yaml"}] * 10
+    assert calls == 1
+    # Пока шёл разбор, loop продолжал тикать
+    assert len(lags) >= PARSE_SECONDS / TICK / 2
+    assert max(lags) < PARSE_SECONDS / 2
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_load(monkeypatch):
+    monkeypatch.setattr(async_io, "load_yaml", lambda filename: time.sleep(0.05) or {"ok": True})
+
+    async def main():
+        first = asyncio.create_task(async_io.aload_yaml("actions.yaml"))
+        second = asyncio.create_task(async_io.aload_yaml("actions.yaml"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == {"ok": True}
@@ -0,0 +1,71 @@
+"""
+Отложенные удаления (utils/delete_queue.py) и их запись в StateBackend.
+
+    python -m pytest -q tests
+"""
+import asyncio
+import time
+
+from utils.delete_queue import DeleteQueue
+from utils.scheduler import SCHEDULER
+from utils.state_backend import DELETIONS, SqliteStateBackend
+
+CHAT = -100
+
+
+async def _queue(path) -> tuple[DeleteQueue, SqliteStateBackend]:
+    store = SqliteStateBackend(str(path / "state.sqlite3"))
+    store.open()
+    queue = DeleteQueue()
+    queue.attach(None, store)
+    return queue, store
+
+
+def test_postponed_deletion_updates_the_stored_expiry(tmp_path):
+    async def main():
+        queue, store = await _queue(tmp_path)
+        queue.delete_later(CHAT, 1, 10)
+        first = (await store.aload(DELETIONS))[(CHAT, "1")]
+        queue.delete_later(CHAT, 1, 180)
+        second = (await store.aload(DELETIONS))[(CHAT, "1")]
+        remaining = SCHEDULER.pending()[("delete", CHAT, 1)]
+        queue.forget(CHAT, 1)
+        await store.aclose()
+        return first, second, remaining
+
+    first, second, remaining = asyncio.run(main())
+    assert second - first > 160
+    assert 179 < remaining <= 180
+
+
+def test_forget_removes_timer_and_row(tmp_path):
+    async def main():
+        queue, store = await _queue(tmp_path)
+        queue.delete_later(CHAT, 2, 60)
+        forgotten = queue.forget(CHAT, 2)
+        rows = await store.aload(DELETIONS)
+        await store.aclose()
+        return forgotten, rows
+
+    forgotten, rows = asyncio.run(main())
+    assert forgotten
+    assert ("delete", CHAT, 2) not in SCHEDULER
+    assert rows == {}
+
+
+def test_restored_deletion_is_postponed_not_duplicated(tmp_path):
+    async def main():
+        queue, store = await _queue(tmp_path)
+        store.put(DELETIONS, (CHAT, "3"), time.time() + 5)
+        assert await queue.restore() == 1
+        # Листинг перелистнули после рестарта — срок переносится у того же таймера
+        queue.delete_later(CHAT, 3, 120)
+        timers = [key for key in SCHEDULER.pending() if key[1:] == (CHAT, 3)]
+        remaining = SCHEDULER.pending()[("delete", CHAT, 3)]
+        queue.forget(CHAT, 3)
+        await store.aclose()
+        return timers, remaining
+
+    timers, remaining = asyncio.run(main())
+    assert timers == [("delete", CHAT, 3)]
+    assert remaining > 119
@@ -0,0 +1,60 @@
+"""
+Исправление опечаток в действиях (utils/fuzzy_index.py).
+
+    python -m pytest -q tests
+"""
+import asyncio
+
+import utils.fuzzy_index as fuzzy_module
+from config.actions_registry import ACTIONS_REGISTRY
+from utils.fuzzy_index import FuzzyIndex, get_fuzzy_index
+
+KEYS = ["обнять", "погладить", "пнуть", "лизь", "укусить", "укусить нежно"]
+
+
+def test_substitution_and_transposition_are_corrected():
+    index = FuzzyIndex(KEYS)
+    assert index.lookup("абнять") == "обнять"
+    assert index.lookup("побладить") == "погладить"
+    assert index.lookup("укуситб") == "укусить"
+    assert index.lookup("обянть") == "обнять"
+    assert index.lookup("пнуьт") == "пнуть"
+
+
+def test_insertion_and_deletion_are_not_corrected():
+    index = FuzzyIndex(KEYS)
+    assert index.lookup("обнял") is None      # пропущенная буква
+    assert index.lookup("обнятьь") is None    # лишняя буква
+    assert index.lookup("погладит") is None
+    assert index.lookup("укусить нежн") is None
+
+
+def test_short_keys_are_never_corrected():
+    index = FuzzyIndex(KEYS)
+    assert index.lookup("лизт") is None
+    assert index.lookup("лизь") is None  # точное совпадение ищет не индекс, а реестр
+
+
+def test_ambiguous_typo_is_not_corrected():
+    index = FuzzyIndex(["пнуть", "пхуть"])
+    assert index.lookup("пауть") is None
+
+
+def test_index_is_built_off_the_loop_and_the_old_one_keeps_answering(monkeypatch):
+    old = FuzzyIndex(["обнять"], version=-1)
+    monkeypatch.setattr(fuzzy_module, "_INDEX", old)
+    monkeypatch.setattr(fuzzy_module, "_BUILD_TASK", None)
+
+    async def main():
+        first = get_fuzzy_index()
+        task = fuzzy_module._BUILD_TASK
+        # Повторный вызов не запускает вторую сборку
+        second = get_fuzzy_index()
+        same_task = fuzzy_module._BUILD_TASK is task
+        await task
+        return first, second, same_task, get_fuzzy_index()
+
+    first, second, same_task, built = asyncio.run(main())
+    assert first is old and second is old
+    assert same_task
+    assert built is not old and built.version == ACTIONS_REGISTRY.version
@@ -0,0 +1,213 @@
+"""
+Очередь отправки (utils/outbound.py) против поддельного Bot API с лимитами Telegram
+(benchmarks/fake_telegram.py).
+
+    python -m pytest -q tests
+"""
+import asyncio
+import time
+
+import pytest
+from telegram import Bot
+from telegram.error import RetryAfter
+
+import utils.outbound as outbound_module
+from benchmarks.fake_telegram import FakeTelegramRequest
+from utils.outbound import ACTION, MODERATION, MUMBLE, OutboundScheduler
+from utils.rate_limit import SWEEP_MIN
+
+GROUP = -100
+
+
+class _FloodingRequest(FakeTelegramRequest):
+    """Отвечает 429 с retry_after=1 на первые flood_calls отправок."""
+
+    def __init__(self, flood_calls: int, **kwargs):
+        super().__init__(**kwargs)
+        self.flood_calls = flood_calls
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if url.endswith("/sendMessage") and self.flood_calls:
+            self.flood_calls -= 1
+            self.calls["sendMessage"] += 1
+            self.flood_waits += 1
+            return self._error(429, "Too Many Requests: retry after 1", 1)
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+async def _scheduler(limits: dict, request: FakeTelegramRequest | None = None):
+    request = request or FakeTelegramRequest()
+    bot = Bot("1:fake", request=request)
+    await bot.initialize()
+    scheduler = OutboundScheduler(limits)
+    scheduler.attach(bot)
+    return scheduler, request
+
+
+def _sent_times(futures, started: float) -> list[float]:
+    return [f.result()[1] - started for f in futures]
+
+
+def _timed(scheduler: OutboundScheduler, chat_id: int, text: str, priority: int = ACTION):
+    """send_message, у которого результат — (сообщение, момент отправки)."""
+    done = asyncio.get_running_loop().create_future()
+
+    def on_sent(message) -> None:
+        done.set_result((message, time.monotonic()))
+
+    scheduler.send_message(chat_id, text, priority=priority, on_sent=on_sent)
+    return done
+
+
+def test_global_pacing_keeps_under_telegram_limit():
+    async def main():
+        # Всплеск 2, дальше 8 в секунду — и поддельный API с лимитом 10/с не ругается
+        scheduler, request = await _scheduler({"global_per_second": 10, "global_burst": 2},
+                                              FakeTelegramRequest(global_per_second=10))
+        scheduler.start()
+        started = time.monotonic()
+        futures = [_timed(scheduler, 1000 + i, "hi") for i in range(10)]
+        await asyncio.gather(*futures)
+        times = _sent_times(futures, started)
+        await scheduler.stop()
+        return request, times
+
+    request, times = asyncio.run(main())
+    assert request.flood_waits == 0
+    assert max(times[:2]) < 0.1
+    assert times[-1] >= 0.8
+
+
+def test_per_chat_pacing():
+    async def main():
+        scheduler, request = await _scheduler({
+            "global_per_second": 1000, "global_burst": 100, "group_per_minute": 600, "group_burst": 1,
+        })
+        scheduler.start()
+        started = time.monotonic()
+        futures = [_timed(scheduler, GROUP, str(i)) for i in range(5)]
+        # Другой чат не ждёт, пока разойдётся очередь первого
+        other = _timed(scheduler, GROUP - 1, "other")
+        await asyncio.gather(*futures, other)
+        times = _sent_times(futures, started)
+        other_time = other.result()[1] - started
+        await scheduler.stop()
+        return times, other_time
+
+    times, other_time = asyncio.run(main())
+    # 1 сразу, дальше ~10 в секунду
+    assert times[-1] >= 0.35
+    assert all(b >= a for a, b in zip(times, times[1:]))
+    assert other_time < 0.1
+
+
+def test_priority_order():
+    async def main():
+        scheduler, request = await _scheduler({"group_per_minute": 600, "group_burst": 1})
+        sent = []
+        for text, priority in (("mumble", MUMBLE), ("action", ACTION), ("moderation", MODERATION),
+                               ("action2", ACTION), ("moderation2", MODERATION)):
+            scheduler.send_message(GROUP, text, priority=priority, on_sent=lambda m: sent.append(m.text))
+        scheduler.start()
+        await scheduler.stop()
+        return sent
+
+    assert asyncio.run(main()) == ["moderation", "moderation2", "action", "action2", "mumble"]
+
+
+def test_retry_after_requeues_the_request():
+    async def main():
+        scheduler, request = await _scheduler({}, _FloodingRequest(flood_calls=1))
+        scheduler.start()
+        started = time.monotonic()
+        message = await scheduler.send_message(1, "hi")
+        elapsed = time.monotonic() - started
+        await scheduler.stop()
+        return message, elapsed, request
+
+    message, elapsed, request = asyncio.run(main())
+    assert message.text == "hi"
+    assert request.flood_waits == 1
+    assert request.calls["sendMessage"] == 2
+    # Чат стоял на паузе, которую попросил Telegram
+    assert elapsed >= 0.9
+
+
+def test_retry_after_drops_after_max_retries(monkeypatch):
+    monkeypatch.setattr(outbound_module, "MAX_RETRIES", 1)
+
+    async def main():
+        scheduler, request = await _scheduler({}, _FloodingRequest(flood_calls=100))
+        scheduler.start()
+        future = scheduler.send_message(1, "hi")
+        with pytest.raises(RetryAfter):
+            await future
+        await scheduler.stop()
+        return request
+
+    request = asyncio.run(main())
+    assert request.calls["sendMessage"] == 2
+
+
+def test_stop_drains_queue_before_cancelling():
+    async def main():
+        scheduler, request = await _scheduler({"group_per_minute": 600, "group_burst": 1})
+        scheduler.start()
+        futures = [scheduler.send_message(GROUP, str(i), priority=MODERATION) for i in range(5)]
+        await scheduler.stop(timeout=5)
+        return futures, request
+
+    futures, request = asyncio.run(main())
+    assert all(f.done() and not f.cancelled() for f in futures)
+    assert request.calls["sendMessage"] == 5
+
+
+def test_stop_cancels_what_does_not_fit_the_deadline():
+    async def main():
+        scheduler, request = await _scheduler({"group_per_minute": 60, "group_burst": 1})
+        scheduler.start()
+        futures = [scheduler.send_message(GROUP, str(i)) for i in range(5)]
+        await scheduler.stop(timeout=0.3)
+        return futures
+
+    futures = asyncio.run(main())
+    assert not futures[0].cancelled()
+    assert all(f.cancelled() for f in futures[2:])
+
+
+def test_cancelled_waiter_does_not_break_the_dispatcher():
+    async def main():
+        scheduler, request = await _scheduler({}, FakeTelegramRequest(latency=0.1, error_rate=1.0))
+        scheduler.start()
+        future = scheduler.send_message(1, "hi")
+        await asyncio.sleep(0.03)
+        future.cancel()  # обработчик, ждавший отправку, отменили во время запроса
+        inflight = list(scheduler._inflight)
+        results = await asyncio.gather(*inflight, return_exceptions=True)
+        await scheduler.stop()
+        return results
+
+    assert asyncio.run(main()) == [None]
+
+
+def test_idle_chat_buckets_are_forgotten():
+    class Clock:
+        now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    clock = Clock()
+
+    async def main():
+        scheduler = OutboundScheduler({"group_per_minute": 20, "group_burst": 5}, clock=clock)
+        for chat_id in range(SWEEP_MIN):
+            scheduler._chat_bucket(-chat_id - 1).try_take(clock.now)
+        busy = -1
+        scheduler._queues[busy] = [object()]
+        clock.now += 60
+        scheduler._chat_bucket(-10**9)
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert set(scheduler._buckets) == {-1, -10**9}
@@ -0,0 +1,44 @@
+"""
+Лимиты и анти-флуд (utils/rate_limit.py).
+
+    python -m pytest -q tests
+"""
+from utils.rate_limit import DEFAULT_ACTION_LIMITS, ActionThrottle, WINDOW_SLOTS
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _window_seconds(window) -> float:
+    return window.width * WINDOW_SLOTS
+
+
+def test_action_limits_merge_defaults_per_section():
+    throttle = ActionThrottle(_Clock())
+    throttle.configure({"per_user": {"limit": 5}})
+    assert throttle._user.limit == 5
+    assert _window_seconds(throttle._user) == DEFAULT_ACTION_LIMITS["per_user"]["window"]
+    assert throttle._chat.limit == DEFAULT_ACTION_LIMITS["per_chat"]["limit"]
+
+
+def test_action_limit_zero_disables_window():
+    throttle = ActionThrottle(_Clock())
+    throttle.configure({"per_user": {"limit": 0}, "per_chat": {"limit": 0}})
+    assert all(throttle.allow(-1, 1) for _ in range(1000))
+
+
+def test_per_user_window_slides():
+    clock = _Clock()
+    throttle = ActionThrottle(clock)
+    throttle.configure({"per_user": {"limit": 2, "window": 10}, "per_chat": {"limit": 0}})
+    assert throttle.allow(-1, 1) and throttle.allow(-1, 1)
+    assert not throttle.allow(-1, 1)
+    assert throttle.allow(-1, 2)
+    clock.now += 10
+    assert throttle.allow(-1, 1)
+    assert throttle.dropped["per_user"] == 1
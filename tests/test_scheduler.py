@@ -0,0 +1,48 @@
+"""
+Планировщик отложенных действий (utils/scheduler.py).
+
+    python -m pytest -q tests
+"""
+import asyncio
+import logging
+
+from utils.scheduler import TimerScheduler
+
+
+def test_timers_fire_in_deadline_order_after_reschedule():
+    fired = []
+
+    async def main():
+        scheduler = TimerScheduler()
+        scheduler.start()
+        scheduler.schedule(("gag", 1, 1), 0.05, lambda: fired.append("gag"))
+        scheduler.schedule(("delete", 1, 10), 0.02, lambda: fired.append("delete"))
+        scheduler.schedule(("delete", 1, 11), 0.03, lambda: fired.append("cancelled"))
+        scheduler.reschedule(("gag", 1, 1), 0.01)
+        scheduler.reschedule(("delete", 1, 10), 0.06)
+        scheduler.cancel(("delete", 1, 11))
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return len(scheduler)
+
+    assert asyncio.run(main()) == 0
+    assert fired == ["gag", "delete"]
+
+
+def test_pending_timers_are_reported_by_kind(caplog):
+    async def main():
+        scheduler = TimerScheduler()
+        scheduler.start()
+        scheduler.schedule(("gag", 1, 1), 60, lambda: None)
+        scheduler.schedule(("gag", 1, 2), 30, lambda: None)
+        scheduler.schedule("actions_compact", 300, lambda: None)
+        kinds, pending = scheduler.kinds(), scheduler.pending()
+        with caplog.at_level(logging.INFO, logger="utils.scheduler"):
+            await scheduler.stop()
+        return kinds, pending
+
+    kinds, pending = asyncio.run(main())
+    assert kinds == {"gag": 2, "actions_compact": 1}
+    assert set(pending) == {("gag", 1, 1), ("gag", 1, 2), "actions_compact"}
+    assert 29 < pending[("gag", 1, 2)] <= 30
+    assert "неисполненных таймеров: 3 (gag: 2, actions_compact: 1), ближайший через 30 с" in caplog.text
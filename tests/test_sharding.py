@@ -0,0 +1,82 @@
+"""
+Раздача апдейтов по воркерам (utils/sharding.py).
+
+    python -m pytest -q tests
+"""
+import asyncio
+
+import pytest
+from hypothesis import given, strategies as st
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop
+
+import utils.sharding as sharding_module
+from utils.sharding import Shard, ShardRouter, shard_of
+
+chat_ids = st.integers(min_value=-10**13, max_value=10**13)
+counts = st.integers(min_value=1, max_value=16)
+
+
+def _echo_worker(build, shard, conn) -> None:
+    """Подменяет _worker_main: возвращает каждый апдейт обратно фронту."""
+    while True:
+        try:
+            conn.send_bytes(conn.recv_bytes())
+        except (EOFError, OSError):
+            break
+
+
+def _update(update_id: int, chat_id: int) -> Update:
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "привет",
+            "chat": {"id": chat_id, "type": "supergroup"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Тест"},
+        },
+    }, None)
+
+
+@given(chat_ids, counts)
+def test_every_chat_has_exactly_one_owner(chat_id, count):
+    owners = [index for index in range(count) if Shard(index, count).owns(chat_id)]
+    assert owners == [shard_of(chat_id, count)]
+
+
+@given(st.integers(min_value=1, max_value=10**10), counts)
+def test_private_keys_shard_by_user_id(user_id, count):
+    assert shard_of(("user", user_id), count) == shard_of(user_id, count)
+
+
+def test_shard_of_does_not_depend_on_the_process():
+    # Воркеры запускаются через spawn с другим PYTHONHASHSEED — номера должны совпадать
+    assert [shard_of(chat_id, 4) for chat_id in (-1001234567890, -100, 0, 7, 10**12)] == [2, 0, 0, 3, 0]
+    assert shard_of(None, 4) == 0
+
+
+def test_router_restarts_a_dead_worker(monkeypatch):
+    monkeypatch.setattr(sharding_module, "_worker_main", _echo_worker)
+    router = ShardRouter(None, 2)
+    router.start()
+    worker = router.workers[shard_of(-100, 2)]
+
+    async def route(update_id: int) -> bytes:
+        with pytest.raises(ApplicationHandlerStop):
+            await router.route(_update(update_id, -100), None)
+        return worker.conn.recv_bytes()
+
+    try:
+        assert b'"update_id": 1' in asyncio.run(route(1))
+
+        old_process, old_conn = worker.process, worker.conn
+        old_process.kill()
+        old_process.join()
+        assert b'"update_id": 2' in asyncio.run(route(2))
+
+        assert worker.process is not old_process and worker.alive()
+        # Прежняя труба закрыта, процесс забран
+        assert old_conn.closed
+        with pytest.raises(ValueError):
+            old_process.is_alive()
+    finally:
+        router.stop()
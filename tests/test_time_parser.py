@@ -0,0 +1,149 @@
+"""
+Свойства разбора срока кляпа (utils/time_parser.py).
+
+    python -m pytest -q tests
+"""
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from hypothesis import assume, given, strategies as st
+
+from utils.time_parser import (
+    MAX_SECONDS, _UNITS, mask_spans, parse_duration, parse_gag_time, parse_until,
+)
+
+BERLIN = ZoneInfo("Europe/Berlin")  # с переходом на летнее время
+MOSCOW = ZoneInfo("Europe/Moscow")  # без перехода
+
+aliases = st.sampled_from([(alias, seconds) for seconds, names in _UNITS.items() for alias in names])
+separators = st.sampled_from(["", " ", ", ", " и ", ",  и "])
+numbers = st.integers(min_value=1, max_value=999)
+zones = st.sampled_from([BERLIN, MOSCOW, timezone.utc])
+
+
+@st.composite
+def moments(draw, tz=None):
+    tz = tz or draw(zones)
+    naive = draw(st.datetimes(min_value=datetime(2020, 1, 1), max_value=datetime(2035, 12, 31)))
+    return naive.replace(second=0, microsecond=0, tzinfo=tz)
+
+
+@given(numbers, aliases, st.sampled_from(["", " "]))
+def test_every_unit_alias(n, alias, space):
+    alias, seconds = alias
+    assume(n * seconds <= MAX_SECONDS)
+    assert parse_duration(f"кляп {n}{space}{alias}") == n * seconds
+    assert parse_duration(f"кляп {n}{space}{alias.upper()}") == n * seconds
+
+
+@given(st.lists(st.tuples(numbers, aliases), min_size=1, max_size=5), st.data())
+def test_compound_parts_add_up(parts, data):
+    text = f"кляп {parts[0][0]}{parts[0][1][0]}"
+    for n, (alias, _) in parts[1:]:
+        # Число сразу за буквенной единицей без пробела читается так же: «1ч30м»
+        text += data.draw(separators) + f"{n} {alias}"
+    expected = sum(n * seconds for n, (_, seconds) in parts)
+    assert parse_duration(text) == (expected if expected <= MAX_SECONDS else None)
+
+
+@given(numbers, aliases, numbers, aliases, st.sampled_from([" за флуд ", " @user ", " до ", " 5 "]))
+def test_words_between_parts_break_the_compound(n1, unit1, n2, unit2, middle):
+    assume(n1 * unit1[1] <= MAX_SECONDS)
+    assert parse_duration(f"{n1}{unit1[0]}{middle}{n2}{unit2[0]}") == n1 * unit1[1]
+
+
+@given(numbers, st.sampled_from(["минутами", "часиков", "минуточек", "hoursss"]))
+def test_unknown_word_is_not_a_unit(n, word):
+    assert parse_duration(f"кляп {n}{word}") is None
+
+
+@given(moments(), st.integers(0, 23), st.integers(0, 59))
+def test_until_time_rolls_over_to_tomorrow(now, hour, minute):
+    until = parse_until(f"кляп до {hour}:{minute:02d}", now)
+    assume(until is not None)  # несуществующее время в день перехода
+    assert (until.hour, until.minute) == (hour, minute)
+    assert until.tzinfo is now.tzinfo
+    assert now < until
+    assert until.date() - now.date() in (timedelta(0), timedelta(days=1))
+    # Сегодня — только если время ещё не наступило
+    assert (until.date() == now.date()) == ((hour, minute) > (now.hour, now.minute))
+
+
+@given(moments(), st.integers(1, 28), st.integers(1, 12))
+def test_until_date_rolls_over_to_next_year(now, day, month):
+    until = parse_until(f"кляп до {day:02d}.{month:02d}", now)
+    assert (until.day, until.month, until.hour, until.minute) == (day, month, 0, 0)
+    assert now < until <= now + timedelta(days=366)
+
+
+@given(moments(), st.integers(1, 28), st.integers(1, 12), st.integers(0, 23))
+def test_until_date_with_year_never_rolls(now, day, month, hour):
+    until = parse_until(f"до {day}.{month}.{now.year} {hour}:00", now)
+    assume(until is not None)
+    assert until.year == now.year
+    assert (until.day, until.month, until.hour) == (day, month, hour)
+
+
+@given(moments(), st.sampled_from(["сегодня", "завтра", "послезавтра"]))
+def test_day_words(now, word):
+    until = parse_until(f"до {word} 12:00", now)
+    assume(until is not None)
+    offset = {"сегодня": 0, "завтра": 1, "послезавтра": 2}[word]
+    assert until.date() == now.date() + timedelta(days=offset)
+
+
+def test_february_29():
+    assert parse_until("до 29.02", datetime(2026, 3, 1, tzinfo=MOSCOW)) is None
+    assert parse_until("до 29.02", datetime(2028, 1, 1, tzinfo=MOSCOW)).year == 2028
+    # Прошедшее 29.02 переносится на невисокосный год — такой даты нет
+    assert parse_until("до 29.02", datetime(2028, 3, 1, tzinfo=MOSCOW)) is None
+
+
+@given(moments(tz=BERLIN), st.integers(0, 23), st.integers(0, 59))
+def test_gag_time_is_real_seconds_across_dst(now, hour, minute):
+    text = f"кляп до {hour}:{minute:02d}"
+    until = parse_until(text, now)
+    assume(until is not None)
+    assert parse_gag_time(text, now) == int(until.timestamp() - now.timestamp())
+
+
+def test_dst_boundaries():
+    # Весной в Берлине 02:00 → 03:00: от 01:00 до 03:30 по часам 2,5 ч, на деле 1,5 ч
+    assert parse_gag_time("кляп до 03:30", datetime(2026, 3, 29, 1, 0, tzinfo=BERLIN)) == 90 * 60
+    # Осенью 03:00 → 02:00: от 01:00 до 04:00 по часам 3 ч, на деле 4 ч
+    assert parse_gag_time("кляп до 04:00", datetime(2026, 10, 25, 1, 0, tzinfo=BERLIN)) == 4 * 3600
+    # Длительность от перехода не зависит
+    assert parse_gag_time("кляп 2ч", datetime(2026, 3, 29, 1, 0, tzinfo=BERLIN)) == 7200
+
+
+@given(st.from_regex(r"[a-z][a-z0-9_]{0,10}[0-9][a-zа-я]{0,6}", fullmatch=True), numbers)
+def test_username_is_not_a_duration(username, n):
+    now = datetime(2026, 6, 1, 12, 0, tzinfo=MOSCOW)
+    assert parse_gag_time(f"надеть кляп @{username} {n}м", now) == n * 60
+    assert parse_gag_time(f"надеть кляп @{username}", now) is None
+
+
+def test_mention_with_digits_and_letters():
+    now = datetime(2026, 6, 1, 12, 0, tzinfo=MOSCOW)
+    assert parse_gag_time("надеть кляп @neo2d 10м", now) == 600
+    assert parse_gag_time("@kot5m 10м", now) == 600
+
+
+@given(st.text(alphabet="Котик 5м2дч😀", min_size=1, max_size=12), numbers)
+def test_masked_text_mention_is_ignored(name, n):
+    # text_mention — просто имя в тексте; смещения MessageEntity — в единицах UTF-16
+    prefix = "😀 кляп "
+    text = f"{prefix}{name} {n}м"
+    offset = len(prefix.encode("utf-16-le")) // 2
+    length = len(name.encode("utf-16-le")) // 2
+    now = datetime(2026, 6, 1, 12, 0, tzinfo=MOSCOW)
+    assert parse_gag_time(mask_spans(text, [(offset, length)]), now) == n * 60
+
+
+@given(st.sampled_from(["надо", "тогда", "видео", "кудо"]), st.integers(0, 23), st.integers(0, 59))
+def test_do_inside_a_word_is_not_until(word, hour, minute):
+    now = datetime(2026, 6, 1, 12, 0, tzinfo=MOSCOW)
+    assert parse_until(f"кляп {word} {hour}:{minute:02d}", now) is None
+    assert parse_gag_time(f"кляп {word} {hour}:{minute:02d}", now) is None
+    # Отдельное «до» после такого слова по-прежнему работает
+    assert parse_until(f"{word} до {hour}:{minute:02d}", now) is not None
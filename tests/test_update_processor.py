@@ -0,0 +1,135 @@
+"""
+Параллельная обработка апдейтов с порядком внутри чата (utils/update_processor.py).
+
+    python -m pytest -q tests
+"""
+import asyncio
+import random
+
+import pytest
+from telegram import Update
+
+from utils.update_processor import ChatOrderedUpdateProcessor, ordering_key
+
+
+def _update(update_id: int, chat_id: int | None = None, user_id: int = 1) -> Update:
+    data = {"update_id": update_id}
+    user = {"id": user_id, "is_bot": False, "first_name": "Тест"}
+    if chat_id is None:
+        data["inline_query"] = {"id": str(update_id), "from": user, "query": "", "offset": ""}
+    else:
+        data["message"] = {
+            "message_id": update_id, "date": 0, "text": "привет",
+            "chat": {"id": chat_id, "type": "supergroup"}, "from": user,
+        }
+    return Update.de_json(data, None)
+
+
+async def _processor(**kwargs) -> ChatOrderedUpdateProcessor:
+    processor = ChatOrderedUpdateProcessor(**kwargs)
+    await processor.initialize()
+    return processor
+
+
+def test_ordering_key():
+    assert ordering_key(_update(1, -100)) == -100
+    assert ordering_key(_update(1, user_id=7)) == ("user", 7)
+    assert ordering_key("не апдейт") is None
+
+
+def test_updates_of_one_chat_keep_their_order():
+    rng = random.Random(1)
+    done: dict[int, list[int]] = {}
+
+    async def handle(chat_id: int, n: int) -> None:
+        await asyncio.sleep(rng.random() / 100)
+        done.setdefault(chat_id, []).append(n)
+
+    async def main():
+        processor = await _processor(max_concurrent=8)
+        for n in range(200):
+            chat_id = -rng.randrange(1, 6)
+            await processor.do_process_update(_update(n, chat_id), handle(chat_id, n))
+        await processor.drain()
+        return processor
+
+    processor = asyncio.run(main())
+    assert sum(len(numbers) for numbers in done.values()) == 200
+    assert all(numbers == sorted(numbers) for numbers in done.values())
+    assert processor.pending == 0 and not processor._chats
+
+
+def test_chats_run_in_parallel_up_to_the_cap():
+    active = 0
+    peak = 0
+
+    async def handle() -> None:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+
+    async def main():
+        processor = await _processor(max_concurrent=3)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for n in range(9):
+            await processor.do_process_update(_update(n, -n - 1), handle())
+        await processor.drain()
+        return loop.time() - started
+
+    elapsed = asyncio.run(main())
+    assert peak == 3
+    # 9 чатов по 50 мс при трёх слотах — три волны, а не одна и не девять
+    assert 0.14 <= elapsed < 0.3
+
+
+def test_full_processor_holds_back_new_updates():
+    async def main():
+        processor = await _processor(max_pending=2)
+        release = asyncio.Event()
+
+        async def handle() -> None:
+            await release.wait()
+
+        await processor.do_process_update(_update(1, -1), handle())
+        await processor.do_process_update(_update(2, -2), handle())
+        third = asyncio.create_task(processor.do_process_update(_update(3, -3), handle()))
+        await asyncio.sleep(0.05)
+        blocked = not third.done()
+        release.set()
+        await asyncio.wait_for(third, 1)
+        await processor.drain()
+        return blocked, processor.pending
+
+    assert asyncio.run(main()) == (True, 0)
+
+
+def test_drain_waits_for_queued_updates_and_survives_errors():
+    done = []
+
+    async def handle(n: int) -> None:
+        await asyncio.sleep(0.01)
+        if n == 1:
+            raise RuntimeError("сломался обработчик")
+        done.append(n)
+
+    async def main():
+        processor = await _processor()
+        for n in range(4):
+            await processor.do_process_update(_update(n, -100), handle(n))
+        # Апдейт без чата идёт своим воркером
+        await processor.do_process_update(_update(10), handle(10))
+        await processor.shutdown()
+        return processor.pending
+
+    assert asyncio.run(main()) == 0
+    assert sorted(done) == [0, 2, 3, 10]
+    assert [n for n in done if n != 10] == [0, 2, 3]
+
+
+@pytest.mark.parametrize("kwargs", [{"max_concurrent": 0}, {"max_pending": 0}])
+def test_rejects_non_positive_limits(kwargs):
+    with pytest.raises(ValueError):
+        ChatOrderedUpdateProcessor(**kwargs)
@@ -0,0 +1,112 @@
+"""
+Приём апдейтов вебхуком (utils/webhook.py) и разбор HTTP в utils/http_server.py.
+
+    python -m pytest -q tests
+"""
+import asyncio
+import json
+
+from telegram.ext import ApplicationBuilder
+
+from benchmarks.fake_telegram import FakeTelegramRequest
+from utils.webhook import WEBHOOK_REJECTED, WebhookServer
+
+PATH = "/telegram"
+
+
+def _update(update_id: int) -> bytes:
+    return json.dumps({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "привет",
+            "chat": {"id": -100, "type": "supergroup"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Тест"},
+        },
+    }).encode()
+
+
+async def _server(max_pending: int = 10) -> WebhookServer:
+    application = (
+        ApplicationBuilder().token("1:fake").request(FakeTelegramRequest())
+        .update_queue(asyncio.Queue(maxsize=max_pending)).build()
+    )
+    server = WebhookServer(application, {"port": 0, "path": PATH})
+    await server.start()
+    return server
+
+
+async def _exchange(port: int, raw: bytes) -> list[int]:
+    """Шлёт сырые байты одним куском и возвращает статусы всех ответов до закрытия соединения."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    statuses = []
+    try:
+        while True:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 2)
+            lines = head.decode("latin-1").split("\r\n")
+            statuses.append(int(lines[0].split(" ")[1]))
+            length = next(int(line.split(":")[1]) for line in lines if line.lower().startswith("content-length"))
+            await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+        pass
+    writer.close()
+    return statuses
+
+
+def _post(body: bytes, extra: str = "", close: bool = False) -> bytes:
+    head = f"POST {PATH} HTTP/1.1\r\nHost: x\r\nContent-Length: {len(body)}\r\n{extra}"
+    if close:
+        head += "Connection: close\r\n"
+    return head.encode() + b"\r\n" + body
+
+
+def test_full_queue_is_answered_with_429_at_once():
+    async def main():
+        server = await _server(max_pending=2)
+        rejected_before = WEBHOOK_REJECTED.values.get((), 0)
+        raw = b"".join(_post(_update(i)) for i in range(3)) + _post(_update(3), close=True)
+        statuses = await asyncio.wait_for(_exchange(server.port, raw), 5)
+        queued = server.application.update_queue.qsize()
+        await server.stop()
+        return statuses, queued, server.rejected, WEBHOOK_REJECTED.values.get((), 0) - rejected_before
+
+    statuses, queued, rejected, counted = asyncio.run(main())
+    assert statuses == [200, 200, 429, 429]
+    assert queued == 2
+    assert rejected == counted == 2
+
+
+def test_ambiguous_body_framing_is_rejected():
+    body = _update(1)
+    smuggled = _post(b"", close=True)
+    cases = [
+        _post(body, "Transfer-Encoding: chunked\r\n") + smuggled,
+        _post(body, f"Content-Length: {len(body)}\r\n") + smuggled,
+        f"POST {PATH} HTTP/1.1\r\nContent-Length: +{len(body)}\r\n\r\n".encode() + body + smuggled,
+        f"POST {PATH} HTTP/1.1\r\nContent-Length: {len(body)}, 0\r\n\r\n".encode() + body + smuggled,
+    ]
+
+    async def main():
+        server = await _server()
+        results = [await asyncio.wait_for(_exchange(server.port, raw), 5) for raw in cases]
+        queued = server.application.update_queue.qsize()
+        await server.stop()
+        return results, queued
+
+    results, queued = asyncio.run(main())
+    # Один ответ 400, соединение закрыто, второй запрос из того же потока не разбирается
+    assert results == [[400]] * len(cases)
+    assert queued == 0
+
+
+def test_keep_alive_serves_several_requests():
+    async def main():
+        server = await _server()
+        raw = _post(_update(1)) + b"GET /healthz HTTP/1.1\r\nConnection: close\r\n\r\n"
+        statuses = await asyncio.wait_for(_exchange(server.port, raw), 5)
+        await server.stop()
+        return statuses
+
+    # Приложение не запущено — health честно отвечает 503
+    assert asyncio.run(main()) == [200, 503]
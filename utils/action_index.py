@@ -0,0 +1,140 @@
+import bisect
+import time
+from collections import OrderedDict
+from typing import Mapping
+
+from config.actions_registry import ACTIONS_REGISTRY
+from utils.action_template import ActionTemplate
+
+# Сколько кандидатов максимум ранжируем на один запрос
+MAX_CANDIDATES = 200
+
+# Бюджет времени на один поиск, секунды: по его исчерпании отдаём то, что успели найти
+SEARCH_BUDGET = 0.05
+
+# Сколько последних запросов держим в кэше результатов
+CACHE_SIZE = 512
+
+# Ранги совпадений: чем меньше, тем выше в выдаче
+EXACT, NAME_PREFIX, WORD_PREFIX, TRIGRAM = range(4)
+
+
+def normalize_query(query: str) -> str:
+    """Приводит запрос к виду ключей действий: нижний регистр, без лишних пробелов и знаков."""
+    return " ".join(query.lower().split()).rstrip('.,!')
+
+
+def _trigrams(text: str) -> set[str]:
+    # Пробелы по краям дают триграммы для начала и конца слова
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ActionIndex:
+    """
+    Поисковый индекс по именам действий одной версии реестра:
+    префикс всего имени и префиксы отдельных слов ищутся бинарным поиском,
+    подстроки и опечатки — по пересечению триграмм.
+    Результаты кэшируются по нормализованному запросу: инлайн-запросы приходят
+    на каждый набранный символ, и один и тот же префикс повторяется у разных людей.
+    """
+
+    def __init__(self, actions: Mapping[str, ActionTemplate], keys: tuple[str, ...], version: int):
+        self.version = version
+        self.actions = actions
+        self._keys = keys
+
+        # (слово, ключ) для всех слов, кроме первого: первое покрывает префикс всего имени
+        words = []
+        for key in keys:
+            for word in key.split()[1:]:
+                words.append((word, key))
+        words.sort()
+        self._words = words
+
+        self._grams: dict[str, list[int]] = {}
+        for idx, key in enumerate(keys):
+            for gram in _trigrams(key):
+                self._grams.setdefault(gram, []).append(idx)
+
+        self._cache: OrderedDict[str, tuple[str, ...]] = OrderedDict()
+
+    def search(self, query: str, limit: int = MAX_CANDIDATES) -> tuple[str, ...]:
+        """Возвращает ключи действий, упорядоченные по релевантности."""
+        query = normalize_query(query)
+        cached = self._cache.get(query)
+        if cached is not None:
+            self._cache.move_to_end(query)
+            return cached[:limit]
+
+        found, complete = self._search(query)
+        # Обрезанный по бюджету времени результат не кэшируем — в следующий раз найдём полный
+        if complete:
+            self._cache[query] = found
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return found[:limit]
+
+    def _search(self, query: str) -> tuple[tuple[str, ...], bool]:
+        if not query:
+            return self._keys[:MAX_CANDIDATES], True
+
+        deadline = time.perf_counter() + SEARCH_BUDGET
+        ranked: dict[str, tuple] = {}
+
+        def add(key: str, rank: tuple) -> None:
+            if key not in ranked or rank < ranked[key]:
+                ranked[key] = rank
+
+        if query in self.actions:
+            add(query, (EXACT,))
+
+        # Префикс всего имени: ключи отсортированы, нужный диапазон — подряд
+        start = bisect.bisect_left(self._keys, query)
+        for key in self._keys[start:start + MAX_CANDIDATES]:
+            if not key.startswith(query):
+                break
+            add(key, (NAME_PREFIX, len(key)))
+
+        # Префикс любого следующего слова
+        start = bisect.bisect_left(self._words, (query,))
+        for word, key in self._words[start:start + MAX_CANDIDATES]:
+            if not word.startswith(query):
+                break
+            add(key, (WORD_PREFIX, len(key)))
+
+        complete = True
+        if len(ranked) < MAX_CANDIDATES:
+            complete = self._trigram_candidates(query, deadline, add)
+
+        found = sorted(ranked, key=lambda key: (ranked[key], key))
+        return tuple(found[:MAX_CANDIDATES]), complete
+
+    def _trigram_candidates(self, query: str, deadline: float, add) -> bool:
+        grams = _trigrams(query)
+        hits: dict[int, int] = {}
+        for n, gram in enumerate(grams):
+            for idx in self._grams.get(gram, ()):
+                hits[idx] = hits.get(idx, 0) + 1
+            if n % 8 == 7 and time.perf_counter() > deadline:
+                return False
+
+        # Отсекаем случайные совпадения: нужна хотя бы половина триграмм запроса
+        threshold = max(1, (len(grams) + 1) // 2)
+        for idx, count in hits.items():
+            if count >= threshold:
+                key = self._keys[idx]
+                add(key, (TRIGRAM, -count / len(grams), len(key)))
+        return True
+
+
+_INDEX: ActionIndex | None = None
+
+
+def get_action_index() -> ActionIndex:
+    """Индекс пересобирается только при смене версии реестра действий."""
+    global _INDEX
+    actions = ACTIONS_REGISTRY.current()
+    if _INDEX is None or _INDEX.version != ACTIONS_REGISTRY.version:
+        _INDEX = ActionIndex(actions, ACTIONS_REGISTRY.sorted_keys(), ACTIONS_REGISTRY.version)
+    return _INDEX
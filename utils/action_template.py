@@ -0,0 +1,78 @@
+from string import Formatter
+
+# Плейсхолдеры, которые понимают шаблоны действий: {user1} — кто делает, {user2} — над кем
+PLACEHOLDERS = ("user1", "user2")
+_FIELD_INDEX = {name: i for i, name in enumerate(PLACEHOLDERS)}
+
+
+class TemplateError(ValueError):
+    """Шаблон действия не удаётся разобрать или он ссылается на неизвестный плейсхолдер."""
+
+
+class ActionTemplate:
+    """
+    Заранее разобранный шаблон действия. Рендер — склейка готовых кусков,
+    без str.format и без обработки ошибок на каждом сообщении.
+    """
+
+    __slots__ = ("source", "_segments")
+
+    def __init__(self, source: str, segments: tuple[str | int, ...]):
+        self.source = source
+        # Строка — литерал, int — индекс плейсхолдера в PLACEHOLDERS
+        self._segments = segments
+
+    def render(self, user1: str, user2: str) -> str:
+        values = (user1, user2)
+        return "".join(s if s.__class__ is str else values[s] for s in self._segments)
+
+    def __str__(self) -> str:
+        return self.source
+
+    def __repr__(self) -> str:
+        return f"ActionTemplate({self.source!r})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ActionTemplate) and other.source == self.source
+
+    def __hash__(self) -> int:
+        return hash(self.source)
+
+
+def compile_template(source) -> ActionTemplate:
+    """
+    Разбирает шаблон один раз. Бросает TemplateError с понятным описанием,
+    если шаблон сломан — так он не попадёт в реестр.
+    """
+    if not isinstance(source, str):
+        raise TemplateError(f"шаблон должен быть строкой, а не {type(source).__name__}")
+    if not source.strip():
+        raise TemplateError("пустой шаблон")
+
+    segments: list[str | int] = []
+    try:
+        parsed = list(Formatter().parse(source))
+    except ValueError as e:
+        raise TemplateError(f"несбалансированные фигурные скобки ({e})") from None
+
+    for literal, field, spec, conversion in parsed:
+        if literal:
+            segments.append(literal)
+        if field is None:
+            continue
+        if field not in _FIELD_INDEX:
+            allowed = ", ".join(f"{{{name}}}" for name in PLACEHOLDERS)
+            shown = f"{{{field}}}" if field else "{}"
+            raise TemplateError(f"неизвестный плейсхолдер {shown}, допустимы только {allowed}")
+        if spec or conversion:
+            raise TemplateError(f"форматирование внутри {{{field}}} не поддерживается")
+        segments.append(_FIELD_INDEX[field])
+
+    # Соседние литералы склеиваем, чтобы рендер делал меньше работы
+    merged: list[str | int] = []
+    for seg in segments:
+        if merged and isinstance(seg, str) and isinstance(merged[-1], str):
+            merged[-1] += seg
+        else:
+            merged.append(seg)
+    return ActionTemplate(source, tuple(merged))
@@ -0,0 +1,27 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from telegram.ext import Application
+
+
+@asynccontextmanager
+async def running(application: Application) -> AsyncIterator[Application]:
+    """
+    Жизненный цикл приложения как в run_polling(), но без Updater: для режимов,
+    где апдейты в update_queue кладёт кто-то другой (вебхук, воркер шарда).
+    initialize → post_init → start … stop → post_stop → shutdown → post_shutdown.
+    """
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        yield application
+    finally:
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
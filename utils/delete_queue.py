@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from functools import partial
+from typing import Callable
+
+from telegram import Bot
+from telegram.error import BadRequest, RetryAfter
+
+from utils.rate_limit import retry_after_seconds
+from utils.scheduler import SCHEDULER
+from utils.state_backend import DELETIONS, StateBackend
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд копим удаления в одном чате перед отправкой пачкой
+COALESCE_WINDOW = 0.5
+# Лимит Bot API на один вызов deleteMessages
+MAX_BATCH = 100
+# Сколько раз повторяем пачку после RetryAfter
+MAX_RETRIES = 3
+# Боты не могут удалять сообщения старше 48 часов — более старые отложенные удаления забываем
+DELETE_HORIZON = 48 * 3600
+
+
+def _timer_key(chat_id: int, message_id: int) -> tuple:
+    # Один ключ и у только что поставленного, и у восстановленного после рестарта удаления
+    return ("delete", chat_id, message_id)
+
+
+def _is_gone(error: BadRequest) -> bool:
+    # Сообщение уже удалено или удалить его нельзя — повторять бессмысленно
+    text = str(error).lower()
+    return "not found" in text or "can't be deleted" in text
+
+
+class DeleteQueue:
+    """
+    Очередь удалений сообщений. Удаления в одном чате копятся COALESCE_WINDOW
+    секунд и уходят одним вызовом deleteMessages (до MAX_BATCH id за раз).
+    """
+
+    def __init__(self, window: float = COALESCE_WINDOW):
+        self.window = window
+        self.bot: Bot | None = None
+        # Хранилище отложенных удалений, чтобы они пережили рестарт
+        self.store: StateBackend | None = None
+        self._pending: dict[int, list[int]] = {}
+
+    def attach(self, bot: Bot, store: StateBackend | None = None) -> None:
+        self.bot = bot
+        self.store = store
+
+    async def restore(self, owns: Callable[[int], bool] | None = None) -> int:
+        """Заново планирует отложенные удаления после рестарта (только чаты этого шарда)."""
+        if self.store is None:
+            return 0
+        now = time.time()
+        # Просроченные за время простоя удаляем сразу, если им меньше DELETE_HORIZON
+        due = await self.store.aload(DELETIONS, now - DELETE_HORIZON, owns)
+        for (chat_id, message_id), at in due.items():
+            SCHEDULER.schedule(
+                _timer_key(chat_id, int(message_id)), max(0.0, at - now),
+                partial(self._delete_due, chat_id, int(message_id))
+            )
+        return len(due)
+
+    def pending(self) -> int:
+        return sum(len(ids) for ids in self._pending.values())
+
+    def delete(self, chat_id: int, message_id: int) -> None:
+        """Ставит сообщение в очередь на удаление (не блокирует обработчик)."""
+        ids = self._pending.setdefault(chat_id, [])
+        ids.append(message_id)
+        if len(ids) >= MAX_BATCH:
+            SCHEDULER.schedule(("delete_flush", chat_id), 0, partial(self._flush, chat_id))
+        elif ("delete_flush", chat_id) not in SCHEDULER:
+            SCHEDULER.schedule(("delete_flush", chat_id), self.window, partial(self._flush, chat_id))
+
+    def delete_later(self, chat_id: int, message_id: int, delay: float) -> None:
+        """
+        Удаляет сообщение через delay секунд. Повторный вызов переносит срок:
+        и таймер, и запись в хранилище, чтобы после рестарта срок был тот же.
+        """
+        key = _timer_key(chat_id, message_id)
+        if not SCHEDULER.reschedule(key, delay):
+            SCHEDULER.schedule(key, delay, partial(self._delete_due, chat_id, message_id))
+        if self.store is not None:
+            self.store.put(DELETIONS, (chat_id, str(message_id)), time.time() + delay)
+
+    def forget(self, chat_id: int, message_id: int) -> bool:
+        """Отменяет отложенное удаление вместе с записью в хранилище."""
+        if self.store is not None:
+            self.store.remove(DELETIONS, (chat_id, str(message_id)))
+        return SCHEDULER.cancel(_timer_key(chat_id, message_id))
+
+    def _delete_due(self, chat_id: int, message_id: int) -> None:
+        if self.store is not None:
+            self.store.remove(DELETIONS, (chat_id, str(message_id)))
+        self.delete(chat_id, message_id)
+
+    async def _flush(self, chat_id: int) -> None:
+        ids = self._pending.pop(chat_id, None)
+        if not ids:
+            return
+        for start in range(0, len(ids), MAX_BATCH):
+            await self._send(chat_id, ids[start:start + MAX_BATCH])
+
+    async def _send(self, chat_id: int, ids: list[int]) -> None:
+        if self.bot is None:
+            logger.error("DeleteQueue не привязана к боту, удаления потеряны")
+            return
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                if len(ids) == 1:
+                    await self.bot.delete_message(chat_id=chat_id, message_id=ids[0])
+                else:
+                    await self.bot.delete_messages(chat_id=chat_id, message_ids=ids)
+                return
+            except RetryAfter as e:
+                if attempt == MAX_RETRIES:
+                    break
+                await asyncio.sleep(retry_after_seconds(e))
+            except BadRequest as e:
+                if _is_gone(e):
+                    logger.debug(f"Сообщения {ids} в чате {chat_id} уже удалены: {e}")
+                else:
+                    logger.warning(f"Не удалось удалить сообщения {ids} в чате {chat_id}: {e}")
+                return
+            except Exception as e:
+                logger.warning(f"Не удалось удалить сообщения {ids} в чате {chat_id}: {e}")
+                return
+        logger.warning(f"Удаление {len(ids)} сообщений в чате {chat_id} отброшено после RetryAfter")
+
+    async def flush_all(self) -> None:
+        """Отправляет всё накопленное (при остановке бота)."""
+        for chat_id in list(self._pending):
+            SCHEDULER.cancel(("delete_flush", chat_id))
+            await self._flush(chat_id)
+
+
+DELETE_QUEUE = DeleteQueue()
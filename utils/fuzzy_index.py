@@ -0,0 +1,147 @@
+import asyncio
+from typing import Iterable
+
+from config.actions_registry import ACTIONS_REGISTRY
+from config.async_io import run_in_io_thread
+
+# Порог по умолчанию: одна опечатка
+DEFAULT_MAX_DISTANCE = 1
+
+# Короткие слова слишком легко «исправляются» в чужие действия
+MIN_KEY_LENGTH = 5
+
+# Дальше этой длины запрос не похож ни на одно действие — даже не генерируем удаления
+MAX_QUERY_LENGTH = 64
+
+# Сколько кандидатов максимум сверяем точным расстоянием на один промах
+MAX_CANDIDATES = 64
+
+
+def _deletes(word: str, max_distance: int) -> set[str]:
+    """Все строки, получаемые из word удалением не более max_distance символов."""
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        step = set()
+        for item in frontier:
+            for i in range(len(item)):
+                step.add(item[:i] + item[i + 1:])
+        step -= result
+        result |= step
+        frontier = step
+    return result
+
+
+def bounded_distance(a: str, b: str, limit: int) -> int:
+    """
+    Расстояние Дамерау–Левенштейна (с перестановкой соседних символов).
+    Как только результат точно превысит limit, считает дальше незачем — возвращает limit + 1.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev_prev: list[int] | None = None
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            value = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev_prev is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, prev_prev[j - 2] + 1)
+            cur[j] = value
+        if min(cur) > limit:
+            return limit + 1
+        prev_prev, prev = prev, cur
+    return prev[-1]
+
+
+class FuzzyIndex:
+    """
+    Словарь удалений в духе SymSpell: для каждого ключа заранее сохранены все варианты
+    с удалёнными max_distance символами. Промах стоит генерации удалений запроса
+    (их число зависит только от длины запроса и порога, но не от числа действий)
+    плюс проверки не более MAX_CANDIDATES кандидатов.
+
+    Исправляются только замены и перестановки букв в ключах не короче MIN_KEY_LENGTH:
+    запрос той же длины, что и действие. Лишняя или пропущенная буква чаще означает
+    другое слово («обнял» при действии «обнять»), чем опечатку, — такие сообщения
+    остаются обычными.
+    """
+
+    def __init__(self, keys: Iterable[str], max_distance: int = DEFAULT_MAX_DISTANCE, version: int = 0):
+        self.version = version
+        self.max_distance = max_distance
+        self._max_key_length = 0
+        self._deletes: dict[str, list[str]] = {}
+        for key in keys:
+            if len(key) < MIN_KEY_LENGTH:
+                continue
+            self._max_key_length = max(self._max_key_length, len(key))
+            for variant in _deletes(key, max_distance):
+                self._deletes.setdefault(variant, []).append(key)
+
+    def lookup(self, query: str) -> str | None:
+        """
+        Ближайший ключ в пределах max_distance или None.
+        Если ближайших несколько — это неоднозначность, и мы тоже возвращаем None.
+        """
+        length = len(query)
+        if (
+            self.max_distance <= 0
+            or length < MIN_KEY_LENGTH
+            or length > min(MAX_QUERY_LENGTH, self._max_key_length)
+        ):
+            return None
+
+        candidates: set[str] = set()
+        for variant in _deletes(query, self.max_distance):
+            keys = self._deletes.get(variant)
+            if keys:
+                candidates.update(keys)
+                if len(candidates) > MAX_CANDIDATES:
+                    break
+
+        best = None
+        best_distance = self.max_distance + 1
+        ambiguous = False
+        for key in candidates:
+            if len(key) != length:
+                continue
+            distance = bounded_distance(query, key, self.max_distance)
+            if distance < best_distance:
+                best, best_distance, ambiguous = key, distance, False
+            elif distance == best_distance and distance <= self.max_distance:
+                ambiguous = True
+        if best is None or ambiguous:
+            return None
+        return best
+
+
+_INDEX: FuzzyIndex | None = None
+_BUILD_TASK: asyncio.Task | None = None
+
+
+async def _abuild(keys: tuple[str, ...], max_distance: int, version: int) -> None:
+    global _INDEX
+    _INDEX = await run_in_io_thread(FuzzyIndex, keys, max_distance, version)
+
+
+def get_fuzzy_index(max_distance: int = DEFAULT_MAX_DISTANCE) -> FuzzyIndex | None:
+    """
+    Индекс пересобирается только при смене версии реестра действий или порога.
+    Внутри event loop сборка (на тысячах действий — сотня миллисекунд) идёт в пуле потоков,
+    а до её окончания отвечает предыдущий индекс; при самой первой сборке — None.
+    """
+    global _INDEX, _BUILD_TASK
+    actions = ACTIONS_REGISTRY.current()
+    version = ACTIONS_REGISTRY.version
+    if _INDEX is not None and _INDEX.version == version and _INDEX.max_distance == max_distance:
+        return _INDEX
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _INDEX = FuzzyIndex(actions.keys(), max_distance, version)
+        return _INDEX
+    if _BUILD_TASK is None or _BUILD_TASK.done():
+        _BUILD_TASK = loop.create_task(_abuild(tuple(actions), max_distance, version))
+    return _INDEX
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import ssl
+from http import HTTPStatus
+from typing import Any, Mapping
+
+logger = logging.getLogger(__name__)
+
+# Сколько ждём следующий запрос в keep-alive соединении
+KEEPALIVE_TIMEOUT = 75.0
+
+# Ответ обработчика: статус, тело и его Content-Type
+Response = tuple[HTTPStatus, bytes, str]
+
+
+class HttpError(Exception):
+    """Ответить статусом без тела; соединение после этого закрывается."""
+
+    def __init__(self, status: HTTPStatus):
+        super().__init__(status.phrase)
+        self.status = status
+
+
+def parse_head(head: bytes) -> tuple[str, str, dict[str, str]]:
+    """
+    Строка запроса и заголовки: (метод, путь без query, заголовки в нижнем регистре).
+    Тело бывает только по Content-Length. Transfer-Encoding, повторный или кривой
+    Content-Length — HttpError(400): иначе мы и прокси перед нами можем по-разному
+    понять, где кончается запрос (request smuggling).
+    """
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ")
+    if len(parts) != 3:
+        raise HttpError(HTTPStatus.BAD_REQUEST)
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if not sep:
+            continue
+        name = name.strip().lower()
+        if name == "transfer-encoding" or (name == "content-length" and name in headers):
+            raise HttpError(HTTPStatus.BAD_REQUEST)
+        headers[name] = value.strip()
+    length = headers.get("content-length")
+    if length is not None and not (length.isascii() and length.isdigit()):
+        raise HttpError(HTTPStatus.BAD_REQUEST)
+    return parts[0], parts[1].split("?", 1)[0], headers
+
+
+async def respond(
+    writer: asyncio.StreamWriter, status: HTTPStatus, body: bytes = b"",
+    content_type: str = "text/plain; charset=utf-8", keep_alive: bool = True, head_only: bool = False
+) -> None:
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + (b"" if head_only else body))
+    await writer.drain()
+
+
+class HttpServer:
+    """
+    Минимальный HTTP/1.1-сервер на asyncio: keep-alive, тела по Content-Length, HEAD.
+    Наследник решает, что отвечать, в dispatch(); options — как минимум listen и port.
+    """
+
+    def __init__(self, options: Mapping[str, Any]):
+        self.options = options
+        self._server: asyncio.AbstractServer | None = None
+
+    @property
+    def port(self) -> int | None:
+        """Фактический порт (полезно при port: 0 в тестах и бенчмарках)."""
+        if not self._server or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    def _ssl_context(self) -> ssl.SSLContext | None:
+        return None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._handle_connection,
+            self.options["listen"],
+            int(self.options["port"]),
+            ssl=self._ssl_context(),
+        )
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def dispatch(
+        self, method: str, target: str, headers: dict[str, str], reader: asyncio.StreamReader
+    ) -> Response:
+        raise NotImplementedError
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, keep_alive=False)
+                    break
+
+                method = ""
+                try:
+                    method, target, headers = parse_head(head)
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, body, content_type = await self.dispatch(method, target, headers, reader)
+                except HttpError as e:
+                    status, body, content_type = e.status, b"", "text/plain; charset=utf-8"
+                    # Тело запроса могло остаться непрочитанным — соединение дальше не используем
+                    keep_alive = False
+                await respond(writer, status, body, content_type, keep_alive, head_only=method == "HEAD")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            logger.exception(f"Ошибка при обработке HTTP-запроса ({type(self).__name__})")
+        finally:
+            writer.close()
@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from telegram import Bot, Update, User
+
+from config.config_loader import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+MEMBERS_PATH = os.path.join(BASE_DIR, "data", "members.json")
+
+# Сколько пользователей помним в одном чате и сколько секунд запись считается свежей
+MAX_PER_CHAT = 5000
+TTL = 30 * 24 * 3600
+
+
+class MemberDirectory:
+    """
+    Справочник участников по чатам: @username -> User, собранный из входящих апдейтов.
+    LRU с TTL и ограниченным размером на чат, чтобы @mention разрешался без запроса к API.
+    """
+
+    def __init__(self, max_per_chat: int = MAX_PER_CHAT, ttl: float = TTL):
+        self.max_per_chat = max_per_chat
+        self.ttl = ttl
+        # chat_id -> OrderedDict(username в нижнем регистре -> (User, время последнего появления))
+        self._chats: dict[int, OrderedDict[str, tuple[User, float]]] = {}
+
+    def configure(self, options: dict | None) -> None:
+        options = options or {}
+        self.max_per_chat = int(options.get("max_per_chat", self.max_per_chat))
+        self.ttl = float(options.get("ttl_days", self.ttl / 86400)) * 86400
+
+    def __len__(self) -> int:
+        return sum(len(members) for members in self._chats.values())
+
+    def observe(self, chat_id: int, user: User | None, now: float | None = None) -> None:
+        if user is None or not user.username or user.is_bot:
+            return
+        members = self._chats.get(chat_id)
+        if members is None:
+            members = self._chats[chat_id] = OrderedDict()
+        key = user.username.lower()
+        members[key] = (user, time.time() if now is None else now)
+        members.move_to_end(key)
+        if len(members) > self.max_per_chat:
+            members.popitem(last=False)
+
+    def observe_update(self, update: Update) -> None:
+        """Запоминает всех пользователей, которые видны в апдейте."""
+        message = update.effective_message
+        chat = update.effective_chat
+        if message is None or chat is None:
+            return
+        now = time.time()
+        self.observe(chat.id, message.from_user, now)
+        if message.reply_to_message:
+            self.observe(chat.id, message.reply_to_message.from_user, now)
+        for ent in message.entities or ():
+            if ent.type == "text_mention":
+                self.observe(chat.id, ent.user, now)
+        for member in message.new_chat_members or ():
+            self.observe(chat.id, member, now)
+
+    def lookup(self, chat_id: int, username: str) -> User | None:
+        members = self._chats.get(chat_id)
+        if not members:
+            return None
+        key = username.lstrip("@").lower()
+        entry = members.get(key)
+        if entry is None:
+            return None
+        user, seen = entry
+        if time.time() - seen > self.ttl:
+            del members[key]
+            return None
+        members.move_to_end(key)
+        return user
+
+    async def resolve(self, bot: Bot, chat_id: int, username: str) -> User | None:
+        """Сначала ищет в справочнике, и только при промахе спрашивает Bot API."""
+        user = self.lookup(chat_id, username)
+        if user is not None:
+            return user
+        username = username.lstrip("@")
+        try:
+            member = await bot.get_chat_member(chat_id, username)
+        except Exception as e:
+            logger.warning(f"Не удалось найти пользователя {username} в чате: {e}")
+            return None
+        self.observe(chat_id, member.user)
+        return member.user
+
+    def save(self, path: str = MEMBERS_PATH) -> None:
+        now = time.time()
+        data = {
+            str(chat_id): [
+                [user.id, user.username, user.first_name, seen]
+                for user, seen in members.values() if now - seen <= self.ttl
+            ]
+            for chat_id, members in self._chats.items()
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str = MEMBERS_PATH) -> None:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать справочник участников {path}: {e}")
+            return
+        for chat_id, rows in data.items():
+            # Строки сохранены от старых к новым, так что порядок LRU восстанавливается
+            for user_id, username, first_name, seen in rows:
+                user = User(id=user_id, first_name=first_name or username, is_bot=False, username=username)
+                self.observe(int(chat_id), user, seen)
+        logger.info(f"👥 Загружено участников: {len(self)}")
+
+
+MEMBER_DIRECTORY = MemberDirectory()
+
+
+async def observe_members(update: Update, context) -> None:
+    """Обработчик группы -1: пополняет справочник из каждого апдейта."""
+    MEMBER_DIRECTORY.observe_update(update)
@@ -0,0 +1,299 @@
+import asyncio
+import functools
+import logging
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Mapping
+
+from telegram.ext import ApplicationHandlerStop
+from telegram.request import BaseRequest
+
+from utils.http_server import HttpError, HttpServer, Response
+
+logger = logging.getLogger(__name__)
+
+# Префикс всех метрик бота
+PREFIX = "maidbot_"
+
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Исходы обработчика: по умолчанию «не его сообщение», обработчик сам отмечает остальное
+MATCH = "match"
+NO_MATCH = "no_match"
+ERROR = "error"
+
+DEFAULTS = {
+    "enabled": False,
+    "listen": "127.0.0.1",
+    "port": 9100,
+    "path": "/metrics",
+}
+
+_outcome: ContextVar[str] = ContextVar("handler_outcome", default=NO_MATCH)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    __slots__ = ("name", "help", "labelnames", "values")
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {value:g}" for key, value in self.values.items()]
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами: наблюдение — bisect и два сложения.
+    Для каждого набора меток хранится [счётчики корзин..., сумма].
+    """
+    __slots__ = ("name", "help", "labelnames", "buckets", "values")
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.values: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        counts = self.values.get(labels)
+        if counts is None:
+            # Последняя корзина — +Inf, за ней сумма
+            counts = self.values[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def count(self, *labels: Any) -> int:
+        counts = self.values.get(labels)
+        return int(sum(counts[:-1])) if counts else 0
+
+    def quantile(self, q: float, *labels: Any) -> float | None:
+        """Оценка квантиля по корзинам (верхняя граница корзины, куда он попал)."""
+        counts = self.values.get(labels)
+        if not counts:
+            return None
+        rank = q * sum(counts[:-1])
+        seen = 0
+        for bound, n in zip(self.buckets, counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def render(self) -> list[str]:
+        lines = []
+        for key, counts in self.values.items():
+            total = 0
+            for bound, n in zip(self.buckets, counts):
+                total += n
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {total}")
+            total += counts[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {counts[-1]:g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {total}")
+        return lines
+
+
+class Gauge:
+    """
+    Значение, которое читается при экспорте: глубины очередей, размеры таблиц и т.п.
+    kind="counter" — для счётчиков, которые и так ведёт сам компонент (отброшенные действия).
+    """
+    __slots__ = ("name", "help", "labelnames", "read", "kind")
+
+    def __init__(
+        self, name: str, help: str, read: Callable[[], float | Mapping[Any, float]],
+        labelname: str = "", kind: str = "gauge"
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = (labelname,) if labelname else ()
+        self.read = read
+        self.kind = kind
+
+    def render(self) -> list[str]:
+        try:
+            value = self.read()
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать метрику {self.name}: {e}")
+            return []
+        if isinstance(value, Mapping):
+            return [f"{self.name}{_labels(self.labelnames, (key,))} {v:g}" for key, v in value.items()]
+        return [f"{self.name} {value:g}"]
+
+
+class MetricsRegistry:
+    """
+    Все метрики процесса. Счётчики и гистограммы живут в обычных dict — обновление
+    стоит сотни наносекунд и не требует блокировок (всё в одном event loop).
+    Экспорт — текстовый формат Prometheus.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram | Gauge] = {}
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(PREFIX + name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Histogram:
+        return self._add(Histogram(PREFIX + name, help, labelnames))
+
+    def gauge(
+        self, name: str, help: str, read: Callable[[], Any], labelname: str = "", kind: str = "gauge"
+    ) -> Gauge:
+        # Повторная регистрация (новая сборка приложения) заменяет источник значения
+        gauge = Gauge(PREFIX + name, help, read, labelname, kind)
+        self._metrics[gauge.name] = gauge
+        return gauge
+
+    def read_gauges(self) -> dict[str, tuple[str, Any]]:
+        """Текущие значения считываемых метрик: имя без префикса -> (описание, значение)."""
+        result = {}
+        for metric in self._metrics.values():
+            if isinstance(metric, Gauge):
+                try:
+                    result[metric.name[len(PREFIX):]] = (metric.help, metric.read())
+                except Exception as e:
+                    logger.warning(f"Не удалось прочитать метрику {metric.name}: {e}")
+        return result
+
+    def _add(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+HANDLER_CALLS = METRICS.counter("handler_calls_total", "Вызовы обработчиков по исходу", ("handler", "outcome"))
+HANDLER_SECONDS = METRICS.histogram("handler_seconds", "Время работы обработчиков", ("handler",))
+API_CALLS = METRICS.counter("api_calls_total", "Вызовы Bot API по методу и исходу", ("method", "outcome"))
+API_SECONDS = METRICS.histogram("api_seconds", "Время вызовов Bot API", ("method",))
+
+
+def set_outcome(outcome: str) -> None:
+    """Отмечает исход текущего вызова обработчика (match, или своё: limited, throttled...)."""
+    _outcome.set(outcome)
+
+
+def instrument(name: str) -> Callable:
+    """
+    Декоратор async-обработчика: число вызовов по исходу и гистограмма времени.
+    Исход — NO_MATCH, если обработчик не вызвал set_outcome, и ERROR при исключении.
+    ApplicationHandlerStop — обычный способ остановить обработку, а не ошибка.
+    """
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = _outcome.set(NO_MATCH)
+            started = time.perf_counter()
+            outcome = ERROR
+            try:
+                result = await func(*args, **kwargs)
+                outcome = _outcome.get()
+                return result
+            except ApplicationHandlerStop:
+                outcome = _outcome.get()
+                raise
+            finally:
+                _outcome.reset(token)
+                HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+                HANDLER_CALLS.inc(name, outcome)
+
+        return wrapper
+
+    return decorator
+
+
+class InstrumentedRequest(BaseRequest):
+    """
+    Обёртка над HTTP-клиентом бота: каждый вызов Bot API (sendMessage, deleteMessages,
+    editMessageText, getChatMember, answerCallbackQuery...) считается по методу и исходу —
+    ok, error или retry_after (429) — с гистограммой времени. Разбор ответа и RetryAfter
+    по-прежнему делает PTB.
+    """
+
+    def __init__(self, inner: BaseRequest):
+        self.inner = inner
+
+    @property
+    def read_timeout(self) -> float | None:
+        return self.inner.read_timeout
+
+    async def initialize(self) -> None:
+        await self.inner.initialize()
+
+    async def shutdown(self) -> None:
+        await self.inner.shutdown()
+
+    async def do_request(self, url, method, request_data=None, **kwargs) -> tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            code, payload = await self.inner.do_request(url, method, request_data, **kwargs)
+            if code == HTTPStatus.TOO_MANY_REQUESTS:
+                outcome = "retry_after"
+            elif code < 400:
+                outcome = "ok"
+            return code, payload
+        finally:
+            API_SECONDS.observe(time.perf_counter() - started, endpoint)
+            API_CALLS.inc(endpoint, outcome)
+
+
+class MetricsServer(HttpServer):
+    """Отдаёт METRICS в формате Prometheus по GET на path."""
+
+    def __init__(self, options: Mapping[str, Any] | None = None, registry: MetricsRegistry = METRICS):
+        super().__init__({**DEFAULTS, **(options or {})})
+        self.registry = registry
+
+    async def start(self) -> None:
+        await super().start()
+        logger.info(f"📈 Метрики: http://{self.options['listen']}:{self.port}{self.options['path']}")
+
+    async def dispatch(
+        self, method: str, target: str, headers: dict[str, str], reader: asyncio.StreamReader
+    ) -> Response:
+        if target != self.options["path"]:
+            raise HttpError(HTTPStatus.NOT_FOUND)
+        if method not in ("GET", "HEAD"):
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED)
+        return HTTPStatus.OK, self.registry.render().encode(), "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,295 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Callable, Mapping
+
+from telegram import Bot
+from telegram.error import RetryAfter
+
+from utils.rate_limit import SWEEP_MIN, TokenBucket, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+# Классы приоритета: меньше — раньше
+MODERATION = 0
+ACTION = 1
+MUMBLE = 2
+
+# Лимиты Telegram по умолчанию (переопределяются секцией RATE_LIMITS в config.yaml)
+# *_burst — сколько сообщений можно отправить подряд; скорость пополнения считается так,
+# чтобы за любое окно (всплеск + пополнение) лимит Telegram не превышался.
+DEFAULT_LIMITS = {
+    "global_per_second": 30,
+    "global_burst": 5,
+    "group_per_minute": 20,
+    "group_burst": 5,
+    "private_per_second": 1,
+}
+
+# Сколько раз повторяем запрос после RetryAfter
+MAX_RETRIES = 3
+
+# Сколько секунд при остановке досылаем накопленное, прежде чем отменить остаток
+STOP_DRAIN_TIMEOUT = 5.0
+# Как часто при остановке проверяем, опустела ли очередь
+DRAIN_POLL_INTERVAL = 0.05
+
+_PRIORITY_NAMES = {MODERATION: "модерация", ACTION: "действия", MUMBLE: "мямления"}
+
+
+class _Request:
+    __slots__ = ("priority", "seq", "method", "kwargs", "future", "on_sent", "attempts")
+
+    def __init__(self, priority, seq, method, kwargs, future, on_sent):
+        self.priority = priority
+        self.seq = seq
+        self.method = method
+        self.kwargs = kwargs
+        self.future = future
+        self.on_sent = on_sent
+        self.attempts = 0
+
+    def __lt__(self, other: "_Request") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+def _consume_error(future: asyncio.Future) -> None:
+    # Ошибку уже залогировали; не даём asyncio ругаться на «never retrieved»
+    if not future.cancelled():
+        future.exception()
+
+
+class OutboundScheduler:
+    """
+    Очередь исходящих send/edit-запросов к Bot API с вёдрами токенов:
+    одно общее на бота и по одному на чат. Внутри чата запросы идут по приоритету
+    (модерация → RP-действия → мямления), RetryAfter ставит чат на паузу
+    и возвращает запрос в очередь.
+    """
+
+    def __init__(self, limits: Mapping[str, float] | None = None, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.bot: Bot | None = None
+        # chat_id -> куча запросов этого чата
+        self._queues: dict[int, list[_Request]] = {}
+        self._buckets: dict[int, TokenBucket] = {}
+        self._sweep_at = SWEEP_MIN
+        self.configure(limits)
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._driver: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+    def configure(self, limits: Mapping[str, float] | None) -> None:
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self._global = self._make_bucket(self.limits["global_per_second"], 1, self.limits["global_burst"])
+        self._buckets.clear()
+
+    def _make_bucket(self, limit: float, period: float, burst: float) -> TokenBucket:
+        burst = max(1.0, min(float(burst), float(limit) - 1))
+        rate = max(float(limit) - burst, 1.0) / period
+        return TokenBucket(rate, burst, self._clock())
+
+    def attach(self, bot: Bot) -> None:
+        self.bot = bot
+
+    def depth(self) -> dict[int, int]:
+        """Глубина очереди по классам приоритета."""
+        result = {MODERATION: 0, ACTION: 0, MUMBLE: 0}
+        for queue in self._queues.values():
+            for req in queue:
+                result[req.priority] = result.get(req.priority, 0) + 1
+        return result
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def send_message(
+        self, chat_id: int, text: str, *, priority: int = ACTION,
+        on_sent: Callable[[Any], None] | None = None, **kwargs
+    ) -> asyncio.Future:
+        return self.submit(chat_id, "send_message", priority, on_sent, text=text, **kwargs)
+
+    def edit_message_text(
+        self, chat_id: int, message_id: int, text: str, *, priority: int = ACTION,
+        on_sent: Callable[[Any], None] | None = None, **kwargs
+    ) -> asyncio.Future:
+        return self.submit(
+            chat_id, "edit_message_text", priority, on_sent,
+            message_id=message_id, text=text, **kwargs
+        )
+
+    def reply(self, message, text: str, *, priority: int = MODERATION, **kwargs) -> asyncio.Future:
+        """Ответ на сообщение (аналог message.reply_text) через общую очередь."""
+        return self.send_message(
+            message.chat.id, text, priority=priority,
+            reply_to_message_id=message.message_id, **kwargs
+        )
+
+    def submit(
+        self, chat_id: int, method: str, priority: int,
+        on_sent: Callable[[Any], None] | None = None, **kwargs
+    ) -> asyncio.Future:
+        """
+        Ставит вызов bot.<method>(chat_id=..., **kwargs) в очередь. Возвращает future
+        с результатом; ждать его необязательно — on_sent вызовется после отправки.
+        """
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_error)
+        kwargs["chat_id"] = chat_id
+        req = _Request(priority, next(self._seq), method, kwargs, future, on_sent)
+        heapq.heappush(self._queues.setdefault(chat_id, []), req)
+        self._wakeup.set()
+        return future
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) >= self._sweep_at:
+                self.sweep()
+            if chat_id < 0:
+                bucket = self._make_bucket(self.limits["group_per_minute"], 60, self.limits["group_burst"])
+            else:
+                bucket = self._make_bucket(self.limits["private_per_second"], 1, 1)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def sweep(self, now: float | None = None) -> int:
+        """
+        Забывает вёдра чатов, которые успели наполниться и которым нечего отправлять:
+        новое ведро для такого чата будет таким же полным. Как и RateLimiter.sweep,
+        запускается, когда вёдер становится вдвое больше, чем после прошлой уборки.
+        """
+        now = self._clock() if now is None else now
+        idle = [
+            chat_id for chat_id, bucket in self._buckets.items()
+            if bucket.full_at() <= now and not self._queues.get(chat_id)
+        ]
+        for chat_id in idle:
+            del self._buckets[chat_id]
+        self._sweep_at = max(SWEEP_MIN, 2 * len(self._buckets))
+        return len(idle)
+
+    def start(self) -> None:
+        if self._driver is None or self._driver.done():
+            self._driver = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout: float = STOP_DRAIN_TIMEOUT) -> None:
+        """
+        Останавливает очередь. Сначала до timeout секунд досылает накопленное с обычными
+        лимитами: запросы идут по приоритету, так что объявления модерации уходят первыми.
+        Что не успело — отменяется. Бот к этому моменту должен быть ещё жив (post_stop).
+        """
+        if self._driver is not None and not self._driver.done() and (len(self) or self._inflight):
+            try:
+                await asyncio.wait_for(self._drained(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        if self._driver is not None:
+            self._driver.cancel()
+            try:
+                await self._driver
+            except asyncio.CancelledError:
+                pass
+            self._driver = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        dropped = len(self)
+        by_priority = ", ".join(
+            f"{_PRIORITY_NAMES.get(priority, priority)}: {count}" for priority, count in self.depth().items() if count
+        )
+        for queue in self._queues.values():
+            for req in queue:
+                req.future.cancel()
+        self._queues.clear()
+        if dropped:
+            logger.warning(f"📤 При остановке не отправлено запросов: {dropped} ({by_priority})")
+
+    async def _drained(self) -> None:
+        # RetryAfter возвращает запрос в очередь, поэтому ждём и очередь, и запросы в полёте
+        while len(self) or self._inflight:
+            await asyncio.sleep(DRAIN_POLL_INTERVAL)
+
+    async def _run(self) -> None:
+        while True:
+            timeout = self._dispatch_ready()
+            self._wakeup.clear()
+            if timeout == 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch_ready(self) -> float | None:
+        """
+        Отправляет всё, на что есть токены. Возвращает, сколько ждать до следующей
+        попытки (None — очередь пуста, 0 — есть ещё готовые запросы).
+        """
+        now = self._clock()
+        best: tuple[_Request, int] | None = None
+        wait = None
+        for chat_id, queue in list(self._queues.items()):
+            if not queue:
+                del self._queues[chat_id]
+                continue
+            chat_wait = self._chat_bucket(chat_id).wait_time(now)
+            if chat_wait > 0:
+                wait = chat_wait if wait is None else min(wait, chat_wait)
+                continue
+            if best is None or queue[0] < best[0]:
+                best = (queue[0], chat_id)
+
+        if best is None:
+            return wait
+
+        global_wait = self._global.wait_time(now)
+        if global_wait > 0:
+            return global_wait
+
+        req, chat_id = best
+        heapq.heappop(self._queues[chat_id])
+        self._global.try_take(now)
+        self._chat_bucket(chat_id).try_take(now)
+        task = asyncio.get_running_loop().create_task(self._perform(chat_id, req))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+        return 0
+
+    async def _perform(self, chat_id: int, req: _Request) -> None:
+        if req.future.cancelled():
+            return
+        try:
+            result = await getattr(self.bot, req.method)(**req.kwargs)
+        except RetryAfter as e:
+            delay = retry_after_seconds(e)
+            req.attempts += 1
+            self._chat_bucket(chat_id).pause(self._clock(), delay)
+            if req.attempts > MAX_RETRIES:
+                logger.error(f"{req.method} в чате {chat_id} отброшен после {req.attempts} RetryAfter")
+                if not req.future.done():
+                    req.future.set_exception(e)
+                return
+            logger.warning(f"RetryAfter {delay}с для чата {chat_id}, запрос вернулся в очередь")
+            heapq.heappush(self._queues.setdefault(chat_id, []), req)
+            self._wakeup.set()
+            return
+        except Exception as e:
+            logger.error(f"Ошибка {req.method} в чате {chat_id}: {e}")
+            # Ожидавший обработчик мог быть отменён, пока шёл запрос
+            if not req.future.done():
+                req.future.set_exception(e)
+            return
+
+        if not req.future.done():
+            req.future.set_result(result)
+        if req.on_sent:
+            try:
+                req.on_sent(result)
+            except Exception as e:
+                logger.error(f"Ошибка в on_sent после {req.method}: {e}")
+
+
+OUTBOUND = OutboundScheduler()
@@ -0,0 +1,331 @@
+import time
+from array import array
+from collections import Counter
+from datetime import timedelta
+from typing import Callable, Hashable, Mapping
+
+from telegram.error import RetryAfter
+
+from config.config_store import ConfigSnapshot
+from utils.state_backend import COOLDOWNS, StateBackend
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    # В новых версиях PTB retry_after может быть timedelta
+    value = error.retry_after
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+class TokenBucket:
+    """
+    Классическое «ведро токенов»: capacity — допустимый всплеск, rate — токенов в секунду.
+    Время передаётся снаружи (monotonic), чтобы одно ведро не дёргало часы само.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "stamp")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = now
+
+    def _refill(self, now: float) -> None:
+        if now > self.stamp:
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def try_take(self, now: float, amount: float = 1.0) -> bool:
+        self._refill(now)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def wait_time(self, now: float, amount: float = 1.0) -> float:
+        """Через сколько секунд в ведре наберётся amount токенов."""
+        self._refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def pause(self, now: float, seconds: float) -> None:
+        # Telegram попросил подождать (RetryAfter) — обнуляем ведро на это время
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+    def full_at(self) -> float:
+        """Момент (по тем же часам), когда ведро снова наполнится и его можно забыть."""
+        return self.stamp + max(self.capacity - self.tokens, 0.0) / self.rate
+
+
+# Области действия лимита: на пользователя во всех чатах, на чат целиком, на пользователя в чате
+USER = "user"
+CHAT = "chat"
+CHAT_USER = "chat_user"
+SCOPES = (USER, CHAT, CHAT_USER)
+
+# Меньше стольких ключей уборку истёкших не затеваем
+SWEEP_MIN = 1024
+
+
+def scoped_key(name: str, scope: str, chat_id: int, user_id: int) -> tuple[str, int, int]:
+    """
+    Ключ лимита (name, chat_id, user_id): лишнее для области обнуляется.
+    Кортеж из уже имеющихся объектов — без форматирования строки на каждый вызов.
+    RATE_LIMITER у каждого процесса свой, поэтому при шардировании USER — это
+    «пользователь во всех чатах своего воркера»: апдейты делятся по чатам, не по людям.
+    """
+    if scope == CHAT:
+        return name, chat_id, 0
+    if scope == USER:
+        return name, 0, user_id
+    return name, chat_id, user_id
+
+
+class RateLimiter:
+    """
+    Кулдауны и лимиты с ключами из scoped_key. На каждый активный ключ — одно
+    TokenBucket (period — за сколько секунд восстанавливается одно использование,
+    burst — сколько использований подряд). burst=1 — обычный кулдаун.
+
+    Истечение считается по monotonic-часам при обращении — ни таймеров, ни задач
+    на запись. Полные (то есть забытые) вёдра вычищаются разом, когда ключей
+    становится вдвое больше, чем после прошлой уборки: амортизированно O(1),
+    и память — только на активные ключи.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._buckets: dict[Hashable, TokenBucket] = {}
+        # Ключи, которые пишутся в StateBackend и должны пережить рестарт
+        self._persisted: set[Hashable] = set()
+        self._sweep_at = SWEEP_MIN
+        self.store: StateBackend | None = None
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def attach(self, store: StateBackend | None) -> None:
+        self.store = store
+
+    def hit(self, key: tuple[str, int, int], period: float, burst: int = 1, persist: bool = False) -> bool:
+        """
+        Тратит одно использование. False — лимит исчерпан, ничего не списано.
+        period <= 0 — без ограничения (ведро не заводится).
+        """
+        if burst < 1:
+            raise ValueError(f"burst должен быть не меньше 1, получено {burst}")
+        if period <= 0:
+            # Кулдаун могли обнулить через /reload — прежнее ведро больше не нужно
+            self._buckets.pop(key, None)
+            return True
+        now = self._clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self._sweep_at:
+                self.sweep(now)
+            bucket = self._buckets[key] = TokenBucket(1.0 / period, burst, now)
+        else:
+            # Лимиты могли поменяться после /reload
+            bucket.rate, bucket.capacity = 1.0 / period, burst
+        if not bucket.try_take(now):
+            return False
+        if persist and self.store is not None:
+            self._persisted.add(key)
+            name, chat_id, user_id = key
+            self.store.put(COOLDOWNS, (chat_id, f"{name}:{user_id}"), time.time() + bucket.full_at() - now)
+        return True
+
+    def refund(self, key: Hashable) -> None:
+        """Возвращает использование, если действие так и не состоялось (например, не ушло сообщение)."""
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.tokens = min(bucket.capacity, bucket.tokens + 1)
+
+    def retry_after(self, key: Hashable) -> float:
+        """Через сколько секунд по ключу снова можно (0 — уже можно)."""
+        bucket = self._buckets.get(key)
+        return 0.0 if bucket is None else bucket.wait_time(self._clock())
+
+    def sweep(self, now: float | None = None) -> int:
+        """Забывает вёдра, которые успели наполниться. Возвращает, сколько убрано."""
+        now = self._clock() if now is None else now
+        expired = [key for key, bucket in self._buckets.items() if bucket.full_at() <= now]
+        for key in expired:
+            del self._buckets[key]
+            if key in self._persisted:
+                self._persisted.discard(key)
+                if self.store is not None:
+                    name, chat_id, user_id = key
+                    self.store.remove(COOLDOWNS, (chat_id, f"{name}:{user_id}"))
+        self._sweep_at = max(SWEEP_MIN, 2 * len(self._buckets))
+        return len(expired)
+
+    async def restore(
+        self, limits: Callable[[str], tuple[float, int] | None],
+        owns: Callable[[int], bool] | None = None
+    ) -> int:
+        """
+        Поднимает сохранённые кулдауны после рестарта: чаты этого шарда и все лимиты
+        области USER (chat_id 0) — пользователь может писать в чаты любого шарда.
+        limits(name) -> (period, burst) по текущему конфигу или None, если такого лимита больше нет.
+        """
+        if self.store is None:
+            return 0
+        wall, now = time.time(), self._clock()
+        restored = 0
+        for (chat_id, item), expires in (await self.store.aload(COOLDOWNS, wall)).items():
+            if owns is not None and chat_id and not owns(chat_id):
+                continue
+            name, _, user_id = item.rpartition(":")
+            limit = limits(name) if name and user_id.lstrip("-").isdigit() else None
+            if limit is None or limit[0] <= 0:
+                continue
+            period, burst = limit
+            key = (name, chat_id, int(user_id))
+            bucket = TokenBucket(1.0 / period, burst, now)
+            # Сколько использований не успело восстановиться к моменту рестарта
+            bucket.tokens = burst - (expires - wall) / period
+            self._buckets[key] = bucket
+            self._persisted.add(key)
+            restored += 1
+        return restored
+
+
+RATE_LIMITER = RateLimiter()
+
+
+# На сколько слотов делится скользящее окно: точность окна — 1/WINDOW_SLOTS его длины
+WINDOW_SLOTS = 10
+
+# Лимиты RP-действий по умолчанию (переопределяются секцией ACTION_LIMITS в config.yaml):
+# limit срабатываний за window секунд; limit 0 — без ограничения
+DEFAULT_ACTION_LIMITS = {
+    "per_user": {"limit": 4, "window": 20},
+    "per_chat": {"limit": 15, "window": 60},
+}
+
+
+class WindowCounter:
+    """
+    Скользящее окно фиксированного размера: кольцо из WINDOW_SLOTS счётчиков,
+    а не список событий. head — абсолютный номер последнего слота (время // ширина слота).
+    """
+
+    __slots__ = ("slots", "head", "total")
+
+    def __init__(self, tick: int, size: int = WINDOW_SLOTS):
+        self.slots = array("I", bytes(4 * size))
+        self.head = tick
+        self.total = 0
+
+    def advance(self, tick: int) -> None:
+        """Сдвигает окно к слоту tick, обнуляя выпавшие слоты."""
+        gap = tick - self.head
+        if gap <= 0:
+            return
+        size = len(self.slots)
+        if gap >= size:
+            self.slots = array("I", bytes(4 * size))
+            self.total = 0
+        else:
+            for t in range(self.head + 1, tick + 1):
+                i = t % size
+                self.total -= self.slots[i]
+                self.slots[i] = 0
+        self.head = tick
+
+    def add(self) -> None:
+        self.slots[self.head % len(self.slots)] += 1
+        self.total += 1
+
+
+class _Window:
+    """Один вид лимита: limit событий за window секунд на ключ."""
+
+    __slots__ = ("limit", "width", "counters")
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.width = window / WINDOW_SLOTS
+        self.counters: dict[Hashable, WindowCounter] = {}
+
+    def counter(self, key: Hashable, now: float) -> WindowCounter:
+        tick = int(now / self.width)
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters[key] = WindowCounter(tick)
+        else:
+            counter.advance(tick)
+        return counter
+
+    def sweep(self, now: float) -> None:
+        # Счётчик, который не трогали целое окно, пуст — его можно забыть
+        stale = int(now / self.width) - WINDOW_SLOTS
+        for key in [key for key, counter in self.counters.items() if counter.head <= stale]:
+            del self.counters[key]
+
+
+class ActionThrottle:
+    """
+    Анти-флуд RP-действий: скользящие окна на пользователя в чате и на чат целиком.
+    Каждое действие — удаление плюс отправка, и один пользователь, раз за разом
+    отвечающий «обнять», иначе съедает лимит чата и отодвигает ответы модерации.
+    Сверх лимита действие молча отбрасывается, отброшенные считаются в dropped.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._sweep_at = SWEEP_MIN
+        # Сколько действий отброшено: "per_user" / "per_chat" -> число
+        self.dropped: Counter[str] = Counter()
+        self.configure(None)
+
+    def __len__(self) -> int:
+        return sum(len(w.counters) for w in (self._user, self._chat) if w is not None)
+
+    def configure(self, limits: Mapping[str, Mapping] | None, version: int | None = None) -> None:
+        limits = limits or {}
+        # Каждая секция дополняется своими значениями по умолчанию: per_user без window — это 20 с, а не 60
+        self._user = self._make_window({**DEFAULT_ACTION_LIMITS["per_user"], **(limits.get("per_user") or {})})
+        self._chat = self._make_window({**DEFAULT_ACTION_LIMITS["per_chat"], **(limits.get("per_chat") or {})})
+        self._version = version
+
+    @staticmethod
+    def _make_window(options: Mapping) -> _Window | None:
+        limit = int(options.get("limit", 0))
+        return _Window(limit, float(options.get("window", 60))) if limit > 0 else None
+
+    def allow(self, chat_id: int, user_id: int, config: ConfigSnapshot | None = None) -> bool:
+        """Учитывает срабатывание, если оба окна не переполнены; иначе — False, ничего не списано."""
+        if config is not None and config.version != self._version:
+            # Конфиг перезагрузили — окна начинаются заново
+            self.configure(config.get("ACTION_LIMITS"), config.version)
+        now = self._clock()
+        if len(self) >= self._sweep_at:
+            self.sweep(now)
+
+        user = self._user.counter((chat_id, user_id), now) if self._user else None
+        if user is not None and user.total >= self._user.limit:
+            self.dropped["per_user"] += 1
+            return False
+        chat = self._chat.counter(chat_id, now) if self._chat else None
+        if chat is not None and chat.total >= self._chat.limit:
+            self.dropped["per_chat"] += 1
+            return False
+        if user is not None:
+            user.add()
+        if chat is not None:
+            chat.add()
+        return True
+
+    def sweep(self, now: float | None = None) -> None:
+        now = self._clock() if now is None else now
+        for window in (self._user, self._chat):
+            if window is not None:
+                window.sweep(now)
+        self._sweep_at = max(SWEEP_MIN, 2 * len(self))
+
+
+ACTION_THROTTLE = ActionThrottle()
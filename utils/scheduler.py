@@ -0,0 +1,171 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+import time
+from collections import Counter
+from typing import Any, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+def _kind(key: Hashable) -> str:
+    """Вид таймера для логов и метрик — первый элемент ключа-кортежа («gag», «delete_flush», …)."""
+    return str(key[0] if isinstance(key, tuple) and key else key)
+
+
+class _Timer:
+    __slots__ = ("key", "deadline", "callback", "cancelled")
+
+    def __init__(self, key: Hashable, deadline: float, callback: Callable[[], Any]):
+        self.key = key
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+
+class TimerScheduler:
+    """
+    Единый планировщик отложенных действий (удаления сообщений, окончание кляпов и т.п.).
+
+    Таймеры адресуются ключом. Куча с «ленивым» удалением: cancel — O(1)
+    (запись просто помечается), перенос на более поздний срок — O(1) (меняется
+    только deadline, запись в куче перепланируется, когда до неё дойдёт очередь).
+    Все таймеры обслуживает одна фоновая задача.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._timers: dict[Hashable, _Timer] = {}
+        self._heap: list[tuple[float, int, _Timer]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._driver: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable[[], Any]) -> None:
+        """
+        Планирует callback через delay секунд. Таймер с тем же ключом заменяется.
+        callback может быть обычной функцией или возвращать корутину.
+        """
+        old = self._timers.pop(key, None)
+        if old:
+            old.cancelled = True
+        timer = _Timer(key, self._clock() + max(delay, 0), callback)
+        self._timers[key] = timer
+        self._push(timer)
+
+    def reschedule(self, key: Hashable, delay: float) -> bool:
+        """Переносит срок существующего таймера. Возвращает False, если такого ключа нет."""
+        timer = self._timers.get(key)
+        if timer is None:
+            return False
+        deadline = self._clock() + max(delay, 0)
+        earlier = deadline < timer.deadline
+        timer.deadline = deadline
+        # Более поздний срок подхватится при извлечении старой записи из кучи
+        if earlier:
+            self._push(timer)
+        return True
+
+    def cancel(self, key: Hashable) -> bool:
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        timer.cancelled = True
+        return True
+
+    def pending(self) -> dict[Hashable, float]:
+        """Снимок ожидающих таймеров: ключ -> секунд до срабатывания."""
+        now = self._clock()
+        return {key: max(t.deadline - now, 0.0) for key, t in self._timers.items()}
+
+    def kinds(self) -> dict[str, int]:
+        """Число ожидающих таймеров по видам (для метрик)."""
+        return dict(Counter(_kind(key) for key in self._timers))
+
+    def _push(self, timer: _Timer) -> None:
+        heapq.heappush(self._heap, (timer.deadline, next(self._seq), timer))
+        # Мусорных записей больше половины — пересобираем кучу, чтобы память не росла
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._timers):
+            self._heap = [
+                (t.deadline, next(self._seq), t) for t in self._timers.values()
+            ]
+            heapq.heapify(self._heap)
+        if self._heap[0][2] is timer:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._driver is None or self._driver.done():
+            self._driver = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._driver is not None:
+            self._driver.cancel()
+            try:
+                await self._driver
+            except asyncio.CancelledError:
+                pass
+            self._driver = None
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        pending = self.pending()
+        if pending:
+            kinds = ", ".join(f"{kind}: {n}" for kind, n in Counter(map(_kind, pending)).most_common())
+            logger.info(
+                f"⏱️ Планировщик остановлен, неисполненных таймеров: {len(pending)} ({kinds}), "
+                f"ближайший через {min(pending.values()):.0f} с"
+            )
+
+    async def _run(self) -> None:
+        while True:
+            timeout = None
+            while self._heap:
+                deadline, _, timer = self._heap[0]
+                if timer.cancelled:
+                    heapq.heappop(self._heap)
+                    continue
+                now = self._clock()
+                if timer.deadline > deadline:
+                    # Таймер перенесли на более поздний срок
+                    heapq.heapreplace(self._heap, (timer.deadline, next(self._seq), timer))
+                    continue
+                if deadline > now:
+                    timeout = deadline - now
+                    break
+                heapq.heappop(self._heap)
+                self._timers.pop(timer.key, None)
+                timer.cancelled = True
+                self._fire(timer)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fire(self, timer: _Timer) -> None:
+        try:
+            result = timer.callback()
+        except Exception as e:
+            logger.error(f"Ошибка в таймере {timer.key}: {e}")
+            return
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result)
+            self._running.add(task)
+            task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Ошибка в отложенной задаче: {task.exception()}")
+
+
+SCHEDULER = TimerScheduler()
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import Any, Callable
+
+from telegram import Update
+from telegram.ext import Application, ApplicationBuilder, ApplicationHandlerStop, ContextTypes, TypeHandler
+
+from utils.update_processor import ordering_key
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд ждём воркер при остановке, прежде чем завершить его принудительно
+WORKER_STOP_TIMEOUT = 30.0
+
+
+@dataclass(frozen=True)
+class Shard:
+    """Какая доля чатов достаётся процессу: chat_id % count == index."""
+    index: int = 0
+    count: int = 1
+
+    def owns(self, chat_id: int) -> bool:
+        return self.count <= 1 or shard_of(chat_id, self.count) == self.index
+
+    def __str__(self) -> str:
+        return f"{self.index + 1}/{self.count}"
+
+
+def shard_of(key: Any, count: int) -> int:
+    """
+    Номер воркера для ключа упорядочивания (чат или («user», id)).
+    Без hash(): он у строк разный в разных процессах, а чат должен всегда попадать к одному воркеру.
+    """
+    if isinstance(key, tuple):
+        key = key[-1]
+    return int(key or 0) % count
+
+
+def _worker_main(build: Callable[..., Application], shard: Shard, conn: Connection) -> None:
+    """Точка входа процесса-воркера: своё приложение, апдейты приходят из трубы от фронта."""
+    # Ctrl+C получает вся группа процессов; воркер останавливается, когда фронт закрывает трубу
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        format=f"%(asctime)s - worker {shard} - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO
+    )
+    from config.config_store import CONFIG_STORE
+    from utils.app_lifecycle import running
+
+    application = build(CONFIG_STORE.current, shard=shard)
+
+    async def serve() -> None:
+        loop = asyncio.get_running_loop()
+        async with running(application):
+            while True:
+                try:
+                    payload = await loop.run_in_executor(None, conn.recv_bytes)
+                except (EOFError, OSError):
+                    break  # фронт остановился
+                update = Update.de_json(json.loads(payload), application.bot)
+                await application.update_queue.put(update)
+
+    asyncio.run(serve())
+    logger.info(f"👷 Воркер {shard} остановлен")
+
+
+class _Worker:
+    def __init__(self, build: Callable[..., Application], shard: Shard):
+        self.build = build
+        self.shard = shard
+        self.process: multiprocessing.Process | None = None
+        self.conn: Connection | None = None
+        # Один поток на воркер: отправки в трубу идут строго по порядку и не блокируют loop
+        self.sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"shard-{shard.index}")
+
+    def start(self) -> None:
+        self._reap()
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(self.build, self.shard, child_conn),
+            name=f"worker-{self.shard.index}", daemon=False,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        logger.info(f"👷 Запущен воркер {self.shard} (pid {self.process.pid})")
+
+    def _reap(self) -> None:
+        """Перед перезапуском закрывает трубу к прежнему процессу и забирает его, иначе утекают fd."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process.join()
+            self.process.close()
+            self.process = None
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def stop(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+        if self.process is not None:
+            self.process.join(WORKER_STOP_TIMEOUT)
+            if self.process.is_alive():
+                logger.warning(f"Воркер {self.shard} не остановился вовремя, завершаем")
+                self.process.terminate()
+        self.sender.shutdown(wait=False)
+
+
+class ShardRouter:
+    """
+    Фронт-процесс: принимает апдейты (long polling или вебхук, как обычно) и раздаёт их
+    по N воркерам по chat_id. Упавший воркер перезапускается; его кляпы, кулдауны
+    и отложенные удаления он поднимет из общего StateBackend.
+    """
+
+    def __init__(self, build: Callable[..., Application], workers: int):
+        self.workers = [_Worker(build, Shard(index, workers)) for index in range(workers)]
+
+    def start(self) -> None:
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self) -> None:
+        for worker in self.workers:
+            worker.stop()
+
+    async def route(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        key = ordering_key(update)
+        worker = self.workers[shard_of(key, len(self.workers))]
+        payload = json.dumps(update.to_dict()).encode()
+
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            if not worker.alive():
+                logger.warning(f"Воркер {worker.shard} не работает, перезапускаем")
+                worker.start()
+            try:
+                await loop.run_in_executor(worker.sender, worker.conn.send_bytes, payload)
+                break
+            except (BrokenPipeError, OSError) as e:
+                if attempt:
+                    logger.error(f"Апдейт {update.update_id} потерян: воркер {worker.shard} недоступен ({e})")
+        # Во фронте больше ничего не обрабатываем
+        raise ApplicationHandlerStop
+
+
+def build_front_application(token: str, router: ShardRouter) -> Application:
+    """
+    Приложение фронт-процесса: единственный обработчик раздаёт апдейты воркерам.
+    Запускается как обычно — run_polling() или run_webhook(), воркеры стартуют в post_init.
+    """
+
+    async def post_init(application: Application) -> None:
+        router.start()
+
+    async def post_shutdown(application: Application) -> None:
+        # Закрытые трубы — сигнал воркерам доработать принятое и остановиться
+        await asyncio.get_running_loop().run_in_executor(None, router.stop)
+
+    application = (
+        ApplicationBuilder()
+        .token(token)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    application.add_handler(TypeHandler(Update, router.route))
+    return application
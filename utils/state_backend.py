@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from config.async_io import run_in_io_thread
+from config.config_loader import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Файл с состоянием бота по умолчанию (каталог data/ не хранится в git)
+STATE_DB_PATH = os.path.join(BASE_DIR, "data", "state.sqlite3")
+
+# Сколько секунд копим изменения перед одной записью на диск
+FLUSH_DELAY = 1.0
+
+# Виды состояния: ключ — (chat_id, строка), значение — unix-время окончания
+GAGS = "gags"              # (chat_id, user_id) -> конец кляпа
+COOLDOWNS = "cooldowns"    # (chat_id, "<flag>:<user_id>") -> когда кулдаун команды полностью истечёт
+DELETIONS = "deletions"    # (chat_id, message_id) -> когда удалить сообщение бота
+
+Key = tuple[int, str]
+
+
+class StateBackend(ABC):
+    """
+    Хранилище состояния, которое должно пережить рестарт процесса: кляпы, кулдауны
+    и отложенные удаления. Записи разложены по чатам, так что воркер при шардировании
+    поднимает только свои (owns — фильтр по chat_id).
+    Внутри event loop читаются aload()/aclose(): дисковые реализации уводят их в пул потоков.
+    """
+
+    @abstractmethod
+    def load(
+        self, kind: str, now: float | None = None, owns: Callable[[int], bool] | None = None
+    ) -> dict[Key, float]:
+        """Оставшиеся записи вида kind; истёкшие к моменту now удаляются."""
+
+    async def aload(
+        self, kind: str, now: float | None = None, owns: Callable[[int], bool] | None = None
+    ) -> dict[Key, float]:
+        return self.load(kind, now, owns)
+
+    @abstractmethod
+    def put(self, kind: str, key: Key, expires: float) -> None:
+        """Запоминает запись; на диск она может попасть не сразу."""
+
+    @abstractmethod
+    def remove(self, kind: str, key: Key) -> None:
+        """Забывает запись."""
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        self.close()
+
+
+class MemoryStateBackend(StateBackend):
+    """Состояние в памяти процесса: для одного процесса без рестартов, скриптов и бенчмарков."""
+
+    def __init__(self):
+        self._data: dict[str, dict[Key, float]] = {}
+
+    def load(self, kind, now=None, owns=None):
+        now = time.time() if now is None else now
+        items = self._data.setdefault(kind, {})
+        for key in [key for key, expires in items.items() if expires <= now]:
+            del items[key]
+        return {key: expires for key, expires in items.items() if owns is None or owns(key[0])}
+
+    def put(self, kind, key, expires):
+        self._data.setdefault(kind, {})[key] = expires
+
+    def remove(self, kind, key):
+        self._data.get(kind, {}).pop(key, None)
+
+
+class SqliteStateBackend(StateBackend):
+    """
+    Состояние в SQLite (WAL). Файл можно делить между процессами-воркерами:
+    каждый пишет только строки своих чатов. Изменения копятся в памяти и пишутся
+    одной транзакцией, чтобы серия команд не делала fsync на каждую.
+
+    Внутри event loop запись и чтение идут в пуле потоков: пока другой воркер держит
+    блокировку файла (до timeout=10 с), обработка апдейтов не стоит. Записи выполняются
+    строго по очереди — более старая пачка не может затереть более новую.
+    """
+
+    def __init__(self, path: str = STATE_DB_PATH, flush_delay: float = FLUSH_DELAY):
+        self.path = path
+        self.flush_delay = flush_delay
+        self._conn: sqlite3.Connection | None = None
+        # Соединение одно на все потоки — обращения к нему по очереди
+        self._lock = threading.Lock()
+        # (kind, chat_id, item) -> expires или None (удалить)
+        self._pending: dict[tuple[str, int, str], float | None] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flush_task: asyncio.Future | None = None
+
+    def open(self) -> None:
+        if self._conn is not None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Несколько воркеров пишут в один файл — ждём блокировку, а не падаем сразу
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                " kind TEXT NOT NULL,"
+                " chat_id INTEGER NOT NULL,"
+                " item TEXT NOT NULL,"
+                " expires REAL NOT NULL,"
+                " PRIMARY KEY (kind, chat_id, item))"
+            )
+            # Файлы прежней версии хранили только кляпы в отдельной таблице
+            legacy = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'gags'").fetchone()
+            if legacy:
+                conn.execute(
+                    "INSERT OR REPLACE INTO state (kind, chat_id, item, expires)"
+                    " SELECT ?, chat_id, CAST(user_id AS TEXT), expires FROM gags", (GAGS,)
+                )
+                conn.execute("DROP TABLE gags")
+        self._conn = conn
+
+    def load(self, kind, now=None, owns=None):
+        """Удаляет одним запросом все истёкшие записи этого вида и возвращает оставшиеся."""
+        self.flush()
+        return self._load(kind, now, owns)
+
+    async def aload(self, kind, now=None, owns=None):
+        await self._aflush()
+        return await run_in_io_thread(self._load, kind, now, owns)
+
+    def _load(self, kind, now, owns):
+        now = time.time() if now is None else now
+        with self._lock:
+            self.open()
+            with self._conn:
+                purged = self._conn.execute(
+                    "DELETE FROM state WHERE kind = ? AND expires <= ?", (kind, now)
+                ).rowcount
+            rows = self._conn.execute(
+                "SELECT chat_id, item, expires FROM state WHERE kind = ?", (kind,)
+            ).fetchall()
+        if purged:
+            logger.info(f"🧹 Удалено истёкших записей «{kind}»: {purged}")
+        return {
+            (chat_id, item): expires
+            for chat_id, item, expires in rows
+            if owns is None or owns(chat_id)
+        }
+
+    def put(self, kind, key, expires):
+        self._pending[(kind, *key)] = expires
+        self._schedule_flush()
+
+    def remove(self, kind, key):
+        self._pending[(kind, *key)] = None
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Вне event loop (скрипты, тесты) пишем сразу
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(self.flush_delay, self._flush_in_background)
+
+    def _flush_in_background(self) -> None:
+        self._flush_handle = None
+        if self._flush_task is not None and not self._flush_task.done():
+            # Предыдущая пачка ещё пишется — эта подождёт следующего срабатывания
+            self._schedule_flush()
+            return
+        pending = self._take_pending()
+        if pending:
+            self._flush_task = asyncio.ensure_future(run_in_io_thread(self._write, pending))
+
+    async def _aflush(self) -> None:
+        """Дожидается текущей записи и пишет всё накопленное, не блокируя event loop."""
+        if self._flush_task is not None:
+            await self._flush_task
+        pending = self._take_pending()
+        if pending:
+            self._flush_task = asyncio.ensure_future(run_in_io_thread(self._write, pending))
+            await self._flush_task
+
+    def _take_pending(self) -> dict[tuple[str, int, str], float | None]:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def flush(self) -> None:
+        """Синхронная запись накопленного — вне event loop (скрипты, остановка)."""
+        pending = self._take_pending()
+        if pending:
+            self._write(pending)
+
+    def _write(self, pending: dict[tuple[str, int, str], float | None]) -> None:
+        upserts = [(*key, expires) for key, expires in pending.items() if expires is not None]
+        deletes = [key for key, expires in pending.items() if expires is None]
+        try:
+            with self._lock:
+                self.open()
+                with self._conn:
+                    if upserts:
+                        self._conn.executemany(
+                            "INSERT OR REPLACE INTO state (kind, chat_id, item, expires) VALUES (?, ?, ?, ?)",
+                            upserts
+                        )
+                    if deletes:
+                        self._conn.executemany(
+                            "DELETE FROM state WHERE kind = ? AND chat_id = ? AND item = ?", deletes
+                        )
+        except sqlite3.Error as e:
+            logger.error(f"Не удалось сохранить состояние: {e}")
+            # Вернём несохранённое обратно, не затирая более свежие изменения
+            for key, value in pending.items():
+                self._pending.setdefault(key, value)
+
+    def close(self) -> None:
+        self.flush()
+        self._close_connection()
+
+    async def aclose(self) -> None:
+        await self._aflush()
+        await run_in_io_thread(self._close_connection)
+
+    def _close_connection(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def make_state_backend(options: dict | None) -> StateBackend:
+    """STATE_BACKEND из config.yaml: sqlite (по умолчанию) или memory."""
+    options = options or {}
+    kind = options.get("type", "sqlite")
+    if kind == "memory":
+        return MemoryStateBackend()
+    if kind != "sqlite":
+        logger.warning(f"⚠️ Неизвестный STATE_BACKEND «{kind}», используем sqlite")
+    path = options.get("path")
+    return SqliteStateBackend(os.path.join(BASE_DIR, path) if path else STATE_DB_PATH)
@@ -1,65 +1,207 @@
+import logging
 import re
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, tzinfo
+from functools import lru_cache
+from typing import Iterable
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
+logger = logging.getLogger(__name__)
 
-def parse_duration(text: str) -> int | None:
-    """
-    Ищет в тексте форматы:
-      - «10с», «5м», «2ч» (буквами: с, м, ч)
-      - «10 сек», «5 секунд», «2 мин», «3 минуты», «1 час», «4 часа»
-    Возвращает количество секунд или None.
-    """
-    txt = text.lower()
-
-    # Сначала ищем форматы с буквами: 10с, 5м, 2ч, 10h, 5m
-    match = re.search(r'(\d+)\s*([сmчh])\b', txt)
-    if match:
-        num = int(match.group(1))
-        unit = match.group(2)
-        if unit == 'с':
-            return num
-        if unit == 'm':
-            # латинская m — считаем минуты
-            return num * 60
-        if unit == 'ч' or unit == 'h':
-            return num * 3600
-
-    # Ищем полные слова: секунд(ы), мин(ут)(ы), час(ов)(а)
-    match_words = re.search(
-        r'(\d+)\s*(секунд[ау]?|сек|минут[ау]?|мин|час(ов|а)?)\b', txt
+# Самый длинный срок, который принимаем (дальше — почти наверняка опечатка в числе)
+MAX_SECONDS = 366 * 24 * 3600
+
+# Синонимы единиц → секунды. Кириллица и латиница, сокращения и словоформы
+_UNITS = {
+    60 * 60 * 24 * 7: ("н", "нед", "недел", "неделя", "недели", "неделю", "недель",
+                       "w", "wk", "week", "weeks"),
+    60 * 60 * 24: ("д", "дн", "день", "дня", "дней", "сут", "суток", "сутки",
+                   "d", "day", "days"),
+    60 * 60: ("ч", "час", "часа", "часов", "h", "hr", "hrs", "hour", "hours"),
+    60: ("м", "мин", "минута", "минуты", "минуту", "минут",
+         "m", "min", "mins", "minute", "minutes"),
+    1: ("с", "сек", "секунда", "секунды", "секунду", "секунд",
+        "s", "sec", "secs", "second", "seconds"),
+}
+_UNIT_SECONDS = {alias: seconds for seconds, aliases in _UNITS.items() for alias in aliases}
+
+# Один проход по тексту: либо @username (пропускается целиком — «@neo2d» не срок «2д»),
+# либо «до <когда>», либо очередное «<число><слово>».
+# Слово после числа — единица, только если оно целиком есть в _UNIT_SECONDS:
+# так «5 минутами» не превращается в «5 минут», а regex не перебирает десятки синонимов
+_TOKEN_RE = re.compile(
+    rf"""
+    (?P<mention>@\w+)
+    |
+    (?P<until>(?<!\w)до\s+
+        (?:(?P<day_word>сегодня|завтра|послезавтра)\s*)?
+        (?:(?P<day>\d{{1,2}})\.(?P<month>\d{{1,2}})(?:\.(?P<year>\d{{4}}|\d{{2}}))?\s*)?
+        (?:(?:в\s+)?(?P<hour>\d{{1,2}}):(?P<minute>\d{{2}}))?
     )
-    if match_words:
-        num = int(match_words.group(1))
-        unit_word = match_words.group(2)
-        if unit_word.startswith('сек'):
-            return num
-        if unit_word.startswith('мин'):
-            return num * 60
-        if unit_word.startswith('час'):
-            return num * 3600
+    |
+    (?P<num>\d+)\s*(?P<unit>[a-zа-яё]+)
+    """,
+    re.VERBOSE,
+)
 
-    return None
+# Между частями составного срока допустимы только пробелы, запятые и «и»
+_GAP_RE = re.compile(r"[\s,]*(?:и\s+)?")
 
+_DAY_WORDS = {"сегодня": 0, "завтра": 1, "послезавтра": 2}
 
-def parse_until(text: str) -> datetime | None:
+
+@lru_cache(maxsize=None)
+def get_timezone(name: str | None) -> tzinfo | None:
     """
-    Ищет формат «до HH:MM» или «до H:MM» и возвращает ближайший datetime в будущем,
-    соответствующий указанному времени.
+    Часовой пояс из конфига (например, «Europe/Moscow»). None — локальный пояс сервера;
+    неизвестное имя тоже откатывается к нему с предупреждением.
     """
-    txt = text.lower()
-    match = re.search(r'до\s+(\d{1,2}):(\d{2})', txt)
-    if not match:
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"⚠️ Неизвестный часовой пояс «{name}», используем пояс сервера")
         return None
 
-    hh = int(match.group(1))
-    mm = int(match.group(2))
-    now = datetime.now()
+
+def now_in(tz: tzinfo | None = None) -> datetime:
+    """Текущее время с часовым поясом (без пояса — в поясе сервера)."""
+    return datetime.now(tz) if tz else datetime.now().astimezone()
+
+
+def _resolve_until(match: re.Match, now: datetime) -> datetime | None:
+    day_word, day, hour = match["day_word"], match["day"], match["hour"]
+    if day_word is None and day is None and hour is None:
+        return None  # просто «до» без даты и времени
+
+    hh = int(hour) if hour is not None else 0
+    mm = int(match["minute"]) if hour is not None else 0
+
     try:
-        target = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
+        if day is not None:
+            year = match["year"]
+            if year is None:
+                target_date = date(now.year, int(match["month"]), int(day))
+            else:
+                target_date = date(int(year) + (2000 if len(year) == 2 else 0), int(match["month"]), int(day))
+        else:
+            target_date = now.date() + timedelta(days=_DAY_WORDS.get(day_word, 0))
+        target = datetime.combine(target_date, datetime.min.time(), tzinfo=now.tzinfo).replace(hour=hh, minute=mm)
     except ValueError:
-        return None  # Неверный формат времени
+        return None  # несуществующие дата или время
 
-    # Если указанное время уже прошло сегодня — берём завтра
-    if target <= now:
-        target += timedelta(days=1)
+    # Уже прошедшее «до HH:MM» — это завтра, прошедшее «до DD.MM» без года — следующий год
+    if target <= now and day_word is None:
+        if day is None:
+            target += timedelta(days=1)
+        elif match["year"] is None:
+            try:
+                target = target.replace(year=target.year + 1)
+            except ValueError:
+                return None  # 29.02 в невисокосный год
     return target
+
+
+def mask_spans(text: str, spans: Iterable[tuple[int, int]]) -> str:
+    """
+    Заменяет куски текста (offset, length в UTF-16, как у MessageEntity) на « @ »,
+    чтобы имя в упоминании («Кот 5м») не читалось как срок и разрывало составной срок.
+    """
+    spans = sorted(spans, reverse=True)
+    if not spans:
+        return text
+    raw = text.encode("utf-16-le")
+    for offset, length in spans:
+        raw = raw[:offset * 2] + " @ ".encode("utf-16-le") + raw[(offset + length) * 2:]
+    return raw.decode("utf-16-le")
+
+
+def _scan(text: str, now: datetime | None) -> tuple[int | None, datetime | None]:
+    """
+    Один проход по тексту. Возвращает (секунды первого составного срока, момент «до ...»);
+    разбор «до» выполняется, только если передан now.
+    """
+    total = None
+    last_end = None
+    until = None
+    text = text.lower()
+    for match in _TOKEN_RE.finditer(text):
+        if match["mention"] is not None:
+            if total is not None:
+                last_end = -1  # упоминание между числами разрывает составной срок
+            continue
+        if match["until"] is not None:
+            if until is None and now is not None:
+                until = _resolve_until(match, now)
+            if total is not None:
+                last_end = -1  # «до ...» разрывает составной срок
+            continue
+
+        unit = _UNIT_SECONDS.get(match["unit"])
+        if unit is None:
+            if total is not None:
+                last_end = -1  # число без единицы тоже разрывает составной срок
+            continue
+        value = int(match["num"]) * unit
+        if total is None:
+            total = value
+        elif last_end is not None and last_end >= 0 and _GAP_RE.fullmatch(text, last_end, match.start()):
+            # Продолжение составного срока: «1ч30м», «1h 15m», «1 час и 30 минут»
+            total += value
+        else:
+            last_end = -1
+            continue
+        last_end = match.end()
+    return total, until
+
+
+def parse_duration(text: str) -> int | None:
+    """
+    Ищет в тексте срок, в том числе составной:
+      - «10с», «5м», «2ч», «3д», «1н», латиницей «10s», «5m», «2h», «3d», «1w»
+      - «10 сек», «5 минут», «2 часа», «3 дня», «1 неделю»
+      - «1ч30м», «1h 15m», «1 час и 30 минут»
+    Возвращает количество секунд или None.
+    """
+    seconds, _ = _scan(text, None)
+    if seconds is None or seconds > MAX_SECONDS:
+        return None
+    return seconds
+
+
+def parse_until(text: str, now: datetime | None = None) -> datetime | None:
+    """
+    Ищет «до HH:MM», «до завтра HH:MM», «до DD.MM», «до DD.MM.YYYY HH:MM» и возвращает
+    момент с часовым поясом now (по умолчанию — пояс сервера). Прошедшее сегодня
+    время переносится на завтра, прошедшая дата без года — на следующий год.
+    """
+    _, until = _scan(text, now or now_in())
+    return until
+
+
+def parse_gag_time(text: str, now: datetime | None = None) -> int | None:
+    """
+    Срок кляпа в секундах за один проход по тексту: сначала срок («1ч30м»),
+    иначе «до ...». None — если в тексте нет ни того, ни другого или срок слишком велик;
+    неположительное значение — если указанный момент уже прошёл.
+    """
+    now = now or now_in()
+    seconds, until = _scan(text, now)
+    if seconds is None and until is not None:
+        # Через timestamp: разность в одном ZoneInfo не учитывает переход на летнее время
+        seconds = int(until.timestamp() - now.timestamp())
+    if seconds is None or seconds > MAX_SECONDS:
+        return None
+    return seconds
+
+
+def format_duration(seconds: int) -> str:
+    """90061 → «1д1ч1м1с»: нулевые части пропускаются."""
+    parts = []
+    for unit_seconds, suffix in ((86400, "д"), (3600, "ч"), (60, "м")):
+        value, seconds = divmod(seconds, unit_seconds)
+        if value:
+            parts.append(f"{value}{suffix}")
+    if seconds or not parts:
+        parts.append(f"{seconds}с")
+    return "".join(parts)
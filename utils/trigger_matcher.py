@@ -0,0 +1,180 @@
+from dataclasses import dataclass
+from typing import Mapping
+
+from telegram import Message, Update, User
+from telegram.ext import ContextTypes
+
+from config.actions_registry import ACTIONS_REGISTRY
+from config.config_store import ConfigSnapshot
+from utils.action_template import ActionTemplate
+from utils.fuzzy_index import get_fuzzy_index
+from utils.member_directory import MEMBER_DIRECTORY
+
+# Виды сообщений, которые различает матчер
+UNGAG = "ungag"
+GAG = "gag"
+ACTION = "action"
+
+# Атрибут контекста, через который результат разбора делится между группами обработчиков
+_CONTEXT_ATTR = "trigger_match"
+
+
+@dataclass(frozen=True)
+class TriggerMatch:
+    kind: str | None = None
+    lower: str = ""
+    # Только для ACTION
+    action_key: str | None = None
+    template: ActionTemplate | None = None
+    target_user: User | None = None
+    target_name: str | None = None
+
+
+NO_MATCH = TriggerMatch()
+
+
+class PrefixTrie:
+    """
+    Префиксное дерево по командам кляпа. Проход по тексту один, стоимость
+    зависит только от длины самой длинной команды, а не от их количества.
+    """
+
+    def __init__(self, prefixes: Mapping[str, str]):
+        self._root: dict = {}
+        for prefix, kind in prefixes.items():
+            node = self._root
+            for ch in prefix:
+                node = node.setdefault(ch, {})
+            # Ключ None хранит вид команды, оканчивающейся в этом узле
+            node.setdefault(None, kind)
+
+    def match(self, text: str) -> set[str]:
+        found = set()
+        node = self._root
+        for ch in text:
+            node = node.get(ch)
+            if node is None:
+                break
+            kind = node.get(None)
+            if kind:
+                found.add(kind)
+        return found
+
+
+def display_name(user: User) -> str:
+    return f"@{user.username}" if user.username else user.first_name
+
+
+def _py_index(text: str, utf16_offset: int) -> int:
+    # Смещения entities в Telegram считаются в UTF-16 code units
+    return len(text.encode("utf-16-le")[: utf16_offset * 2].decode("utf-16-le", errors="ignore"))
+
+
+class TriggerMatcher:
+    """
+    Классифицирует сообщение за один проход: снятие кляпа, кляп, RP-действие или ничего.
+    Строится из снимка конфига; действия ищутся в ACTIONS_REGISTRY за O(1).
+    """
+
+    def __init__(self, snapshot: ConfigSnapshot):
+        self.version = snapshot.version
+        prefixes = {cmd: GAG for cmd in snapshot.gags}
+        # Снятие кляпа приоритетнее, поэтому перезаписывает совпадающие префиксы
+        prefixes.update({cmd: UNGAG for cmd in snapshot.ungags})
+        self._trie = PrefixTrie(prefixes)
+
+        # Поиск с опечатками при промахе точного поиска; 0 — выключен
+        fuzzy = snapshot.get("FUZZY_ACTIONS") or {}
+        self._fuzzy_distance = int(fuzzy.get("max_distance", 1)) if fuzzy.get("enabled", False) else 0
+
+    def classify(self, message: Message) -> TriggerMatch:
+        text = message.text
+        if not text:
+            return NO_MATCH
+        lower = text.lower()
+
+        kinds = self._trie.match(lower)
+        if UNGAG in kinds:
+            return TriggerMatch(UNGAG, lower)
+        if GAG in kinds:
+            return TriggerMatch(GAG, lower)
+
+        return self._match_action(message, text, lower)
+
+    def _match_action(self, message: Message, text: str, lower: str) -> TriggerMatch:
+        target_user = None
+        target_name = None
+        start = None
+
+        # 1) «text_mention» — entity с готовым ent.user, 2) ручное @mention
+        entities = message.entities or ()
+        for ent_type in ("text_mention", "mention"):
+            for ent in entities:
+                if ent.type != ent_type or (ent_type == "text_mention" and not ent.user):
+                    continue
+                end = _py_index(text, ent.offset + ent.length)
+                if ent.user:
+                    target_user = ent.user
+                    target_name = display_name(ent.user)
+                else:
+                    target_name = text[_py_index(text, ent.offset):end]  # вида "@username"
+                    # Если пользователь уже встречался в чате — знаем, кто это
+                    target_user = MEMBER_DIRECTORY.lookup(message.chat.id, target_name)
+                start = end
+                break
+            if target_name:
+                break
+
+        # 3) Если mention не было, но сообщение – reply
+        if not target_name and message.reply_to_message and message.reply_to_message.from_user:
+            target_user = message.reply_to_message.from_user
+            target_name = display_name(target_user)
+            start = 0
+
+        if not target_name:
+            return TriggerMatch(None, lower)
+
+        # lower() может изменить длину строки для редких символов — тогда режем оригинал
+        tail = lower[start:] if len(lower) == len(text) else text[start:].lower()
+        # Убираем лишние пробелы и знаки
+        action_key = tail.strip().rstrip('.,!')
+        template = ACTIONS_REGISTRY.get(action_key) if action_key else None
+        if not template and action_key and self._fuzzy_distance:
+            # «абнять» → «обнять»: стоимость промаха ограничена, см. FuzzyIndex
+            index = get_fuzzy_index(self._fuzzy_distance)
+            fuzzy_key = index.lookup(action_key) if index else None
+            if fuzzy_key:
+                action_key = fuzzy_key
+                template = ACTIONS_REGISTRY.get(fuzzy_key)
+        if not template:
+            return TriggerMatch(None, lower)
+
+        return TriggerMatch(ACTION, lower, action_key, template, target_user, target_name)
+
+
+_MATCHER: TriggerMatcher | None = None
+
+
+def get_matcher(snapshot: ConfigSnapshot) -> TriggerMatcher:
+    """Матчер пересобирается только при смене версии снимка конфига."""
+    global _MATCHER
+    if _MATCHER is None or _MATCHER.version != snapshot.version:
+        _MATCHER = TriggerMatcher(snapshot)
+    return _MATCHER
+
+
+def get_trigger_match(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, snapshot: ConfigSnapshot
+) -> TriggerMatch:
+    """
+    Возвращает результат разбора сообщения, вычисляя его один раз на апдейт:
+    группы 0 и 1 получают один и тот же context, поэтому второй вызов берёт кэш.
+    """
+    cached = getattr(context, _CONTEXT_ATTR, None)
+    if cached is not None and cached[0] == update.update_id:
+        return cached[1]
+
+    message = update.message
+    match = get_matcher(snapshot).classify(message) if message else NO_MATCH
+    setattr(context, _CONTEXT_ATTR, (update.update_id, match))
+    return match
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# Сколько апдейтов обрабатываем одновременно (из разных чатов)
+DEFAULT_MAX_CONCURRENT = 16
+
+# Сколько апдейтов может ждать обработки, прежде чем приём новых приостановится
+DEFAULT_MAX_PENDING = 1000
+
+
+def ordering_key(update: object) -> Any:
+    """
+    Ключ, внутри которого сохраняется порядок: чат, а для апдейтов без чата
+    (инлайн-запросы) — пользователь. None — порядок не важен.
+    """
+    if isinstance(update, Update):
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return ("user", update.effective_user.id)
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обрабатывает апдейты разных чатов параллельно (не больше max_concurrent сразу),
+    а внутри одного чата — строго по очереди: «кляп → сообщение → снятие кляпа» не переставятся.
+
+    PTB видит этот процессор как последовательный (max_concurrent_updates == 1), поэтому
+    отдаёт апдейты по одному и ждёт do_process_update. Тот лишь ставит апдейт в очередь
+    его чата и сразу возвращается — пока ожидающих меньше max_pending. Дальше он ждёт,
+    и это и есть backpressure: update_queue перестаёт разбираться, а при ограниченной
+    update_queue getUpdates ждёт, а вебхук отвечает Telegram 429.
+    """
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT, max_pending: int = DEFAULT_MAX_PENDING):
+        super().__init__(1)
+        if max_concurrent < 1 or max_pending < 1:
+            raise ValueError("max_concurrent и max_pending должны быть положительными")
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self._slots: asyncio.Semaphore | None = None
+        self._space: asyncio.Condition | None = None
+        # Очереди апдейтов по ключу упорядочивания; ключ есть, пока у чата работает воркер
+        self._chats: dict[Any, deque[Awaitable[Any]]] = {}
+        self._workers: set[asyncio.Task] = set()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Апдейты в очередях чатов плюс обрабатываемые прямо сейчас."""
+        return self._pending
+
+    async def initialize(self) -> None:
+        # Примитивы создаём внутри работающего loop
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._space = asyncio.Condition()
+
+    async def shutdown(self) -> None:
+        await self.drain()
+
+    async def drain(self) -> None:
+        """Дожидается обработки всего, что уже принято."""
+        while self._workers:
+            await asyncio.gather(*list(self._workers), return_exceptions=True)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        if self._pending >= self.max_pending:
+            async with self._space:
+                await self._space.wait_for(lambda: self._pending < self.max_pending)
+
+        self._pending += 1
+        key = ordering_key(update)
+        if key is None:
+            self._start_worker(deque([coroutine]))
+            return
+
+        queue = self._chats.get(key)
+        if queue is not None:
+            # У чата уже есть воркер — он доберётся до апдейта в порядке поступления
+            queue.append(coroutine)
+            return
+        queue = self._chats[key] = deque([coroutine])
+        self._start_worker(queue, key)
+
+    def _start_worker(self, queue: deque, key: Any = None) -> None:
+        task = asyncio.create_task(self._work(queue, key))
+        self._workers.add(task)
+        task.add_done_callback(self._workers.discard)
+
+    async def _work(self, queue: deque, key: Any) -> None:
+        try:
+            while queue:
+                coroutine = queue.popleft()
+                try:
+                    async with self._slots:
+                        await coroutine
+                except Exception:
+                    # Ошибки обработчиков PTB разбирает сам; сюда долетает только неожиданное
+                    logger.exception(f"Ошибка при обработке апдейта (ключ {key})")
+                finally:
+                    self._pending -= 1
+                    async with self._space:
+                        self._space.notify()
+        finally:
+            if key is not None:
+                self._chats.pop(key, None)
@@ -0,0 +1,165 @@
+import asyncio
+import hmac
+import json
+import logging
+import signal
+import ssl
+from http import HTTPStatus
+from typing import Any, Mapping
+
+from telegram import Update
+from telegram.ext import Application
+
+from utils.app_lifecycle import running
+from utils.http_server import HttpError, HttpServer, Response
+from utils.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram присылает secret_token из setWebhook
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+# Больше этого апдейт от Telegram не бывает; всё, что крупнее, — не от Telegram
+MAX_BODY = 1024 * 1024
+
+WEBHOOK_REJECTED = METRICS.counter(
+    "webhook_rejected_total", "Апдейты вебхука, отклонённые из-за полной очереди (Telegram пришлёт их снова)"
+)
+
+DEFAULTS = {
+    "listen": "127.0.0.1",
+    "port": 8080,
+    "path": "/telegram",
+    "health_path": "/healthz",
+    "secret_token": "",
+    # Публичный адрес для setWebhook; пусто — вебхук регистрирует кто-то другой (балансировщик, деплой)
+    "url": "",
+    # Сертификат и ключ, если TLS не снимается прокси перед ботом
+    "tls_cert": "",
+    "tls_key": "",
+    "drop_pending_updates": False,
+}
+
+
+class WebhookServer(HttpServer):
+    """
+    HTTP-сервер для приёма апдейтов от Telegram.
+    POST на path кладёт апдейт в application.update_queue — дальше работают те же
+    обработчики, что и при long polling. Если очередь полна, сразу отвечаем 429 — Telegram
+    повторит апдейт позже. GET на health_path отвечает балансировщику.
+    """
+
+    def __init__(self, application: Application, options: Mapping[str, Any] | None = None):
+        super().__init__({**DEFAULTS, **(options or {})})
+        self.application = application
+        self.received = 0
+        self.rejected = 0
+
+    def _ssl_context(self) -> ssl.SSLContext | None:
+        cert, key = self.options["tls_cert"], self.options["tls_key"]
+        if not cert:
+            return None
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert, key or None)
+        return context
+
+    async def start(self) -> None:
+        await super().start()
+        logger.info(f"🌐 Вебхук слушает {self.options['listen']}:{self.port}{self.options['path']}")
+
+    async def dispatch(
+        self, method: str, target: str, headers: dict[str, str], reader: asyncio.StreamReader
+    ) -> Response:
+        status, body = await self._dispatch(method, target, headers, reader)
+        payload = json.dumps(body).encode() if body is not None else b""
+        return status, payload, "application/json"
+
+    async def _dispatch(
+        self, method: str, target: str, headers: dict[str, str], reader: asyncio.StreamReader
+    ) -> tuple[HTTPStatus, dict | None]:
+        if target == self.options["health_path"]:
+            if method not in ("GET", "HEAD"):
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED)
+            running = self.application.running
+            return (HTTPStatus.OK if running else HTTPStatus.SERVICE_UNAVAILABLE), {
+                "status": "ok" if running else "starting",
+                "queued_updates": self.application.update_queue.qsize(),
+                "received": self.received,
+                "rejected": self.rejected,
+            }
+
+        if target != self.options["path"]:
+            raise HttpError(HTTPStatus.NOT_FOUND)
+        if method != "POST":
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED)
+
+        secret = self.options["secret_token"]
+        if secret and not hmac.compare_digest(headers.get(SECRET_HEADER, ""), secret):
+            raise HttpError(HTTPStatus.FORBIDDEN)
+
+        try:
+            length = int(headers["content-length"])
+        except (KeyError, ValueError):
+            raise HttpError(HTTPStatus.LENGTH_REQUIRED)
+        if length > MAX_BODY:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+
+        body = await reader.readexactly(length)
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except (ValueError, TypeError, KeyError):
+            # Тело прочитано целиком, так что соединение можно оставить
+            return HTTPStatus.BAD_REQUEST, None
+        if update is None:
+            return HTTPStatus.BAD_REQUEST, None
+
+        # Дальше апдейт обрабатывается так же, как полученный через getUpdates.
+        # Очередь ограничена: если бот не успевает, сразу отвечаем 429, а не держим соединение —
+        # иначе Telegram ждёт, по таймауту шлёт апдейт повторно, и нагрузка только растёт
+        try:
+            self.application.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            WEBHOOK_REJECTED.inc()
+            return HTTPStatus.TOO_MANY_REQUESTS, None
+        self.received += 1
+        return HTTPStatus.OK, None
+
+
+async def run_webhook(
+    application: Application,
+    options: Mapping[str, Any] | None = None,
+    stop_event: asyncio.Event | None = None,
+) -> None:
+    """
+    Запускает бота в режиме вебхука — аналог application.run_polling():
+    тот же жизненный цикл (utils.app_lifecycle.running), только апдейты приходят
+    в WebhookServer, а не через getUpdates.
+    Работает до SIGINT/SIGTERM или до stop_event.set().
+    """
+    server = WebhookServer(application, options)
+    opts = server.options
+    stop_event = stop_event or asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: остаётся KeyboardInterrupt
+
+    # Сервер поднимаем сразу: пока приложение запускается, health отвечает 503, а не отказом соединения
+    await server.start()
+    try:
+        async with running(application):
+            if opts["url"]:
+                await application.bot.set_webhook(
+                    url=opts["url"].rstrip("/") + opts["path"],
+                    secret_token=opts["secret_token"] or None,
+                    allowed_updates=Update.ALL_TYPES,
+                    drop_pending_updates=bool(opts["drop_pending_updates"]),
+                )
+                logger.info(f"🔗 Вебхук зарегистрирован: {opts['url']}")
+            await stop_event.wait()
+    finally:
+        await server.stop()